@@ -0,0 +1,31 @@
+-- Brings an existing Postgres database in line with src/fsrs_model.py.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so run the
+-- file with autocommit, e.g. psql -v ON_ERROR_STOP=1 -f 001_queue_partial_indexes.sql.
+-- Every statement is idempotent and the file can be re-run after a failure;
+-- drop any index left INVALID by an interrupted build before re-running.
+
+ALTER TABLE fsrs ADD COLUMN IF NOT EXISTS freshness_rank double precision;
+ALTER TABLE fsrs ALTER COLUMN difficulty DROP NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_flashcards_user_id
+    ON flashcards (user_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fsrs_user_id_freshness_rank
+    ON fsrs (user_id, freshness_rank DESC);
+
+-- One index per branch of FsrsQueueMapper.queue_branches. The predicates must
+-- match the queries exactly, state is compared as text.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fsrs_review_queue
+    ON fsrs (user_id, is_pending, due)
+    WHERE state = '2';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fsrs_learning_queue
+    ON fsrs (user_id, is_pending, due)
+    WHERE state IN ('1', '3');
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fsrs_pending_queue
+    ON fsrs (user_id, due)
+    WHERE is_pending IS true;
+
+ANALYZE fsrs;
@@ -0,0 +1,19 @@
+-- Adds user_fsrs.next_due_at, the per-user MIN(fsrs.due) read by reminder
+-- sweepers through UserFsrsRepository.get_users_due_before.
+--
+-- Run with autocommit like 001_queue_partial_indexes.sql. The backfill runs
+-- after the indexes so MIN(due) per user is an index lookup; re-running it
+-- is harmless.
+
+ALTER TABLE user_fsrs ADD COLUMN IF NOT EXISTS next_due_at integer;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fsrs_user_id_due
+    ON fsrs (user_id, due, flashcard_id);
+
+UPDATE user_fsrs
+    SET next_due_at = (SELECT MIN(due) FROM fsrs WHERE fsrs.user_id = user_fsrs.user_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_fsrs_next_due_at
+    ON user_fsrs (next_due_at);
+
+ANALYZE user_fsrs;
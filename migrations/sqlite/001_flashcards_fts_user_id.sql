@@ -0,0 +1,32 @@
+-- Recreates flashcards_fts with the UNINDEXED user_id column search_cards
+-- filters on, for SQLite databases created before it was added. New
+-- databases get it from FLASHCARDS_FTS_DDL in src/fsrs_model.py.
+--
+-- The rebuild reads every card back from flashcards; re-running it is
+-- harmless.
+
+BEGIN;
+
+DROP TRIGGER IF EXISTS flashcards_fts_insert;
+DROP TRIGGER IF EXISTS flashcards_fts_delete;
+DROP TRIGGER IF EXISTS flashcards_fts_update;
+DROP TABLE IF EXISTS flashcards_fts;
+
+CREATE VIRTUAL TABLE flashcards_fts USING fts5(content, user_id UNINDEXED, content='flashcards', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3');
+
+CREATE TRIGGER flashcards_fts_insert AFTER INSERT ON flashcards BEGIN
+    INSERT INTO flashcards_fts(rowid, content, user_id) VALUES (new.id, new.content, new.user_id);
+END;
+
+CREATE TRIGGER flashcards_fts_delete AFTER DELETE ON flashcards BEGIN
+    INSERT INTO flashcards_fts(flashcards_fts, rowid, content, user_id) VALUES ('delete', old.id, old.content, old.user_id);
+END;
+
+CREATE TRIGGER flashcards_fts_update AFTER UPDATE OF content, user_id ON flashcards BEGIN
+    INSERT INTO flashcards_fts(flashcards_fts, rowid, content, user_id) VALUES ('delete', old.id, old.content, old.user_id);
+    INSERT INTO flashcards_fts(rowid, content, user_id) VALUES (new.id, new.content, new.user_id);
+END;
+
+INSERT INTO flashcards_fts(flashcards_fts) VALUES ('rebuild');
+
+COMMIT;
@@ -0,0 +1,77 @@
+-- Brings fsrs and user_fsrs of an existing SQLite database in line with
+-- src/fsrs_model.py, like migrations/postgresql/001 and 002 do on Postgres:
+-- fsrs.difficulty becomes nullable for lease placeholders, and
+-- fsrs.freshness_rank and user_fsrs.next_due_at are added with their indexes.
+--
+-- SQLite can neither drop NOT NULL nor add a column conditionally, so both
+-- tables are rebuilt from the columns every version has, which also makes the
+-- file safe to re-run. Run it with the application stopped, e.g.
+-- sqlite3 db.db < 002_fsrs_columns.sql, then fill freshness_rank with
+-- FsrsRepository.backfill_freshness_rank().
+
+PRAGMA foreign_keys = OFF;
+
+BEGIN;
+
+CREATE TABLE fsrs_new (
+    id INTEGER NOT NULL,
+    user_id VARCHAR NOT NULL,
+    flashcard_id INTEGER NOT NULL,
+    is_pending BOOLEAN NOT NULL,
+    difficulty NUMERIC(6, 4),
+    stability NUMERIC(15, 6),
+    state VARCHAR(1) NOT NULL,
+    due INTEGER,
+    reviews_count INTEGER NOT NULL,
+    step SMALLINT,
+    last_rating SMALLINT,
+    last_review INTEGER,
+    blocked_until INTEGER,
+    freshness_score INTEGER,
+    freshness_rank FLOAT,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (flashcard_id),
+    FOREIGN KEY(flashcard_id) REFERENCES flashcards (id)
+);
+
+INSERT INTO fsrs_new (id, user_id, flashcard_id, is_pending, difficulty, stability, state, due, reviews_count, step, last_rating, last_review, blocked_until, freshness_score, updated_at)
+    SELECT id, user_id, flashcard_id, is_pending, difficulty, stability, state, due, reviews_count, step, last_rating, last_review, blocked_until, freshness_score, updated_at
+    FROM fsrs;
+
+DROP TABLE fsrs;
+ALTER TABLE fsrs_new RENAME TO fsrs;
+
+CREATE INDEX ix_fsrs_due ON fsrs (due);
+CREATE INDEX ix_fsrs_user_id_due ON fsrs (user_id, due, flashcard_id);
+CREATE INDEX ix_fsrs_user_id_freshness_rank ON fsrs (user_id, freshness_rank DESC);
+CREATE INDEX ix_fsrs_review_queue ON fsrs (user_id, is_pending, due) WHERE state = '2';
+CREATE INDEX ix_fsrs_learning_queue ON fsrs (user_id, is_pending, due) WHERE state IN ('1', '3');
+CREATE INDEX ix_fsrs_pending_queue ON fsrs (user_id, due) WHERE is_pending IS 1;
+
+CREATE TABLE user_fsrs_new (
+    id INTEGER NOT NULL,
+    user_id VARCHAR NOT NULL,
+    payload JSON NOT NULL,
+    updated_at DATETIME NOT NULL,
+    next_due_at INTEGER,
+    PRIMARY KEY (id),
+    UNIQUE (user_id)
+);
+
+INSERT INTO user_fsrs_new (id, user_id, payload, updated_at, next_due_at)
+    SELECT id, user_id, payload, updated_at, (SELECT MIN(due) FROM fsrs WHERE fsrs.user_id = user_fsrs.user_id)
+    FROM user_fsrs;
+
+DROP TABLE user_fsrs;
+ALTER TABLE user_fsrs_new RENAME TO user_fsrs;
+
+CREATE INDEX ix_user_fsrs_next_due_at ON user_fsrs (next_due_at);
+
+CREATE INDEX IF NOT EXISTS ix_flashcards_user_id ON flashcards (user_id);
+
+COMMIT;
+
+PRAGMA foreign_keys = ON;
+
+ANALYZE;
@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+
+from src.state import State
+
+
+class CardSort(Enum):
+    DUE = "due"
+    FRESHNESS = "freshness"
+
+
+@dataclass(frozen=True)
+class CardFilter:
+    states: tuple[State, ...]|None = None
+    is_pending: bool|None = None
+
+
+@dataclass(frozen=True)
+class CardRow:
+    flashcard_id: int
+    content: str
+    state: State
+    is_pending: bool
+    due: datetime|None
+    stability: float|None
+    difficulty: float|None
+    reviews_count: int
+    freshness_score: float
+
+
+@dataclass(frozen=True)
+class CardCursor:
+    """
+    Position after the last row of a page: the sort value of that row (due
+    timestamp or freshness rank, None for cards without one) and its id.
+    """
+    value: float|None
+    flashcard_id: int
+
+    def encode(self) -> str:
+        value = "" if self.value is None else repr(self.value)
+        return f"{value}:{self.flashcard_id}"
+
+    @staticmethod
+    def decode(cursor: str) -> 'CardCursor':
+        value, flashcard_id = cursor.rsplit(":", 1)
+        return CardCursor(float(value) if value else None, int(flashcard_id))
+
+
+@dataclass(frozen=True)
+class CardPage:
+    rows: list[CardRow]
+    next_cursor: CardCursor|None
@@ -0,0 +1,27 @@
+from functools import lru_cache
+import os
+
+# Set to a postgresql:// URL for the Postgres deployment; its partial indexes
+# are created by migrations/postgresql.
+DATABASE_URL = os.environ.get('FSRS_DATABASE_URL', 'sqlite:///db.db')
+
+
+@lru_cache(maxsize=None)
+def get_engine():
+    # Imported here so modules that only need a Session factory do not pay
+    # for SQLAlchemy until the first query.
+    from sqlalchemy import create_engine
+
+    return create_engine(DATABASE_URL)
+
+
+@lru_cache(maxsize=None)
+def get_sessionmaker():
+    from sqlalchemy.orm import sessionmaker
+
+    return sessionmaker(bind=get_engine())
+
+
+def Session():
+    """Open a session on the shared engine, which is created on first use."""
+    return get_sessionmaker()()
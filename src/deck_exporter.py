@@ -0,0 +1,119 @@
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+import csv
+import json
+
+from sqlalchemy import select
+
+from src.db import Session
+from src.fsrs_model import FlashcardModel, FsrsModel
+
+
+EXPORT_CHUNK_SIZE = 10000
+
+EXPORT_COLUMNS = (
+    FlashcardModel.id.label("flashcard_id"),
+    FlashcardModel.user_id,
+    FlashcardModel.content,
+    FsrsModel.state,
+    FsrsModel.step,
+    FsrsModel.stability,
+    FsrsModel.difficulty,
+    FsrsModel.due,
+    FsrsModel.last_review,
+    FsrsModel.reviews_count,
+    FsrsModel.last_rating,
+    FsrsModel.is_pending,
+    FsrsModel.freshness_score,
+    FsrsModel.updated_at,
+)
+
+FIELDS = tuple(column.key for column in EXPORT_COLUMNS)
+
+
+@dataclass
+class ExportResult:
+    rows: int = 0
+    watermark: datetime|None = None
+
+
+class DeckExporter:
+    """
+    Streams a user's flashcards with their fsrs state to JSONL or CSV.
+
+    Rows are read as plain tuples through a streaming cursor with
+    `yield_per`, so nothing is kept in a session identity map. With `since`
+    only cards whose fsrs row changed after the watermark are exported; the
+    returned watermark is the newest `updated_at` written and can be passed as
+    `since` to the next incremental export. Cards never reviewed have no fsrs
+    row and are only part of full exports.
+    """
+
+    def __init__(self, chunk_size: int = EXPORT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def export_file(self, path: str|Path, user_id: str, since: datetime|None = None, file_format: str|None = None) -> ExportResult:
+        path = Path(path)
+
+        if file_format is None:
+            file_format = path.suffix.lower().lstrip(".")
+
+        if file_format == "jsonl":
+            export = self.export_jsonl
+        elif file_format == "csv":
+            export = self.export_csv
+        else:
+            raise ValueError(f"Unknown export format: {file_format}")
+
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            return export(file, user_id, since)
+
+    def export_jsonl(self, file, user_id: str, since: datetime|None = None) -> ExportResult:
+        result = ExportResult()
+
+        for row in self.iter_rows(user_id, since):
+            file.write(json.dumps(self._to_record(row, result), separators=(",", ":")) + "\n")
+
+        return result
+
+    def export_csv(self, file, user_id: str, since: datetime|None = None) -> ExportResult:
+        result = ExportResult()
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+
+        for row in self.iter_rows(user_id, since):
+            writer.writerow(self._to_record(row, result))
+
+        return result
+
+    def iter_rows(self, user_id: str, since: datetime|None = None):
+        statement = (
+            select(*EXPORT_COLUMNS)
+                .outerjoin(FsrsModel, FlashcardModel.id == FsrsModel.flashcard_id)
+                .where(FlashcardModel.user_id == user_id)
+                .order_by(FlashcardModel.id)
+                .execution_options(stream_results=True, yield_per=self.chunk_size)
+        )
+
+        if since is not None:
+            statement = statement.where(FsrsModel.updated_at > since)
+
+        with Session() as session:
+            yield from session.execute(statement)
+
+    def _to_record(self, row, result: ExportResult) -> dict:
+        result.rows += 1
+        if row.updated_at is not None and (result.watermark is None or row.updated_at > result.watermark):
+            result.watermark = row.updated_at
+
+        return {field: self._to_value(value) for field, value in zip(FIELDS, row)}
+
+    @staticmethod
+    def _to_value(value):
+        if isinstance(value, Decimal):
+            return float(value)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
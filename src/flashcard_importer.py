@@ -0,0 +1,190 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import chain, islice
+from pathlib import Path
+import csv
+import json
+
+from sqlalchemy import insert
+
+from src.db import Session
+from src.fsrs_algorithm import DEFAULT_SCHEDULER_SETTINGS, FsrsParams, SchedulerSettings
+from src.fsrs_model import FlashcardModel, FsrsModel
+from src.fsrs_repository import FsrsRepository
+from src.rating import Rating
+from src.user_fsrs_repository import UserFsrsRepository
+
+
+IMPORT_CHUNK_SIZE = 5000
+
+ANKI_SEPARATORS = {
+    "comma": ",",
+    "semicolon": ";",
+    "tab": "\t",
+    "space": " ",
+    "pipe": "|",
+    "colon": ":",
+}
+# Header lines naming columns that hold note metadata instead of fields.
+ANKI_METADATA_COLUMNS = ("notetype", "deck", "tags", "guid")
+
+FORMATS = {
+    ".csv": "csv",
+    ".tsv": "tsv",
+    ".txt": "anki",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+
+
+@dataclass
+class ImportRecord:
+    content: str
+    reviews: list[tuple[Rating, datetime]]
+
+
+@dataclass
+class ImportResult:
+    flashcards: int = 0
+    reviewed: int = 0
+
+
+class FlashcardImporter:
+    """
+    Streams flashcards from CSV, TSV, JSONL or Anki plain text exports into
+    the database.
+
+    Every record has a `content` field and an optional `reviews` list of
+    {"rating": 1-4, "reviewed_at": ISO datetime or epoch seconds}; CSV/TSV
+    files have a header row and the list is a JSON encoded column. Anki
+    exports have no header: the first note field becomes the content and the
+    "#separator:" and "#<name> column:" lines are honoured. Records are read lazily and inserted
+    with one executemany per chunk, so memory stays bounded by `chunk_size`.
+    When `replay_reviews` is set the history of each card is replayed through
+    FsrsParams.review with the user's parameters and settings, and the
+    resulting state is inserted next to the card.
+    Cards without history get no fsrs row, like cards created in the app.
+    """
+
+    def __init__(self, fsrs_repository: FsrsRepository, chunk_size: int = IMPORT_CHUNK_SIZE, user_fsrs_repository: UserFsrsRepository|None = None):
+        self.fsrs_repository = fsrs_repository
+        self.chunk_size = chunk_size
+        self.user_fsrs_repository = user_fsrs_repository if user_fsrs_repository is not None else UserFsrsRepository()
+
+    def import_file(self, path: str|Path, user_id: str, file_format: str|None = None, replay_reviews: bool = True) -> ImportResult:
+        path = Path(path)
+
+        if file_format is None:
+            file_format = FORMATS.get(path.suffix.lower())
+        if file_format is None:
+            raise ValueError(f"Unknown import format for {path.name}")
+
+        with open(path, encoding="utf-8", newline="") as file:
+            return self.import_records(self.read_records(file, file_format), user_id, replay_reviews)
+
+    def import_records(self, records, user_id: str, replay_reviews: bool = True) -> ImportResult:
+        result = ImportResult()
+        records = iter(records)
+        settings = self._get_settings(user_id)
+
+        while chunk := list(islice(records, self.chunk_size)):
+            reviewed = self._insert_chunk(chunk, user_id, replay_reviews, settings)
+            result.flashcards += len(chunk)
+            result.reviewed += reviewed
+
+        return result
+
+    def read_records(self, file, file_format: str):
+        if file_format == "jsonl":
+            for line in file:
+                if line.strip():
+                    yield self._to_record(json.loads(line))
+        elif file_format == "anki":
+            yield from self._read_anki(file)
+        elif file_format in ("csv", "tsv"):
+            delimiter = "\t" if file_format == "tsv" else ","
+
+            for row in csv.DictReader(file, delimiter=delimiter):
+                reviews = row.get("reviews")
+                yield self._to_record({
+                    "content": row["content"],
+                    "reviews": json.loads(reviews) if reviews else [],
+                })
+        else:
+            raise ValueError(f"Unknown import format: {file_format}")
+
+    def _read_anki(self, file):
+        delimiter = "\t"
+        metadata_columns = set()
+
+        # Anki writes its "#key:value" header lines before the first note.
+        line = file.readline()
+        while line.startswith("#"):
+            key, _, value = line[1:].rstrip("\r\n").partition(":")
+
+            if key == "separator":
+                delimiter = ANKI_SEPARATORS.get(value.lower(), value)
+            elif key.endswith(" column") and key.removesuffix(" column") in ANKI_METADATA_COLUMNS:
+                metadata_columns.add(int(value) - 1)
+
+            line = file.readline()
+
+        for row in csv.reader(chain([line], file), delimiter=delimiter):
+            fields = [value for index, value in enumerate(row) if index not in metadata_columns]
+            if fields:
+                yield ImportRecord(content=fields[0], reviews=[])
+
+    def _get_settings(self, user_id: str) -> SchedulerSettings:
+        user_fsrs = self.user_fsrs_repository.get_by_user_id(user_id)
+        return user_fsrs.settings if user_fsrs is not None else DEFAULT_SCHEDULER_SETTINGS
+
+    def _insert_chunk(self, chunk: list[ImportRecord], user_id: str, replay_reviews: bool, settings: SchedulerSettings) -> int:
+        with Session() as session:
+            flashcard_ids = session.scalars(
+                insert(FlashcardModel).returning(FlashcardModel.id, sort_by_parameter_order=True),
+                [{"user_id": user_id, "content": record.content} for record in chunk],
+            ).all()
+
+            rows = []
+            if replay_reviews:
+                for flashcard_id, record in zip(flashcard_ids, chunk):
+                    if record.reviews:
+                        rows.append(self.fsrs_repository.to_row(self._replay(flashcard_id, user_id, record.reviews, settings)))
+
+            if rows:
+                session.execute(insert(FsrsModel), rows)
+                self.fsrs_repository.refresh_next_due_at(session, [user_id])
+
+            session.commit()
+
+        return len(rows)
+
+    def _replay(self, flashcard_id: int, user_id: str, reviews: list[tuple[Rating, datetime]], settings: SchedulerSettings = DEFAULT_SCHEDULER_SETTINGS) -> FsrsParams:
+        fsrs = FsrsParams.new_fsrs(flashcard_id=flashcard_id, user_id=user_id)
+        fsrs.parameters = self.fsrs_repository.get_parameters(user_id)
+        fsrs.settings = settings
+
+        for rating, reviewed_at in sorted(reviews, key=lambda review: review[1]):
+            fsrs.review(rating, reviewed_at)
+            fsrs.newly_created = False
+
+        return fsrs
+
+    def _to_record(self, data: dict) -> ImportRecord:
+        return ImportRecord(
+            content=data["content"],
+            reviews=[
+                (Rating(int(review["rating"])), self._to_datetime(review["reviewed_at"]))
+                for review in data.get("reviews") or []
+            ],
+        )
+
+    @staticmethod
+    def _to_datetime(value: str|int|float) -> datetime:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=timezone.utc)
+
+        reviewed_at = datetime.fromisoformat(value)
+        if reviewed_at.tzinfo is None:
+            reviewed_at = reviewed_at.replace(tzinfo=timezone.utc)
+        return reviewed_at
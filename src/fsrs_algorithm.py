@@ -1,4 +1,6 @@
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 import math
 from src.rating import Rating
 from src.state import State
@@ -99,9 +101,68 @@ FUZZ_RANGES = [
     },
 ]
 
+def _get_fuzz_range_deltas() -> tuple[tuple[float, float, float, float], ...]:
+    # Fuzz delta accumulated below each range start, so get_fuzz_range only
+    # has to add the share of the range the interval falls into.
+    deltas = []
+    base_delta = 1.0
+    for fuzz_range in FUZZ_RANGES:
+        deltas.append((fuzz_range["start"], fuzz_range["end"], fuzz_range["factor"], base_delta))
+        base_delta += fuzz_range["factor"] * (fuzz_range["end"] - fuzz_range["start"])
+    return tuple(deltas)
+
+FUZZ_RANGE_DELTAS = _get_fuzz_range_deltas()
+UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+
 DESIRED_RETAINABILITY = 0.9
 MAXIMUM_INTERVAL = 36500
 
+# Out-of-schedule priority doubles for every day a card is not shown.
+FRESHNESS_RECOVERY_HALF_LIFE = 86400
+FRESHNESS_SCORE_MIN = 0.000001
+
+@dataclass(frozen=True)
+class SchedulerSettings:
+    desired_retention: float = DESIRED_RETAINABILITY
+    maximum_interval: int = MAXIMUM_INTERVAL
+    _interval_factors: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not 0 < self.desired_retention < 1:
+            raise ValueError(f"desired_retention = {self.desired_retention} is outside (0, 1)")
+        if self.maximum_interval < 1:
+            raise ValueError(f"maximum_interval = {self.maximum_interval} is below 1")
+
+    def interval_factors(self, parameters: list[float] = DEFAULT_PARAMETERS) -> tuple[float, float]:
+        """
+        (0.9 ** (1 / decay) - 1, desired_retention ** (1 / decay) - 1) for the
+        decay in `parameters`, computed once per settings object and decay.
+        """
+        decay = -parameters[20]
+        factors = self._interval_factors.get(decay)
+
+        if factors is None:
+            factors = (0.9 ** (1 / decay) - 1, (self.desired_retention ** (1 / decay)) - 1)
+            self._interval_factors[decay] = factors
+
+        return factors
+
+    def next_interval(self, stability: float, parameters: list[float] = DEFAULT_PARAMETERS) -> int:
+        factor, retention_factor = self.interval_factors(parameters)
+
+        next_interval = (stability / factor) * retention_factor
+
+        next_interval = max(round(next_interval), 1)
+
+        return min(next_interval, self.maximum_interval)
+
+@lru_cache(maxsize=256)
+def get_scheduler_settings(desired_retention: float = DESIRED_RETAINABILITY, maximum_interval: int = MAXIMUM_INTERVAL) -> SchedulerSettings:
+    # Users with the same settings share one object and its cached factors.
+    return SchedulerSettings(desired_retention=desired_retention, maximum_interval=maximum_interval)
+
+DEFAULT_SCHEDULER_SETTINGS = get_scheduler_settings()
+
 class FsrsParams:
     flashcard_id: int
     user_id: str
@@ -118,15 +179,23 @@ class FsrsParams:
     state: State
     newly_created: bool
     updated_at: datetime
+    settings: SchedulerSettings
 
     @staticmethod
-    def new_fsrs(flashcard_id: int, user_id: str) -> 'FsrsParams':
-        return FsrsParams(
+    def new_fsrs(flashcard_id: int, user_id: str, learning_steps: tuple[timedelta, ...]|None = None, relearning_steps: tuple[timedelta, ...]|None = None) -> 'FsrsParams':
+        fsrs = FsrsParams(
             flashcard_id=flashcard_id,
             user_id=user_id,
             newly_created=True,
         )
 
+        if learning_steps is not None:
+            fsrs.learning_steps = learning_steps
+        if relearning_steps is not None:
+            fsrs.relearning_steps = relearning_steps
+
+        return fsrs
+
     def __init__(
         self,
         flashcard_id: int,
@@ -150,7 +219,8 @@ class FsrsParams:
         last_rating: Rating|None = None,
         newly_created: bool = False,
         freshness_score: float = 0.5,
-        updated_at: datetime = datetime.now(timezone.utc),
+        updated_at: datetime|None = None,
+        settings: SchedulerSettings = DEFAULT_SCHEDULER_SETTINGS,
     ):
         self.state = state
 
@@ -177,20 +247,35 @@ class FsrsParams:
         self.user_id = user_id
         self.newly_created = newly_created
         self.freshness_score = freshness_score
+
+        if updated_at is None:
+            updated_at = datetime.now(timezone.utc)
         self.updated_at = updated_at
+        self.settings = settings
 
     def __repr__(self):
         return f"FsrsParams(stability={self.stability}, difficulty={self.difficulty}, due={self.due}, last_review={self.last_review}, reviews_count={self.reviews_count}, last_rating={self.last_rating}, learning_steps={self.learning_steps}, relearning_steps={self.relearning_steps}, step={self.step}, state={self.state}, is_pending={self.is_pending})"
 
+    def current_freshness_score(self, current_datetime: datetime|None = None) -> float:
+        return get_current_freshness_score(self.freshness_score, self.updated_at, current_datetime)
+
+    def freshness_rank(self) -> float:
+        return get_freshness_rank(self.freshness_score, self.updated_at)
+
     def review_out_of_schedule(self, rating: Rating, review_datetime: datetime|None = None):
-        self.update_freshness_score(rating)
+        self.update_freshness_score(rating, review_datetime)
 
     
-    def update_freshness_score(self, rating: Rating):
-        now = datetime.now(timezone.utc)
+    def update_freshness_score(self, rating: Rating, review_datetime: datetime|None = None):
+        now = review_datetime if review_datetime is not None else datetime.now(timezone.utc)
 
         # czas od ostatniego update
         seconds_since_last_review = (now.replace(tzinfo=None) - self.updated_at.replace(tzinfo=None)).total_seconds() if self.updated_at else 3600
+        # Replayed histories can start before the card's updated_at, such a
+        # review has no earlier update to recover from.
+        recovered = self.updated_at is not None and seconds_since_last_review >= 0
+        if seconds_since_last_review < 0:
+            seconds_since_last_review = 3600
 
         # time_factor dla EMA: szybkie powtórki = mniejszy wpływ
         time_factor = 1 - math.exp(-seconds_since_last_review / 600)  # half-life = 10 min
@@ -205,7 +290,14 @@ class FsrsParams:
         # EMA
         base_adaptation = 0.25
         adaptation_factor = base_adaptation * time_factor
-        prev_score = self.freshness_score if self.freshness_score is not None else 0.5
+        # The stored score is the one at updated_at, the EMA starts from the
+        # score it has recovered to since.
+        if self.freshness_score is None:
+            prev_score = 0.5
+        elif recovered:
+            prev_score = min(1.0, self.current_freshness_score(now))
+        else:
+            prev_score = self.freshness_score
         self.freshness_score = prev_score * (1 - adaptation_factor) + instant_score * adaptation_factor
 
         # penalty za samo pokazanie karty
@@ -217,10 +309,13 @@ class FsrsParams:
 
         self.updated_at = now
 
-    def review(self, rating: Rating, review_datetime: datetime|None = None, enable_fuzzing = False):
+    def review(self, rating: Rating, review_datetime: datetime|None = None, enable_fuzzing = False, load_balancer = None):
         if review_datetime is None:
             review_datetime = datetime.now(timezone.utc)
 
+        # Newly created cards have no stored due date yet.
+        previous_due = None if self.newly_created else self.due
+
         time_since_last_review = (
             review_datetime - self.last_review
         ) if self.last_review else None
@@ -235,14 +330,23 @@ class FsrsParams:
         else:
             raise ValueError(f"Invalid state: {self.state}")
 
-        if enable_fuzzing and self.state == State.REVIEW:
-            next_interval = _get_fuzzed_interval(interval=next_interval)
+        if load_balancer is not None and self.state == State.REVIEW:
+            next_interval = load_balancer.balance(self.user_id, review_datetime, next_interval, self.settings.maximum_interval)
+        elif enable_fuzzing and self.state == State.REVIEW:
+            next_interval = _get_fuzzed_interval(
+                interval=next_interval,
+                fuzz_factor=get_fuzz_factor(self.flashcard_id, self.reviews_count),
+                maximum_interval=self.settings.maximum_interval,
+            )
 
         self.due = review_datetime + next_interval
+
+        if load_balancer is not None:
+            load_balancer.move(self.user_id, previous_due, self.due)
         self.last_review = review_datetime
         self.reviews_count += 1
         self.last_rating = rating
-        self.update_freshness_score(rating)
+        self.update_freshness_score(rating, review_datetime)
 
     def _handle_learning(self, rating: Rating, review_datetime: datetime, days_since_last_review: int|None, time_since_last_review: timedelta|None):
         assert self.step is not None
@@ -417,7 +521,7 @@ class FsrsParams:
         return time_since_last_review.total_seconds() > 0 and days_since_last_review is not None and days_since_last_review < 1
 
     def calculate_next_interval(self, stability: float|None):
-        next_i = get_next_interval(stability=stability, parameters=self.parameters)
+        next_i = self.settings.next_interval(stability, self.parameters)
         return timedelta(days=next_i)
 
     def activate_from_pending(self, current_datetime: datetime | None = None) -> None:
@@ -456,7 +560,7 @@ class FsrsParams:
             parameters=self.parameters,
         )
 
-        desired_ret = DESIRED_RETAINABILITY
+        desired_ret = self.settings.desired_retention
         forgotten_threshold = desired_ret * 0.6
 
         if actual_ret < forgotten_threshold:
@@ -491,6 +595,16 @@ class FsrsParams:
         self.is_pending = False
 
 
+def validate_parameters(parameters: list[float]) -> tuple[float, ...]:
+    if len(parameters) != len(DEFAULT_PARAMETERS):
+        raise ValueError(f"Expected {len(DEFAULT_PARAMETERS)} parameters, got {len(parameters)}")
+
+    for index, (value, lower, upper) in enumerate(zip(parameters, LOWER_BOUNDS_PARAMETERS, UPPER_BOUNDS_PARAMETERS)):
+        if not lower <= value <= upper:
+            raise ValueError(f"Parameter {index} = {value} is outside [{lower}, {upper}]")
+
+    return tuple(float(value) for value in parameters)
+
 def clamp_difficulty(difficulty: float) -> float:
     return min(max(difficulty, MIN_DIFFICULTY), MAX_DIFFICULTY)
 
@@ -652,38 +766,92 @@ def get_card_retrievability(
 
     return (1 + factor * elapsed_days / stability) ** decay
 
-def _get_fuzzed_interval(self, *, interval: timedelta) -> timedelta:
-    from random import random
+def get_current_freshness_score(
+    freshness_score: float,
+    updated_at: datetime,
+    current_datetime: datetime|None = None,
+) -> float:
+    """
+    Freshness score as seen at `current_datetime`.
 
-    interval_days = interval.days
+    The stored score is the value at `updated_at`; afterwards it grows by a
+    factor of two every FRESHNESS_RECOVERY_HALF_LIFE seconds, so cards that
+    have not been shown for a while climb back to the top.
+    """
+    if current_datetime is None:
+        current_datetime = datetime.now(timezone.utc)
 
-    if interval_days < 2.5:
-        return interval
+    elapsed_seconds = _to_timestamp(current_datetime) - _to_timestamp(updated_at)
+    log_score = math.log2(max(freshness_score, FRESHNESS_SCORE_MIN)) + elapsed_seconds / FRESHNESS_RECOVERY_HALF_LIFE
 
-    def _get_fuzz_range(*, interval_days: int) -> tuple[int, int]:
-        delta = 1.0
-        for fuzz_range in FUZZ_RANGES:
-            delta += fuzz_range["factor"] * max(
-                min(interval_days, fuzz_range["end"]) - fuzz_range["start"], 0.0
-            )
+    # Cards not shown for years would overflow a float.
+    return 2 ** log_score if log_score < 1024 else math.inf
 
-        min_ivl = int(round(interval_days - delta))
-        max_ivl = int(round(interval_days + delta))
+def get_freshness_rank(freshness_score: float, updated_at: datetime) -> float:
+    """
+    Time independent sort key for get_current_freshness_score.
+
+    log2 of the current score is `log2(score) + (now - updated_at) / half_life`.
+    `now` adds the same amount to every card, so ordering by this key gives the
+    same top-K as ordering by the current score at any moment.
+    """
+    return (
+        math.log2(max(freshness_score, FRESHNESS_SCORE_MIN))
+        - _to_timestamp(updated_at) / FRESHNESS_RECOVERY_HALF_LIFE
+    )
 
-        min_ivl = max(2, min_ivl)
-        max_ivl = min(max_ivl, self.maximum_interval)
-        min_ivl = min(min_ivl, max_ivl)
+def _to_timestamp(value: datetime) -> float:
+    # Naive datetimes come back from the database in UTC.
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def get_fuzz_range(interval_days: int, maximum_interval: int = MAXIMUM_INTERVAL) -> tuple[int, int]:
+    delta = 1.0
+    for start, end, factor, base_delta in FUZZ_RANGE_DELTAS:
+        if interval_days < end:
+            delta = base_delta + factor * max(interval_days - start, 0.0)
+            break
+
+    min_ivl = int(round(interval_days - delta))
+    max_ivl = int(round(interval_days + delta))
+
+    min_ivl = max(2, min_ivl)
+    max_ivl = min(max_ivl, maximum_interval)
+    min_ivl = min(min_ivl, max_ivl)
+
+    return min_ivl, max_ivl
+
+def get_fuzz_factor(flashcard_id: int, reviews_count: int) -> float:
+    """
+    Uniform number in [0, 1) derived from the card and its review count, so
+    the same review of the same card is always fuzzed the same way.
+    """
+    seed = ((flashcard_id << 32) ^ reviews_count) & UINT64_MASK
+
+    seed = (seed + 0x9E3779B97F4A7C15) & UINT64_MASK
+    seed = ((seed ^ (seed >> 30)) * 0xBF58476D1CE4E5B9) & UINT64_MASK
+    seed = ((seed ^ (seed >> 27)) * 0x94D049BB133111EB) & UINT64_MASK
+    seed = seed ^ (seed >> 31)
+
+    return (seed >> 11) * 2.0 ** -53
+
+def _get_fuzzed_interval(
+    interval: timedelta,
+    fuzz_factor: float,
+    maximum_interval: int = MAXIMUM_INTERVAL,
+) -> timedelta:
+    interval_days = interval.days
 
-        return min_ivl, max_ivl
+    if interval_days < 2.5:
+        return interval
 
-    min_ivl, max_ivl = _get_fuzz_range(interval_days=interval_days)
+    min_ivl, max_ivl = get_fuzz_range(interval_days, maximum_interval)
 
     fuzzed_interval_days = (
-        random() * (max_ivl - min_ivl + 1)
+        fuzz_factor * (max_ivl - min_ivl + 1)
     ) + min_ivl
 
-    fuzzed_interval_days = min(round(fuzzed_interval_days), self.maximum_interval)
-
-    fuzzed_interval = timedelta(days=fuzzed_interval_days)
+    fuzzed_interval_days = min(round(fuzzed_interval_days), maximum_interval)
 
-    return fuzzed_interval
\ No newline at end of file
+    return timedelta(days=fuzzed_interval_days)
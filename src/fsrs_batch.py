@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+import numpy as np
+from src.fsrs_algorithm import DEFAULT_PARAMETERS, FUZZ_RANGE_DELTAS, MAXIMUM_INTERVAL, SchedulerSettings, DEFAULT_SCHEDULER_SETTINGS
+
+SECONDS_PER_DAY = 86400
+
+
+def get_deck_retrievability(
+    stability: np.ndarray,
+    last_review: np.ndarray,
+    current_timestamp: float|None = None,
+    parameters: list[float] = DEFAULT_PARAMETERS,
+    fractional_days: bool = False,
+) -> np.ndarray:
+    """
+    Vectorized counterpart of get_card_retrievability.
+
+    `last_review` holds epoch seconds as stored in fsrs.last_review. Missing
+    stability or last review (NaN) yields 0, like the scalar version. By default
+    elapsed time is truncated to whole days to match `timedelta.days`.
+    """
+    decay = -parameters[20]
+    factor = 0.9 ** (1 / decay) - 1
+
+    stability = np.asarray(stability, dtype=np.float64)
+    last_review = np.asarray(last_review, dtype=np.float64)
+
+    if current_timestamp is None:
+        current_timestamp = datetime.now(timezone.utc).timestamp()
+
+    elapsed_days = (current_timestamp - last_review) / SECONDS_PER_DAY
+    if not fractional_days:
+        elapsed_days = np.floor(elapsed_days)
+    elapsed_days = np.maximum(elapsed_days, 0.0)
+
+    known = ~(np.isnan(stability) | np.isnan(last_review))
+    retrievability = np.zeros(stability.shape, dtype=np.float64)
+    retrievability[known] = (1 + factor * elapsed_days[known] / stability[known]) ** decay
+
+    return retrievability
+
+
+def get_next_intervals(
+    stability: np.ndarray,
+    settings: SchedulerSettings = DEFAULT_SCHEDULER_SETTINGS,
+    parameters: list[float] = DEFAULT_PARAMETERS,
+) -> np.ndarray:
+    """Vectorized SchedulerSettings.next_interval, in whole days."""
+    factor, retention_factor = settings.interval_factors(parameters)
+
+    next_intervals = np.maximum(np.round((np.asarray(stability, dtype=np.float64) / factor) * retention_factor), 1)
+
+    return np.minimum(next_intervals, settings.maximum_interval).astype(np.int64)
+
+
+def get_fuzz_factors(flashcard_ids: np.ndarray, reviews_counts: np.ndarray) -> np.ndarray:
+    """Vectorized get_fuzz_factor; uint64 arithmetic wraps like the masked scalar version."""
+    seed = (np.asarray(flashcard_ids).astype(np.uint64) << np.uint64(32)) ^ np.asarray(reviews_counts).astype(np.uint64)
+
+    seed = seed + np.uint64(0x9E3779B97F4A7C15)
+    seed = (seed ^ (seed >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    seed = (seed ^ (seed >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    seed = seed ^ (seed >> np.uint64(31))
+
+    return (seed >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def get_fuzz_ranges(interval_days: np.ndarray, maximum_interval: int = MAXIMUM_INTERVAL) -> tuple[np.ndarray, np.ndarray]:
+    interval_days = np.asarray(interval_days, dtype=np.float64)
+
+    conditions = [interval_days < end for _, end, _, _ in FUZZ_RANGE_DELTAS]
+    choices = [
+        base_delta + factor * np.maximum(interval_days - start, 0.0)
+        for start, _, factor, base_delta in FUZZ_RANGE_DELTAS
+    ]
+    delta = np.select(conditions, choices, default=1.0)
+
+    min_ivl = np.round(interval_days - delta).astype(np.int64)
+    max_ivl = np.round(interval_days + delta).astype(np.int64)
+
+    min_ivl = np.maximum(2, min_ivl)
+    max_ivl = np.minimum(max_ivl, maximum_interval)
+    min_ivl = np.minimum(min_ivl, max_ivl)
+
+    return min_ivl, max_ivl
+
+
+def fuzz_intervals(
+    interval_days: np.ndarray,
+    flashcard_ids: np.ndarray,
+    reviews_counts: np.ndarray,
+    maximum_interval: int = MAXIMUM_INTERVAL,
+) -> np.ndarray:
+    """
+    Vectorized _get_fuzzed_interval over whole-day intervals, seeded per card
+    like FsrsParams.review. Intervals below 2.5 days are returned unchanged.
+    """
+    interval_days = np.asarray(interval_days, dtype=np.int64)
+
+    min_ivl, max_ivl = get_fuzz_ranges(interval_days, maximum_interval)
+    fuzz_factors = get_fuzz_factors(flashcard_ids, reviews_counts)
+
+    fuzzed = np.round(fuzz_factors * (max_ivl - min_ivl + 1) + min_ivl).astype(np.int64)
+    fuzzed = np.minimum(fuzzed, maximum_interval)
+
+    return np.where(interval_days < 2.5, interval_days, fuzzed)
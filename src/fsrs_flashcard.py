@@ -2,6 +2,9 @@ from src.fsrs_algorithm import FsrsParams
 from src.flashcard import Flashcard
 from src.fsrs_queue import FsrsQueue
 
+# How long a served card stays reserved for the session it was served to.
+CARD_LEASE_SECONDS = 60
+
 class FsrsFlashcard:
     fsrs: FsrsParams
     flashcard: Flashcard
@@ -1,6 +1,7 @@
-from sqlalchemy import JSON, Column, DateTime, Integer, Boolean, ForeignKey, Numeric, String, SmallInteger
+from sqlalchemy import DDL, JSON, Column, DateTime, Float, Index, Integer, Boolean, ForeignKey, Numeric, String, SmallInteger
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from sqlalchemy import column, event, table
 
 Base = declarative_base()
 
@@ -9,7 +10,7 @@ class FlashcardModel(Base):
     __tablename__ = 'flashcards'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(String, nullable=False)
+    user_id = Column(String, nullable=False, index=True)
     content = Column(String, nullable=False)
     
     # Relacja z FsrsModel
@@ -27,7 +28,7 @@ class FsrsModel(Base):
     flashcard_id = Column(Integer, ForeignKey('flashcards.id'), nullable=False, unique=True)
     flashcard = relationship("FlashcardModel", back_populates="fsrs")
     is_pending = Column(Boolean, nullable=False)
-    difficulty = Column(Numeric(precision=6, scale=4), nullable=False)
+    difficulty = Column(Numeric(precision=6, scale=4), nullable=True)
     stability = Column(Numeric(precision=15, scale=6), nullable=True)
     state = Column(String(1), nullable=False)
     due = Column(Integer, nullable=True, index=True)
@@ -37,6 +38,7 @@ class FsrsModel(Base):
     last_review = Column(Integer, nullable=True)
     blocked_until = Column(Integer, nullable=True)
     freshness_score = Column(Integer)
+    freshness_rank = Column(Float, nullable=True)
     updated_at = Column(DateTime, nullable=False)
 
     def __repr__(self):
@@ -49,10 +51,53 @@ class FsrsModel(Base):
             due={self.due}, 
             reviews_count={self.reviews_count},
             last_rating={self.last_rating},
-            freshness_score={self.freshness_score})>
+            freshness_score={self.freshness_score},
+            freshness_rank={self.freshness_rank})>
         )
         """
-    
+
+
+Index('ix_fsrs_user_id_freshness_rank', FsrsModel.user_id, FsrsModel.freshness_rank.desc())
+Index('ix_fsrs_user_id_due', FsrsModel.user_id, FsrsModel.due, FsrsModel.flashcard_id)
+
+# One partial index per branch of FsrsQueueMapper.queue_branches. The WHERE
+# clauses must stay textually identical to the query predicates, otherwise
+# neither Postgres nor SQLite will consider the index.
+_REVIEW_STATE = FsrsModel.state == '2'
+_LEARNING_STATE = FsrsModel.state.in_(('1', '3'))
+_PENDING = FsrsModel.is_pending.is_(True)
+
+Index('ix_fsrs_review_queue', FsrsModel.user_id, FsrsModel.is_pending, FsrsModel.due, postgresql_where=_REVIEW_STATE, sqlite_where=_REVIEW_STATE)
+Index('ix_fsrs_learning_queue', FsrsModel.user_id, FsrsModel.is_pending, FsrsModel.due, postgresql_where=_LEARNING_STATE, sqlite_where=_LEARNING_STATE)
+Index('ix_fsrs_pending_queue', FsrsModel.user_id, FsrsModel.due, postgresql_where=_PENDING, sqlite_where=_PENDING)
+
+# Full-text index over flashcards.content for FsrsRepository.search_cards. It is
+# an external content FTS5 table, so it stores only the index and the triggers
+# keep it in sync with every insert, update and delete, bulk ones included.
+# user_id is stored UNINDEXED so searches are scoped to one user inside the
+# FTS query instead of matching every user's cards first.
+# Other databases fall back to LIKE and get no index here.
+FLASHCARDS_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS flashcards_fts USING fts5(content, user_id UNINDEXED, content='flashcards', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    """CREATE TRIGGER IF NOT EXISTS flashcards_fts_insert AFTER INSERT ON flashcards BEGIN
+        INSERT INTO flashcards_fts(rowid, content, user_id) VALUES (new.id, new.content, new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS flashcards_fts_delete AFTER DELETE ON flashcards BEGIN
+        INSERT INTO flashcards_fts(flashcards_fts, rowid, content, user_id) VALUES ('delete', old.id, old.content, old.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS flashcards_fts_update AFTER UPDATE OF content, user_id ON flashcards BEGIN
+        INSERT INTO flashcards_fts(flashcards_fts, rowid, content, user_id) VALUES ('delete', old.id, old.content, old.user_id);
+        INSERT INTO flashcards_fts(rowid, content, user_id) VALUES (new.id, new.content, new.user_id);
+    END""",
+]
+
+FLASHCARDS_FTS = table("flashcards_fts", column("rowid"), column("flashcards_fts"), column("user_id"), column("rank"))
+
+for statement in FLASHCARDS_FTS_DDL:
+    event.listen(FlashcardModel.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+event.listen(FlashcardModel.__table__, "before_drop", DDL("DROP TABLE IF EXISTS flashcards_fts").execute_if(dialect="sqlite"))
+
 
 class UserFsrsModel(Base):
     __tablename__ = 'user_fsrs'
@@ -60,4 +105,16 @@ class UserFsrsModel(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(String, nullable=False, unique=True)
     payload = Column(JSON, nullable=False)
-    updated_at = Column(DateTime, nullable=False)
\ No newline at end of file
+    updated_at = Column(DateTime, nullable=False)
+    # MIN(fsrs.due) of the user's cards, kept up to date by FsrsRepository.
+    next_due_at = Column(Integer, nullable=True, index=True)
+
+class ReviewEventModel(Base):
+    """Outbox of review events, filled by OutboxEventBus and emptied by its drain()."""
+    __tablename__ = 'review_events'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, nullable=False)
+    type = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False)
@@ -0,0 +1,228 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from itertools import repeat
+from time import perf_counter
+import math
+import multiprocessing
+import os
+import random
+
+from src.fsrs_algorithm import DEFAULT_PARAMETERS, DEFAULT_SCHEDULER_SETTINGS, FsrsParams
+from src.rating import Rating
+
+PARITY_CHUNK_SIZE = 1000
+MAX_REVIEWS = 20
+# Relative tolerance for stability and difficulty; states and steps must
+# match exactly.
+PARITY_REL_TOL = 1e-9
+# Tolerance for due and last_review. Intervals come from float day counts
+# and the two implementations round them to datetimes differently, so dues
+# may land a fraction of a second apart; the manual comparison this harness
+# replaced accepted 1.5 s for the same reason.
+PARITY_DATETIME_TOL = timedelta(seconds=1.5)
+MAX_DIVERGENCES = 100
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+LEARNING_STEPS = (timedelta(minutes=1), timedelta(minutes=10))
+RELEARNING_STEPS = (timedelta(minutes=10),)
+
+# Gaps between reviews: within learning steps, within a few days, and long
+# enough to reach maximum intervals.
+REVIEW_GAPS = ((0, 15 * 60), (15 * 60, 3 * 86400), (3 * 86400, 400 * 86400))
+
+FIELDS = ("state", "step", "stability", "difficulty", "due", "last_review")
+
+
+@dataclass(frozen=True)
+class Divergence:
+    seed: int
+    review: int
+    field: str
+    ours: object
+    reference: object
+
+
+@dataclass
+class ParityReport:
+    sequences: int = 0
+    reviews: int = 0
+    divergent_sequences: int = 0
+    divergences: list[Divergence] = field(default_factory=list)
+    ours_seconds: float = 0.0
+    reference_seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.divergent_sequences == 0
+
+    @property
+    def ours_reviews_per_second(self) -> float:
+        return self.reviews / self.ours_seconds if self.ours_seconds else 0.0
+
+    @property
+    def reference_reviews_per_second(self) -> float:
+        return self.reviews / self.reference_seconds if self.reference_seconds else 0.0
+
+    def merge(self, other: 'ParityReport', max_divergences: int = MAX_DIVERGENCES):
+        self.sequences += other.sequences
+        self.reviews += other.reviews
+        self.divergent_sequences += other.divergent_sequences
+        self.divergences.extend(other.divergences[:max_divergences - len(self.divergences)])
+        self.ours_seconds += other.ours_seconds
+        self.reference_seconds += other.reference_seconds
+
+
+def get_rating_sequence(seed: int, max_reviews: int = MAX_REVIEWS) -> list[tuple[Rating, datetime]]:
+    """Random ratings and review times, the same for a seed on every platform."""
+    generator = random.Random(seed)
+    reviewed_at = START
+    sequence = []
+
+    for _ in range(generator.randint(1, max_reviews)):
+        low, high = generator.choice(REVIEW_GAPS)
+        reviewed_at += timedelta(seconds=generator.randint(low, high))
+        sequence.append((Rating(generator.randint(1, 4)), reviewed_at))
+
+    return sequence
+
+
+def replay_ours(seed: int, sequence: list[tuple[Rating, datetime]]) -> list[tuple]:
+    fsrs = FsrsParams.new_fsrs(flashcard_id=seed, user_id="parity", learning_steps=LEARNING_STEPS, relearning_steps=RELEARNING_STEPS)
+    fsrs.due = START
+    states = []
+
+    for rating, reviewed_at in sequence:
+        fsrs.review(rating, reviewed_at)
+        fsrs.newly_created = False
+        states.append((fsrs.state.value, fsrs.step, fsrs.stability, fsrs.difficulty, fsrs.due, fsrs.last_review))
+
+    return states
+
+
+def replay_reference(scheduler, seed: int, sequence: list[tuple[Rating, datetime]]) -> list[tuple]:
+    from fsrs import Card, Rating as FsrsRating
+
+    card = Card(card_id=seed, due=START)
+    states = []
+
+    for rating, reviewed_at in sequence:
+        card, _ = scheduler.review_card(card, FsrsRating(rating.value), reviewed_at)
+        states.append((card.state.value, card.step, card.stability, card.difficulty, card.due, card.last_review))
+
+    return states
+
+
+def get_reference_scheduler():
+    from fsrs import Scheduler
+
+    return Scheduler(
+        parameters=tuple(DEFAULT_PARAMETERS),
+        desired_retention=DEFAULT_SCHEDULER_SETTINGS.desired_retention,
+        learning_steps=LEARNING_STEPS,
+        relearning_steps=RELEARNING_STEPS,
+        maximum_interval=DEFAULT_SCHEDULER_SETTINGS.maximum_interval,
+        enable_fuzzing=False,
+    )
+
+
+def find_divergence(seed: int, ours: list[tuple], reference: list[tuple], rel_tol: float = PARITY_REL_TOL, datetime_tol: timedelta = PARITY_DATETIME_TOL) -> Divergence|None:
+    """The first field that differs; later reviews only repeat its consequences."""
+    for review, (ours_state, reference_state) in enumerate(zip(ours, reference)):
+        for name, ours_value, reference_value in zip(FIELDS, ours_state, reference_state):
+            if isinstance(ours_value, float) and isinstance(reference_value, float):
+                same = math.isclose(ours_value, reference_value, rel_tol=rel_tol)
+            elif isinstance(ours_value, datetime) and isinstance(reference_value, datetime):
+                same = abs(ours_value - reference_value) <= datetime_tol
+            else:
+                same = ours_value == reference_value
+
+            if not same:
+                return Divergence(seed, review, name, ours_value, reference_value)
+
+    return None
+
+
+def _compare_range(start: int, count: int, max_reviews: int, rel_tol: float, datetime_tol: timedelta, max_divergences: int) -> ParityReport:
+    scheduler = get_reference_scheduler()
+    sequences = [(seed, get_rating_sequence(seed, max_reviews)) for seed in range(start, start + count)]
+    report = ParityReport(sequences=count, reviews=sum(len(sequence) for _, sequence in sequences))
+
+    # Each side runs over the whole chunk on its own so the timings do not
+    # include the other implementation or the comparison.
+    started = perf_counter()
+    ours = [replay_ours(seed, sequence) for seed, sequence in sequences]
+    report.ours_seconds = perf_counter() - started
+
+    started = perf_counter()
+    reference = [replay_reference(scheduler, seed, sequence) for seed, sequence in sequences]
+    report.reference_seconds = perf_counter() - started
+
+    for (seed, _), ours_states, reference_states in zip(sequences, ours, reference):
+        divergence = find_divergence(seed, ours_states, reference_states, rel_tol, datetime_tol)
+        if divergence is not None:
+            report.divergent_sequences += 1
+            if len(report.divergences) < max_divergences:
+                report.divergences.append(divergence)
+
+    return report
+
+
+class ParityHarness:
+    """
+    Differential test of FsrsParams against the reference fsrs package.
+
+    Seeded random rating sequences are replayed through both
+    implementations with fuzzing off, and every review's state, step,
+    stability, difficulty, due and last_review are compared, the floats
+    within rel_tol and the datetimes within datetime_tol. Seeds are split
+    into chunks replayed in spawn-started worker processes; a divergence names
+    its seed, so get_rating_sequence(seed) reproduces it. The report also
+    carries the time each implementation spent, for throughput comparisons.
+    """
+
+    def __init__(self, workers: int|None = None, chunk_size: int = PARITY_CHUNK_SIZE, max_reviews: int = MAX_REVIEWS, rel_tol: float = PARITY_REL_TOL, datetime_tol: timedelta = PARITY_DATETIME_TOL, max_divergences: int = MAX_DIVERGENCES):
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_reviews = max_reviews
+        self.rel_tol = rel_tol
+        self.datetime_tol = datetime_tol
+        self.max_divergences = max_divergences
+
+    def run(self, sequences: int, seed: int = 0) -> ParityReport:
+        starts = list(range(seed, seed + sequences, self.chunk_size))
+        counts = [min(self.chunk_size, seed + sequences - start) for start in starts]
+        arguments = (starts, counts, repeat(self.max_reviews), repeat(self.rel_tol), repeat(self.datetime_tol), repeat(self.max_divergences))
+        report = ParityReport()
+
+        if self.workers == 1:
+            for chunk_report in map(_compare_range, *arguments):
+                report.merge(chunk_report, self.max_divergences)
+            return report
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(self.workers, mp_context=context) as executor:
+            for chunk_report in executor.map(_compare_range, *arguments):
+                report.merge(chunk_report, self.max_divergences)
+
+        return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare FsrsParams with the reference fsrs package.")
+    parser.add_argument("--sequences", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-reviews", type=int, default=MAX_REVIEWS)
+    args = parser.parse_args()
+
+    report = ParityHarness(workers=args.workers, max_reviews=args.max_reviews).run(args.sequences, args.seed)
+
+    print(f"{report.sequences} sequences, {report.reviews} reviews, {report.divergent_sequences} divergent")
+    print(f"ours: {report.ours_reviews_per_second:,.0f} reviews/s, reference: {report.reference_reviews_per_second:,.0f} reviews/s (per worker)")
+    for divergence in report.divergences:
+        print(divergence)
+
+    raise SystemExit(0 if report.ok else 1)
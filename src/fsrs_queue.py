@@ -1,8 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
 from src.queue_type import QueueType
 
-@dataclass
+@dataclass(frozen=True)
 class FsrsQueue:
     type: QueueType
     is_pending: bool 
@@ -13,6 +13,12 @@ class FsrsQueue:
     def is_available(self) -> bool:
         return self.daily_count < self.daily_limit
 
+    def matches(self, queue: 'FsrsQueue') -> bool:
+        return self.type == queue.type and self.is_pending == queue.is_pending
+
+    def increment(self) -> 'FsrsQueue':
+        return replace(self, daily_count=self.daily_count + 1, transform_to_not_pending=False)
+
     def to_fsrs_filters(self) -> list[str]:
         if self.is_pending:
             return [
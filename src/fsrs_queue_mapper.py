@@ -1,4 +1,5 @@
 
+from dataclasses import dataclass, replace
 from datetime import timezone
 from src.fsrs_algorithm import FsrsParams
 from src.fsrs_queue import FsrsQueue
@@ -7,9 +8,28 @@ from datetime import datetime
 from src.fsrs_model import FsrsModel
 from sqlalchemy import BinaryExpression, case
 from sqlalchemy.sql.elements import ColumnElement
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, literal, or_
 from src.state import State
 
+# fsrs.state is a String(1) column. The values are rendered inline so that
+# Postgres compares text with text and planners can match the predicates of
+# the partial queue indexes in fsrs_model.
+REVIEW_STATES = (str(State.REVIEW.value),)
+LEARNING_STATES = (str(State.LEARNING.value), str(State.RELEARNING.value))
+
+
+@dataclass(frozen=True)
+class QueueBranch:
+    condition: ColumnElement
+    # Matches cards without an fsrs row, so it has to start from flashcards.
+    unscheduled: bool = False
+
+
+def state_in(states: tuple[str, ...]) -> ColumnElement:
+    if len(states) == 1:
+        return FsrsModel.state == literal(states[0], literal_execute=True)
+    return FsrsModel.state.in_([literal(state, literal_execute=True) for state in states])
+
 
 class FsrsQueueMapper:
 
@@ -32,43 +52,40 @@ class FsrsQueueMapper:
         return or_(*conditions)
 
     def queue_condition(self, queue: FsrsQueue, now: datetime):
-        conditions = []
-
+        return or_(*[branch.condition for branch in self.queue_branches(queue, now)])
+
+    def queue_branches(self, queue: FsrsQueue, now: datetime) -> list[QueueBranch]:
+        """
+        Split queue_condition into branches without OR, in serving order. Each
+        branch matches one partial index, so it can be answered by a range
+        scan ordered by due instead of a scan over all of the user's cards.
+        """
         if queue.type == QueueType.DUE:
-            conditions.extend(and_(*[
+            return [QueueBranch(and_(
                 FsrsModel.is_pending.is_(queue.is_pending),
-                FsrsModel.state == State.REVIEW.value,
+                state_in(REVIEW_STATES),
                 FsrsModel.due <= now.timestamp(),
-            ]))
+            ))]
 
-        elif queue.type == QueueType.LEARNING:
-            conditions.extend(and_(*[
+        if queue.type == QueueType.LEARNING:
+            return [QueueBranch(and_(
                 FsrsModel.is_pending.is_(queue.is_pending),
-                FsrsModel.state.in_([State.LEARNING.value, State.RELEARNING.value]),
+                state_in(LEARNING_STATES),
                 FsrsModel.due <= now.timestamp(),
-            ]))
+            ))]
 
-        elif queue.type == QueueType.NEW:
+        if queue.type == QueueType.NEW:
+            branches = [QueueBranch(FsrsModel.due.is_(None), unscheduled=True)]
 
             if not queue.is_pending:
-                conditions.append(
-                    or_(
-                        and_(
-                            FsrsModel.is_pending.is_(True),
-                            FsrsModel.due <= now.timestamp(),
-                        ),
-                        FsrsModel.due.is_(None),
-                    )
-                )
-            else:
-                conditions.append(
-                    FsrsModel.due.is_(None),
-                )
+                branches.append(QueueBranch(and_(
+                    FsrsModel.is_pending.is_(True),
+                    FsrsModel.due <= now.timestamp(),
+                )))
 
-        else:
-            raise ValueError(f"Invalid queue type: {queue.type}")
+            return branches
 
-        return and_(*conditions)
+        raise ValueError(f"Invalid queue type: {queue.type}")
         
     def get_queue_type(self, fsrs: FsrsParams, new_queue_available: bool) -> QueueType:
         now = datetime.now(timezone.utc)
@@ -81,4 +98,21 @@ class FsrsQueueMapper:
             return QueueType.LEARNING
         else:
             return QueueType.NEW
-    
+
+    def resolve_queue(self, fsrs: FsrsParams, available_queues: list[FsrsQueue]) -> FsrsQueue:
+        new_queue_available = any([queue for queue in available_queues if queue.type == QueueType.NEW])
+
+        queue_type = self.get_queue_type(fsrs, new_queue_available)
+
+        current_queue = next((queue for queue in available_queues if queue.type == queue_type and queue.is_pending == fsrs.is_pending), None)
+
+        if current_queue is None:
+            current_queue = next((queue for queue in available_queues if queue.type == queue_type), None)
+
+        if current_queue is None:
+            raise Exception(f"No matching queue found for type {queue_type} and is_pending={fsrs.is_pending}")
+
+        if new_queue_available and fsrs.is_pending:
+            current_queue = replace(current_queue, transform_to_not_pending=True)
+
+        return current_queue
@@ -2,86 +2,515 @@ from datetime import datetime
 from datetime import timezone
 from src.flashcard import Flashcard
 from src.fsrs_queue import FsrsQueue
-from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_queue_mapper import FsrsQueueMapper, QueueBranch
 from dataclasses import dataclass
-from src.fsrs_algorithm import FsrsParams
-from src.fsrs_flashcard import FsrsFlashcard
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from src.fsrs_model import FlashcardModel, FsrsModel
+from src.fsrs_algorithm import FsrsParams, SchedulerSettings, get_freshness_rank
+from src.fsrs_flashcard import FsrsFlashcard, CARD_LEASE_SECONDS
+from sqlalchemy import Integer
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.fsrs_model import FLASHCARDS_FTS, FlashcardModel, FsrsModel, UserFsrsModel
 from src.queue_type import QueueType
 from src.rating import Rating
 from src.state import State
 from datetime import timedelta
 from copy import copy
-from sqlalchemy import or_
-
-engine = create_engine('sqlite:///db.db')
-
-Session = sessionmaker(bind=engine)
+from sqlalchemy import and_, func, or_, select, tuple_, update
+import numpy as np
+from src.parameters_cache import ParametersCache
+from src.user_fsrs_repository import UserFsrsRepository
+from src.fsrs_batch import get_deck_retrievability, get_next_intervals, SECONDS_PER_DAY
+from src.db import Session
+from src.card_listing import CardCursor, CardFilter, CardPage, CardRow, CardSort
+from src.review_events import CardReviewed, add_to_outbox
 
 FRESHNESS_SCORE_RATIO = 1000000
+OUT_OF_SCHEDULE_OVERFETCH = 2
+CLAIM_CANDIDATES = 5
+CLAIM_ATTEMPTS = 3
+# Stays below SQLite's default limit of 999 bound variables per statement.
+IN_CLAUSE_CHUNK_SIZE = 500
+LIST_CARDS_LIMIT = 50
 
 @dataclass
 class FsrsRepository:
     queue_mapper: FsrsQueueMapper
+    # Defaults to a cache of its own, so per-user parameters always apply.
+    parameters_cache: ParametersCache|None = None
 
-    def get_next_card(self, user_id: str, available_queues: list[FsrsQueue], skip_blocked: bool = True, delay_seconds: int|None = None) -> FsrsFlashcard|None:
-        session = Session()
+    def __post_init__(self):
+        if self.parameters_cache is None:
+            self.parameters_cache = ParametersCache(UserFsrsRepository())
 
+    def get_next_card(self, user_id: str, available_queues: list[FsrsQueue], skip_blocked: bool = True, delay_seconds: int|None = None, lease_seconds: int|None = None) -> FsrsFlashcard|None:
         now = datetime.now(timezone.utc)
 
+        with Session() as session:
+            # One query per queue branch, tried in queue order. Each is a range
+            # scan over one partial index in due order, see
+            # FsrsQueueMapper.queue_branches, where a single OR over all queues
+            # would have to visit every card of the user.
+            for queue in available_queues:
+                for branch in self.queue_mapper.queue_branches(queue, now):
+                    query = self._branch_query(session, user_id, branch)\
+                        .filter(*self._availability_filters(now, skip_blocked, delay_seconds))
+
+                    if lease_seconds is None:
+                        result = query.limit(1).first()
+                    else:
+                        result = self._claim_first(query, user_id, lease_seconds)
+
+                    if result is not None:
+                        return self._map_fsrs_flashcard(result, user_id, available_queues)
+
+        return None
+
+    def _branch_query(self, session, user_id: str, branch: QueueBranch):
+        if branch.unscheduled:
+            return (
+                session.query(FlashcardModel, FsrsModel)
+                    .outerjoin(FsrsModel, FlashcardModel.id == FsrsModel.flashcard_id)
+                    .filter(FlashcardModel.user_id == user_id)
+                    .filter(branch.condition)
+                    .order_by(FlashcardModel.id)
+            )
+
+        return (
+            session.query(FlashcardModel, FsrsModel)
+                .join(FsrsModel, FlashcardModel.id == FsrsModel.flashcard_id)
+                .filter(FsrsModel.user_id == user_id)
+                .filter(branch.condition)
+                .order_by(FsrsModel.due, FsrsModel.id)
+        )
+
+    def claim(self, user_id: str, flashcard_id: int, lease_seconds: int = CARD_LEASE_SECONDS, reviews_count: int|None = None) -> bool:
+        """
+        Atomically block a card for `lease_seconds` so concurrent sessions of
+        the same user are not served it. Returns False when another session
+        holds an active lease. The lease is released by save().
+
+        With `reviews_count` the claim also fails when the card was reviewed
+        since the caller read it, so a stale candidate is never served.
+        """
+        now = datetime.now(timezone.utc).timestamp()
+        blocked_until = int(now + lease_seconds)
+
+        with Session() as session:
+            updated = session.query(FsrsModel)\
+                .filter(FsrsModel.user_id == user_id)\
+                .filter(FsrsModel.flashcard_id == flashcard_id)\
+                .filter(or_(FsrsModel.blocked_until <= now, FsrsModel.blocked_until.is_(None)))\
+                .filter(*([FsrsModel.reviews_count == reviews_count] if reviews_count is not None else []))\
+                .update({"blocked_until": blocked_until}, synchronize_session=False)
+
+            if updated == 0:
+                # Either the card is leased by someone else or it has no fsrs
+                # row yet. The unique flashcard_id decides who gets to insert;
+                # any other integrity error is a real failure and raises.
+                insert = postgresql_insert if session.get_bind().dialect.name == "postgresql" else sqlite_insert
+                inserted = session.execute(
+                    insert(FsrsModel)
+                        .values(self._to_claim_placeholder(user_id, flashcard_id, blocked_until))
+                        .on_conflict_do_nothing(index_elements=[FsrsModel.flashcard_id])
+                ).rowcount
+                session.commit()
+                return inserted == 1
+
+            session.commit()
+            return True
+
+    def _claim_first(self, query, user_id: str, lease_seconds: int) -> tuple[FlashcardModel, FsrsModel]|None:
+        for _ in range(CLAIM_ATTEMPTS):
+            candidates = query.limit(CLAIM_CANDIDATES).all()
+            # Hand the connection back before claiming, so a thread never
+            # holds two pooled connections at once. Loaded rows stay usable.
+            query.session.close()
+
+            if not candidates:
+                return None
+
+            for candidate in candidates:
+                reviews_count = candidate[1].reviews_count if candidate[1] is not None else 0
+                if self.claim(user_id, candidate[0].id, lease_seconds, reviews_count):
+                    return candidate
+
+        return None
+
+    def get_card_out_of_schedule(self, user_id: str, skip_blocked: bool = True, delay_seconds: int|None = None) -> FsrsParams|None:
+        with Session() as session:
+            now = datetime.now(timezone.utc)
+
+            # Walks ix_fsrs_user_id_freshness_rank from the top, so the first
+            # available card ends the scan. The rank key orders cards by their
+            # freshness score decayed to now, see get_freshness_rank.
+            result = (
+                session.query(FlashcardModel, FsrsModel)
+                    .join(FsrsModel, FlashcardModel.id == FsrsModel.flashcard_id)
+                    .filter(FsrsModel.user_id == user_id)
+                    .filter(FsrsModel.freshness_rank.is_not(None))
+                    .filter(*self._availability_filters(now, skip_blocked, delay_seconds))
+                    .order_by(FsrsModel.freshness_rank.desc())
+                    .limit(1)
+                    .first()
+            )
+
+            if result is None:
+                # Cards without a score sort last, same as NULLS LAST did before.
+                result = (
+                    session.query(FlashcardModel, FsrsModel)
+                        .outerjoin(FsrsModel, FlashcardModel.id == FsrsModel.flashcard_id)
+                        .filter(FlashcardModel.user_id == user_id)
+                        .filter(FsrsModel.freshness_rank.is_(None))
+                        .filter(*self._availability_filters(now, skip_blocked, delay_seconds))
+                        .limit(1)
+                        .first()
+                )
+
+            if result is None:
+                return None 
+
+            return self._map_params(result, user_id)
+
+    def get_out_of_schedule_batch(self, user_id: str, k: int, exclude_flashcard_ids: tuple[int, ...] | list[int] = (), delay_seconds: int|None = None, include_blocked: bool = False) -> list[FsrsParams]:
+        """
+        Up to k cards for practice outside the schedule, freshest first.
+        Cards leased by another session are left out unless `include_blocked`
+        is set, in which case they follow the available ones.
+        """
+        with Session() as session:
+            now = datetime.now(timezone.utc)
+            # Included blocked cards are only pushed to the back in memory, so
+            # the window is overfetched to leave room for them.
+            limit = k * OUT_OF_SCHEDULE_OVERFETCH if include_blocked else k
+            filters = self._availability_filters(now, not include_blocked, delay_seconds)
+
+            rows = (
+                session.query(FlashcardModel, FsrsModel)
+                    .join(FsrsModel, FlashcardModel.id == FsrsModel.flashcard_id)
+                    .filter(FsrsModel.user_id == user_id)
+                    .filter(FsrsModel.freshness_rank.is_not(None))
+                    .filter(FsrsModel.flashcard_id.not_in(exclude_flashcard_ids))
+                    .filter(*filters)
+                    .order_by(FsrsModel.freshness_rank.desc())
+                    .limit(limit)
+                    .all()
+            )
+
+            if len(rows) < limit:
+                rows += (
+                    session.query(FlashcardModel, FsrsModel)
+                        .outerjoin(FsrsModel, FlashcardModel.id == FsrsModel.flashcard_id)
+                        .filter(FlashcardModel.user_id == user_id)
+                        .filter(FsrsModel.freshness_rank.is_(None))
+                        .filter(FlashcardModel.id.not_in(exclude_flashcard_ids))
+                        .filter(*filters)
+                        .limit(limit - len(rows))
+                        .all()
+                )
+
+            def is_blocked(row: tuple[FlashcardModel, FsrsModel]) -> bool:
+                return row[1] is not None and row[1].blocked_until is not None and row[1].blocked_until > now.timestamp()
+
+            available = [row for row in rows if not is_blocked(row)]
+            blocked = [row for row in rows if is_blocked(row)]
+
+            return [self._map_params(row, user_id) for row in (available + blocked)[:k]]
+
+    def _availability_filters(self, now: datetime, skip_blocked: bool, delay_seconds: int|None) -> list:
+        filters = []
+
+        if skip_blocked:
+            filters.append(or_(FsrsModel.blocked_until <= now.timestamp(), FsrsModel.blocked_until.is_(None)))
+
         if delay_seconds is not None:
             now_with_delay = copy(now) - timedelta(seconds=delay_seconds)
+            filters.append(or_(FsrsModel.last_review <= now_with_delay.timestamp(), FsrsModel.last_review.is_(None)))
+
+        return filters
+
+    def list_cards(self, user_id: str, card_filter: CardFilter|None = None, after_cursor: CardCursor|None = None, limit: int = LIST_CARDS_LIMIT, sort: CardSort = CardSort.DUE) -> CardPage:
+        """
+        Page through a user's cards with keyset pagination, so every page costs
+        the same no matter how deep it is.
+
+        With CardSort.DUE cards without a due date come first by id, then
+        scheduled cards by (due, id). With CardSort.FRESHNESS scored cards come
+        first by decayed freshness (freshness_rank, highest first), then the
+        unscored ones by id. Each part is read from its own index.
+        """
+        if card_filter is None:
+            card_filter = CardFilter()
+
+        if sort == CardSort.DUE:
+            sort_column = FsrsModel.due
+            parts = [self._list_unsorted, self._list_by_due]
+            past_first_part = after_cursor is not None and after_cursor.value is not None
         else:
-            now_with_delay = None
+            sort_column = FsrsModel.freshness_rank
+            parts = [self._list_by_freshness, self._list_unsorted]
+            past_first_part = after_cursor is not None and after_cursor.value is None
+
+        if past_first_part:
+            parts = parts[1:]
+
+        with Session() as session:
+            rows = []
+            cursor = after_cursor
 
+            for part in parts:
+                rows += part(session, user_id, card_filter, cursor, limit - len(rows), sort_column)
+                if len(rows) == limit:
+                    break
+                # The next part starts from its beginning.
+                cursor = None
+
+        next_cursor = None
+        if len(rows) == limit:
+            value = getattr(rows[-1], sort_column.key)
+            next_cursor = CardCursor(float(value) if value is not None else None, rows[-1].flashcard_id)
+
+        return CardPage(rows=[self._map_card_row(row) for row in rows], next_cursor=next_cursor)
+
+    def _list_unsorted(self, session, user_id: str, card_filter: CardFilter, cursor: CardCursor|None, limit: int, sort_column) -> list:
+        # Includes cards without an fsrs row, so it starts from flashcards.
         query = (
-            session.query(FlashcardModel, FsrsModel)
+            self._card_rows(session)
                 .outerjoin(FsrsModel, FlashcardModel.id == FsrsModel.flashcard_id)
-                .filter(or_(FlashcardModel.user_id == user_id, FsrsModel.user_id == user_id))
-                .filter(self.queue_mapper.to_filters(available_queues, now))
-                .order_by(*self.queue_mapper.to_orders(available_queues, now))
+                .filter(FlashcardModel.user_id == user_id)
+                .filter(sort_column.is_(None))
+                .filter(*self._card_filters(card_filter, unscheduled=True))
+                .order_by(FlashcardModel.id)
         )
 
-        if skip_blocked:
-            query = query.filter(or_(FsrsModel.blocked_until <= now.timestamp(), FsrsModel.blocked_until.is_(None)))
+        if cursor is not None:
+            query = query.filter(FlashcardModel.id > cursor.flashcard_id)
+
+        return query.limit(limit).all()
+
+    def _list_by_due(self, session, user_id: str, card_filter: CardFilter, cursor: CardCursor|None, limit: int, sort_column) -> list:
+        query = (
+            self._scheduled_card_rows(session, user_id, card_filter)
+                .filter(FsrsModel.due.is_not(None))
+                .order_by(FsrsModel.due, FsrsModel.flashcard_id)
+        )
 
-        if now_with_delay is not None:
-            query = query.filter(or_(FsrsModel.last_review <= now_with_delay.timestamp(), FsrsModel.last_review.is_(None)))
+        if cursor is not None:
+            query = query.filter(tuple_(FsrsModel.due, FsrsModel.flashcard_id) > tuple_(cursor.value, cursor.flashcard_id))
 
-        result = query.limit(1).first()
+        return query.limit(limit).all()
 
-        if result is None:
-            return None 
+    def _list_by_freshness(self, session, user_id: str, card_filter: CardFilter, cursor: CardCursor|None, limit: int, sort_column) -> list:
+        query = (
+            self._scheduled_card_rows(session, user_id, card_filter)
+                .filter(FsrsModel.freshness_rank.is_not(None))
+                .order_by(FsrsModel.freshness_rank.desc(), FsrsModel.flashcard_id)
+        )
 
-        return self._map_fsrs_flashcard(result, user_id, available_queues)
+        if cursor is not None:
+            query = query.filter(or_(
+                FsrsModel.freshness_rank < cursor.value,
+                and_(FsrsModel.freshness_rank == cursor.value, FsrsModel.flashcard_id > cursor.flashcard_id),
+            ))
 
-    def get_card_out_of_schedule(self, user_id: str, skip_blocked: bool = True, delay_seconds: int|None = None) -> FsrsParams:
-        session = Session()
+        return query.limit(limit).all()
 
-        now = datetime.now(timezone.utc)
+    def search_cards(self, user_id: str, text: str, card_filter: CardFilter|None = None, due_before: datetime|None = None, limit: int = LIST_CARDS_LIMIT) -> list[CardRow]:
+        """
+        Full-text search over the user's cards, best matches first. Every word
+        of `text` has to occur in the card; the last one may be a prefix, so
+        results can follow the user's typing. Uses the flashcards_fts index on
+        SQLite and LIKE elsewhere.
+        """
+        words = text.split()
+        if not words:
+            return []
 
-        query = (
-            session.query(FlashcardModel, FsrsModel)
-                .outerjoin(FsrsModel, FlashcardModel.id == FsrsModel.flashcard_id)
-                .filter(or_(FlashcardModel.user_id == user_id, FsrsModel.user_id == user_id))
-                .order_by(
-                    FsrsModel.freshness_score.desc().nullslast()
+        if card_filter is None:
+            card_filter = CardFilter()
+
+        with Session() as session:
+            query = (
+                self._card_rows(session)
+                    .outerjoin(FsrsModel, FlashcardModel.id == FsrsModel.flashcard_id)
+                    .filter(FlashcardModel.user_id == user_id)
+                    .filter(*self._card_filters(card_filter, unscheduled=True))
+            )
+
+            if due_before is not None:
+                query = query.filter(FsrsModel.due <= due_before.timestamp())
+
+            if session.get_bind().dialect.name == "sqlite":
+                query = (
+                    query.join(FLASHCARDS_FTS, FLASHCARDS_FTS.c.rowid == FlashcardModel.id)
+                        .filter(FLASHCARDS_FTS.c.flashcards_fts.op("MATCH")(self._to_match_query(words)))
+                        .filter(FLASHCARDS_FTS.c.user_id == user_id)
+                        .order_by(FLASHCARDS_FTS.c.rank)
                 )
+            else:
+                query = query.filter(*[FlashcardModel.content.ilike(self._to_like_pattern(word), escape="\\") for word in words]).order_by(FlashcardModel.id)
+
+            return [self._map_card_row(row) for row in query.limit(limit).all()]
+
+    @staticmethod
+    def _to_match_query(words: list[str]) -> str:
+        # Quoting turns FTS5 syntax typed by users (AND, *, -, :) into text.
+        phrases = ['"' + word.replace('"', '""') + '"' for word in words]
+        phrases[-1] += "*"
+        return " ".join(phrases)
+
+    @staticmethod
+    def _to_like_pattern(word: str) -> str:
+        # Wildcards typed by users are matched literally.
+        return "%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+    def _scheduled_card_rows(self, session, user_id: str, card_filter: CardFilter):
+        return (
+            self._card_rows(session)
+                .join(FsrsModel, FlashcardModel.id == FsrsModel.flashcard_id)
+                .filter(FsrsModel.user_id == user_id)
+                .filter(*self._card_filters(card_filter, unscheduled=False))
         )
 
-        if skip_blocked:
-            query = query.filter(or_(FsrsModel.blocked_until <= now.timestamp(), FsrsModel.blocked_until.is_(None)))
+    def _card_filters(self, card_filter: CardFilter, unscheduled: bool) -> list:
+        # Cards without an fsrs row count as new, non pending learning cards.
+        filters = []
+
+        if card_filter.states is not None:
+            condition = FsrsModel.state.in_([str(state.value) for state in card_filter.states])
+            if unscheduled and State.LEARNING in card_filter.states:
+                condition = or_(condition, FsrsModel.state.is_(None))
+            filters.append(condition)
+
+        if card_filter.is_pending is not None:
+            condition = FsrsModel.is_pending.is_(card_filter.is_pending)
+            if unscheduled and not card_filter.is_pending:
+                condition = or_(condition, FsrsModel.is_pending.is_(None))
+            filters.append(condition)
+
+        return filters
+
+    def _card_rows(self, session):
+        return session.query(
+            FlashcardModel.id.label("flashcard_id"),
+            FlashcardModel.content,
+            FsrsModel.state,
+            FsrsModel.is_pending,
+            FsrsModel.due,
+            FsrsModel.stability,
+            FsrsModel.difficulty,
+            FsrsModel.reviews_count,
+            FsrsModel.freshness_score,
+            FsrsModel.freshness_rank,
+        )
 
-        result = query.limit(1).first()
+    def _map_card_row(self, row) -> CardRow:
+        if row.state is None:
+            return CardRow(
+                flashcard_id=row.flashcard_id,
+                content=row.content,
+                state=State.LEARNING,
+                is_pending=False,
+                due=None,
+                stability=None,
+                difficulty=None,
+                reviews_count=0,
+                freshness_score=0.0,
+            )
 
-        if result is None:
-            return None 
+        return CardRow(
+            flashcard_id=row.flashcard_id,
+            content=row.content,
+            state=State(int(row.state)),
+            is_pending=row.is_pending,
+            due=datetime.fromtimestamp(float(row.due), tz=timezone.utc) if row.due is not None else None,
+            stability=float(row.stability) if row.stability is not None else None,
+            difficulty=float(row.difficulty) if row.difficulty is not None else None,
+            reviews_count=row.reviews_count,
+            freshness_score=float(row.freshness_score or 0) / FRESHNESS_SCORE_RATIO,
+        )
+
+    def get_deck_retrievability(self, user_id: str, current_datetime: datetime|None = None, fractional_days: bool = False, chunk_size: int = 10000) -> tuple[np.ndarray, np.ndarray]:
+        if current_datetime is None:
+            current_datetime = datetime.now(timezone.utc)
+
+        statement = (
+            select(FsrsModel.flashcard_id, FsrsModel.stability, FsrsModel.last_review)
+                .where(FsrsModel.user_id == user_id)
+                .execution_options(yield_per=chunk_size)
+        )
+
+        parameters = self.get_parameters(user_id)
+        flashcard_ids = []
+        retrievabilities = []
+
+        with Session() as session:
+            for partition in session.execute(statement).partitions():
+                columns = np.array(partition, dtype=np.float64).reshape(-1, 3)
+                flashcard_ids.append(columns[:, 0].astype(np.int64))
+                retrievabilities.append(get_deck_retrievability(
+                    stability=columns[:, 1],
+                    last_review=columns[:, 2],
+                    current_timestamp=current_datetime.timestamp(),
+                    parameters=parameters,
+                    fractional_days=fractional_days,
+                ))
+
+        if not flashcard_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        return np.concatenate(flashcard_ids), np.concatenate(retrievabilities)
+
+    def get_due_histogram(self, user_id: str) -> dict[int, int]:
+        day = func.cast(FsrsModel.due / 86400, Integer)
+
+        with Session() as session:
+            rows = (
+                session.query(day, func.count())
+                    .filter(FsrsModel.user_id == user_id)
+                    .filter(FsrsModel.due.is_not(None))
+                    .group_by(day)
+                    .all()
+            )
+
+        return {int(due_day): count for due_day, count in rows}
+
+    def get_many(self, user_id: str, flashcard_ids: list[int]) -> dict[int, FsrsParams]:
+        """
+        FSRS state of the given cards in one IN query per chunk. Cards without
+        an fsrs row, or not owned by the user, get FsrsParams.new_fsrs defaults.
+        """
+        flashcard_ids = list(dict.fromkeys(flashcard_ids))
+        rows = {}
+
+        with Session() as session:
+            for start in range(0, len(flashcard_ids), IN_CLAUSE_CHUNK_SIZE):
+                chunk = flashcard_ids[start:start + IN_CLAUSE_CHUNK_SIZE]
+                rows.update(
+                    (model.flashcard_id, model)
+                    for model in session.query(FsrsModel)
+                        .filter(FsrsModel.user_id == user_id)
+                        .filter(FsrsModel.flashcard_id.in_(chunk))
+                )
+
+        return {
+            flashcard_id: self._to_params(flashcard_id, rows.get(flashcard_id), user_id)
+            for flashcard_id in flashcard_ids
+        }
+
+    def iter_user_cards(self, user_id: str, chunk_size: int = 1000):
+        with Session() as session:
+            query = (
+                session.query(FlashcardModel, FsrsModel)
+                    .outerjoin(FsrsModel, FlashcardModel.id == FsrsModel.flashcard_id)
+                    .filter(FlashcardModel.user_id == user_id)
+                    .yield_per(chunk_size)
+            )
 
-        return self._map_params(result, user_id)
+            for row in query:
+                yield self._map_flashcard(row), self._map_params(row, user_id)
 
-    def save(self, fsrs: FsrsParams):
+    def save(self, fsrs: FsrsParams, events: list[CardReviewed] = ()):
+        """`events` go to the outbox in the same transaction."""
         with Session() as session:
             model = (
                 session.query(FsrsModel)
@@ -89,22 +518,160 @@ class FsrsRepository:
                 .one_or_none()
             )
 
+            previous_due = model.due if model is not None else None
+
             if model is not None:
                 model = self.update(model,fsrs)
             else:
                 model = self._to_db(fsrs)
 
             session.add(model)
+            session.flush()
+            self._update_next_due_at(session, fsrs.user_id, previous_due, model.due)
+            add_to_outbox(session, events)
+            session.commit()
+
+    def save_many(self, fsrs_list: list[FsrsParams], events: list[CardReviewed] = ()):
+        with Session() as session:
+            for start in range(0, len(fsrs_list), IN_CLAUSE_CHUNK_SIZE):
+                chunk = fsrs_list[start:start + IN_CLAUSE_CHUNK_SIZE]
+
+                existing = {
+                    (model.user_id, model.flashcard_id): model
+                    for model in session.query(FsrsModel)
+                        .filter(FsrsModel.flashcard_id.in_([fsrs.flashcard_id for fsrs in chunk]))
+                }
+
+                for fsrs in chunk:
+                    model = existing.get((fsrs.user_id, fsrs.flashcard_id))
+
+                    if model is not None:
+                        self.update(model, fsrs)
+                    else:
+                        session.add(self._to_db(fsrs))
+
+            session.flush()
+            self.refresh_next_due_at(session, {fsrs.user_id for fsrs in fsrs_list})
+            add_to_outbox(session, events)
             session.commit()
 
+    def reschedule(self, user_id: str, settings: SchedulerSettings, chunk_size: int = 10000):
+        """
+        Recompute due dates of the user's REVIEW cards for new settings.
+
+        Dues are computed column-wise from (stability, last_review) and written
+        back with executemany updates keyed by primary key. Fuzzing and load
+        balancing are not reapplied.
+        """
+        statement = (
+            select(FsrsModel.id, FsrsModel.stability, FsrsModel.last_review)
+                .where(FsrsModel.user_id == user_id)
+                .where(FsrsModel.state == State.REVIEW.value)
+                .where(FsrsModel.is_pending.is_(False))
+                .where(FsrsModel.stability.is_not(None))
+                .where(FsrsModel.last_review.is_not(None))
+                .execution_options(yield_per=chunk_size)
+        )
+
+        parameters = self.get_parameters(user_id)
+        ids = []
+        dues = []
+
+        # Read everything first: SQLite cannot commit while a cursor is open.
+        with Session() as session:
+            for partition in session.execute(statement).partitions():
+                columns = np.array(partition, dtype=np.float64).reshape(-1, 3)
+                ids.append(columns[:, 0].astype(np.int64))
+                dues.append(columns[:, 2] + get_next_intervals(columns[:, 1], settings, parameters) * SECONDS_PER_DAY)
+
+        if not ids:
+            return
+
+        ids = np.concatenate(ids)
+        dues = np.concatenate(dues)
+        # Incremental exports pick up changed cards by updated_at.
+        now = datetime.now(timezone.utc)
+
+        with Session() as session:
+            for start in range(0, len(ids), chunk_size):
+                session.execute(update(FsrsModel), [
+                    {"id": id, "due": due, "updated_at": now}
+                    for id, due in zip(ids[start:start + chunk_size].tolist(), dues[start:start + chunk_size].tolist())
+                ])
+            self.refresh_next_due_at(session, [user_id])
+            session.commit()
+
+    def backfill_freshness_rank(self, chunk_size: int = 10000) -> int:
+        """
+        Fill freshness_rank of rows saved before it existed, so they sort by
+        freshness instead of after every ranked card. Returns the rows updated;
+        re-running it is harmless.
+        """
+        statement = (
+            select(FsrsModel.id, FsrsModel.freshness_score, FsrsModel.updated_at)
+                .where(FsrsModel.freshness_rank.is_(None))
+                .execution_options(yield_per=chunk_size)
+        )
+
+        # Read everything first: SQLite cannot commit while a cursor is open.
+        with Session() as session:
+            rows = [
+                {"id": id, "freshness_rank": get_freshness_rank((freshness_score or 0) / FRESHNESS_SCORE_RATIO, updated_at)}
+                for id, freshness_score, updated_at in session.execute(statement)
+            ]
+
+        with Session() as session:
+            for start in range(0, len(rows), chunk_size):
+                session.execute(update(FsrsModel), rows[start:start + chunk_size])
+            session.commit()
+
+        return len(rows)
+
+    def refresh_next_due_at(self, session, user_ids):
+        """Recompute user_fsrs.next_due_at of the given users from their cards."""
+        user_ids = list(user_ids)
+
+        for start in range(0, len(user_ids), IN_CLAUSE_CHUNK_SIZE):
+            session.execute(
+                update(UserFsrsModel)
+                    .where(UserFsrsModel.user_id.in_(user_ids[start:start + IN_CLAUSE_CHUNK_SIZE]))
+                    .values(next_due_at=self._min_due(UserFsrsModel.user_id))
+                    .execution_options(synchronize_session=False)
+            )
+
+    def _update_next_due_at(self, session, user_id: str, previous_due: float|None, due: float|None):
+        users = update(UserFsrsModel)\
+            .where(UserFsrsModel.user_id == user_id)\
+            .execution_options(synchronize_session=False)
+
+        if previous_due is not None and (due is None or due > previous_due):
+            # The card may have been the earliest one, only the index on
+            # (user_id, due) knows which card comes next.
+            session.execute(users
+                .where(UserFsrsModel.next_due_at >= previous_due)
+                .values(next_due_at=self._min_due(user_id)))
+
+        if due is not None:
+            session.execute(users
+                .where(or_(UserFsrsModel.next_due_at.is_(None), UserFsrsModel.next_due_at > due))
+                .values(next_due_at=due))
+
+    def _min_due(self, user_id):
+        return select(func.min(FsrsModel.due))\
+            .where(FsrsModel.user_id == user_id)\
+            .scalar_subquery()
+
     def update_freshness_score(self, user_id: str, flashcard: Flashcard, freshness_score: float):
+        now = datetime.now(timezone.utc)
+
         with Session() as session:
             session.query(FsrsModel)\
                 .filter(FsrsModel.user_id == user_id)\
                 .filter(FsrsModel.flashcard_id == flashcard.id)\
                 .update({
-                    "freshness_score": freshness_score,
-                    "updated_at": datetime.now(timezone.utc),
+                    "freshness_score": int(freshness_score * FRESHNESS_SCORE_RATIO),
+                    "freshness_rank": get_freshness_rank(freshness_score, now),
+                    "updated_at": now,
                 }, synchronize_session=False)
             session.commit()
 
@@ -119,48 +686,48 @@ class FsrsRepository:
         row.last_review = fsrs.last_review.timestamp() if fsrs.last_review else None
         row.step = fsrs.step
         row.freshness_score = int(fsrs.freshness_score * FRESHNESS_SCORE_RATIO)
+        row.freshness_rank = fsrs.freshness_rank()
+        row.blocked_until = None
         row.updated_at = fsrs.updated_at
         return row 
 
     def _to_db(self, fsrs: FsrsParams) -> FsrsModel:
-        return FsrsModel(
-            flashcard_id=fsrs.flashcard_id,
-            user_id=fsrs.user_id,
-            difficulty=fsrs.difficulty,
-            stability=fsrs.stability,
-            state=fsrs.state.value,
-            due=fsrs.due.timestamp() if fsrs.due else None,
-            reviews_count=fsrs.reviews_count,
-            last_rating=fsrs.last_rating.value if fsrs.last_rating else None,
-            is_pending=fsrs.is_pending,
-            last_review=fsrs.last_review.timestamp() if fsrs.last_review else None,
-            step=fsrs.step,
-            freshness_score=int(fsrs.freshness_score * FRESHNESS_SCORE_RATIO),
-            updated_at=fsrs.updated_at,
-        )
+        return FsrsModel(**self.to_row(fsrs))
+
+    def to_row(self, fsrs: FsrsParams) -> dict:
+        return {
+            "flashcard_id": fsrs.flashcard_id,
+            "user_id": fsrs.user_id,
+            "difficulty": fsrs.difficulty,
+            "stability": fsrs.stability,
+            "state": fsrs.state.value,
+            "due": fsrs.due.timestamp() if fsrs.due else None,
+            "reviews_count": fsrs.reviews_count,
+            "last_rating": fsrs.last_rating.value if fsrs.last_rating else None,
+            "is_pending": fsrs.is_pending,
+            "last_review": fsrs.last_review.timestamp() if fsrs.last_review else None,
+            "step": fsrs.step,
+            "freshness_score": int(fsrs.freshness_score * FRESHNESS_SCORE_RATIO),
+            "freshness_rank": fsrs.freshness_rank(),
+            "updated_at": fsrs.updated_at,
+        }
+
+    def _to_claim_placeholder(self, user_id: str, flashcard_id: int, blocked_until: int) -> dict:
+        # Keeps due NULL so the card stays in the NEW queue until reviewed.
+        return {
+            **self.to_row(FsrsParams.new_fsrs(flashcard_id=flashcard_id, user_id=user_id)),
+            "due": None,
+            "freshness_rank": None,
+            "blocked_until": blocked_until,
+        }
 
     def _map_fsrs_flashcard(self, result: tuple[FlashcardModel, FsrsModel], user_id: str, available_queues: list[FsrsQueue]) -> FsrsFlashcard:
-        new_queue_available = any([queue for queue in available_queues if queue.type == QueueType.NEW])
-
         fsrs = self._map_params(result, user_id)
 
-        queue_type = self.queue_mapper.get_queue_type(fsrs, new_queue_available)
-
-        current_queue = next((queue for queue in available_queues if queue.type == queue_type and queue.is_pending == fsrs.is_pending), None)
-
-        if current_queue is None:
-            current_queue = next((queue for queue in available_queues if queue.type == queue_type), None)
-
-        if current_queue is None:
-            raise Exception(f"No matching queue found for type {queue_type} and is_pending={fsrs.is_pending}")
-
-        if new_queue_available and fsrs.is_pending:
-            current_queue.transform_to_not_pending = True
-
         return FsrsFlashcard(
             fsrs=fsrs,
             flashcard=self._map_flashcard(result),
-            current_queue=current_queue,
+            current_queue=self.queue_mapper.resolve_queue(fsrs, available_queues),
         )
 
     def _map_flashcard(self, row: tuple[FlashcardModel, FsrsModel]) -> Flashcard:
@@ -171,15 +738,18 @@ class FsrsRepository:
         )
 
     def _map_params(self, row: tuple[FlashcardModel, FsrsModel], user_id: str) -> FsrsParams:
-        flashcard = row[0]
-        fsrs_data = row[1]
+        return self._to_params(row[0].id, row[1], user_id)
 
+    def _to_params(self, flashcard_id: int, fsrs_data: FsrsModel|None, user_id: str) -> FsrsParams:
         if fsrs_data is None:
-            return FsrsParams.new_fsrs(flashcard_id=flashcard.id, user_id=user_id)
+            fsrs = FsrsParams.new_fsrs(flashcard_id=flashcard_id, user_id=user_id)
+            fsrs.parameters = self.get_parameters(user_id)
+            return fsrs
 
         return FsrsParams(
-            flashcard_id=flashcard.id,
+            flashcard_id=flashcard_id,
             user_id=fsrs_data.user_id,
+            parameters=self.get_parameters(fsrs_data.user_id),
             difficulty=float(fsrs_data.difficulty) if fsrs_data.difficulty is not None else None,
             stability=float(fsrs_data.stability) if fsrs_data.stability is not None else None,
             due=datetime.fromtimestamp(float(fsrs_data.due), tz=timezone.utc) if fsrs_data.due else None,
@@ -189,9 +759,10 @@ class FsrsRepository:
             is_pending=fsrs_data.is_pending,
             last_review=datetime.fromtimestamp(fsrs_data.last_review, tz=timezone.utc) if fsrs_data.last_review else None,
             step=fsrs_data.step,
+            newly_created=fsrs_data.due is None,
             freshness_score=float(fsrs_data.freshness_score) / FRESHNESS_SCORE_RATIO if fsrs_data.freshness_score != 0 else 0.0,
             updated_at=fsrs_data.updated_at,
         )
 
-
-        
\ No newline at end of file
+    def get_parameters(self, user_id: str) -> tuple[float, ...]:
+        return self.parameters_cache.get(user_id)
@@ -1,10 +1,13 @@
+from typing import TYPE_CHECKING
 from src.user_fsrs import UserFsrs
-from src.user_fsrs_repository import UserFsrsRepository
 from datetime import datetime, timedelta
 
+if TYPE_CHECKING:
+    from src.user_fsrs_repository import UserFsrsRepository
+
 class FsrsResolver:
 
-    def __init__(self, user_fsrs_repository: UserFsrsRepository):
+    def __init__(self, user_fsrs_repository: 'UserFsrsRepository'):
         self.user_fsrs_repository = user_fsrs_repository
 
     def resolve(self, user_id: str) -> UserFsrs:
@@ -17,6 +20,8 @@ class FsrsResolver:
         if data.updated_at.day != datetime.now().day:
             user_fsrs = UserFsrs.new_fsrs(user_id)
             user_fsrs.id = data.id
+            user_fsrs.settings = data.settings
+            user_fsrs.parameters = data.parameters
             user_fsrs.updated_at = datetime.now()
             self.user_fsrs_repository.save(user_fsrs)
             return user_fsrs
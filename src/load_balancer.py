@@ -0,0 +1,84 @@
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+
+from src.fsrs_algorithm import get_fuzz_range, MAXIMUM_INTERVAL
+from src.fsrs_repository import FsrsRepository
+
+SECONDS_PER_DAY = 86400
+
+
+class DueLoadBalancer:
+    """
+    Spreads REVIEW intervals across the fuzz range to flatten due spikes.
+
+    Inside the range returned by get_fuzz_range it picks the day with the
+    fewest cards already due, preferring the unfuzzed interval on ties. Due
+    counts per user and UTC day are loaded once from the repository and then
+    kept up to date by move(), which FsrsParams.review calls after every
+    review it balances.
+    """
+
+    def __init__(self, fsrs_repository: FsrsRepository, max_users: int = 1000):
+        self.fsrs_repository = fsrs_repository
+        self.max_users = max_users
+
+        self._lock = Lock()
+        self._histograms: OrderedDict[str, Counter] = OrderedDict()
+
+    def balance(self, user_id: str, review_datetime: datetime, interval: timedelta, maximum_interval: int = MAXIMUM_INTERVAL) -> timedelta:
+        interval_days = interval.days
+
+        if interval_days < 2.5:
+            return interval
+
+        min_ivl, max_ivl = get_fuzz_range(interval_days, maximum_interval)
+        review_day = _to_day(review_datetime)
+
+        with self._lock:
+            histogram = self._histogram(user_id)
+            best_days = min(
+                range(min_ivl, max_ivl + 1),
+                key=lambda days: (histogram[review_day + days], abs(days - interval_days), days),
+            )
+
+        return timedelta(days=best_days)
+
+    def move(self, user_id: str, previous_due: datetime|None, due: datetime|None):
+        with self._lock:
+            histogram = self._histogram(user_id)
+
+            if previous_due is not None:
+                previous_day = _to_day(previous_due)
+                histogram[previous_day] -= 1
+                if histogram[previous_day] <= 0:
+                    del histogram[previous_day]
+
+            if due is not None:
+                histogram[_to_day(due)] += 1
+
+    def due_count(self, user_id: str, day: datetime) -> int:
+        with self._lock:
+            return self._histogram(user_id)[_to_day(day)]
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._histograms.pop(user_id, None)
+
+    def _histogram(self, user_id: str) -> Counter:
+        histogram = self._histograms.get(user_id)
+
+        if histogram is None:
+            histogram = Counter(self.fsrs_repository.get_due_histogram(user_id))
+            self._histograms[user_id] = histogram
+
+            while len(self._histograms) > self.max_users:
+                self._histograms.popitem(last=False)
+
+        self._histograms.move_to_end(user_id)
+
+        return histogram
+
+
+def _to_day(value: datetime) -> int:
+    return int(value.timestamp() // SECONDS_PER_DAY)
@@ -0,0 +1,49 @@
+from collections import OrderedDict
+from threading import Lock
+
+from src.fsrs_algorithm import DEFAULT_PARAMETERS, validate_parameters
+from src.user_fsrs_repository import UserFsrsRepository
+
+
+class ParametersCache:
+    """
+    LRU cache of validated per-user FSRS parameters.
+
+    Card mapping asks for the parameters of every row it loads; with the cache
+    the user_fsrs row is read and validated once per user until it is evicted
+    or invalidated.
+    """
+
+    def __init__(self, user_fsrs_repository: UserFsrsRepository, maxsize: int = 1024):
+        self.user_fsrs_repository = user_fsrs_repository
+        self.maxsize = maxsize
+
+        self._lock = Lock()
+        self._parameters: OrderedDict[str, tuple[float, ...]] = OrderedDict()
+
+    def get(self, user_id: str) -> tuple[float, ...]:
+        with self._lock:
+            parameters = self._parameters.get(user_id)
+            if parameters is not None:
+                self._parameters.move_to_end(user_id)
+                return parameters
+
+        user_fsrs = self.user_fsrs_repository.get_by_user_id(user_id)
+
+        if user_fsrs is None or user_fsrs.parameters is None:
+            parameters = DEFAULT_PARAMETERS
+        else:
+            parameters = validate_parameters(user_fsrs.parameters)
+
+        with self._lock:
+            self._parameters[user_id] = parameters
+            self._parameters.move_to_end(user_id)
+
+            while len(self._parameters) > self.maxsize:
+                self._parameters.popitem(last=False)
+
+        return parameters
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._parameters.pop(user_id, None)
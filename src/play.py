@@ -13,6 +13,7 @@ from src.fsrs_repository import FsrsRepository
 from src.user_fsrs_repository import UserFsrsRepository
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
+from collections import deque
 
 engine = create_engine('sqlite:///db.db')
 
@@ -27,17 +28,26 @@ review = Review(
 
 from src.rating import Rating
 
+OUT_OF_SCHEDULE_BATCH_SIZE = 10
+
+out_of_schedule = []
+recently_shown = deque(maxlen=OUT_OF_SCHEDULE_BATCH_SIZE)
+
 while True:
     card = review.find_next_card("test")
 
     if card is None:
-        card = review.fsrs_repository.get_card_out_of_schedule("test", skip_blocked=True, delay_seconds=20)
-        if card is None:
-            card = review.fsrs_repository.get_card_out_of_schedule("test", skip_blocked=False, delay_seconds=None)
+        if not out_of_schedule:
+            out_of_schedule = review.fsrs_repository.get_out_of_schedule_batch("test", OUT_OF_SCHEDULE_BATCH_SIZE, exclude_flashcard_ids=list(recently_shown))
+        if not out_of_schedule:
+            out_of_schedule = review.fsrs_repository.get_out_of_schedule_batch("test", OUT_OF_SCHEDULE_BATCH_SIZE, include_blocked=True)
 
-        if card is None:
+        if not out_of_schedule:
             raise Exception("No card found")
 
+        card = out_of_schedule.pop(0)
+        recently_shown.append(card.flashcard_id)
+
         print(card.flashcard_id)
 
         rating = input("Rating (1=Again, 2=Hard, 3=Good, 4=Easy): ")
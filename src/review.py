@@ -1,47 +1,128 @@
+from typing import TYPE_CHECKING
 from src.flashcard import Flashcard
-from src.fsrs_algorithm import FsrsParams
-from src.fsrs_flashcard import FsrsFlashcard
+from src.fsrs_algorithm import FsrsParams, SchedulerSettings, validate_parameters
+from src.fsrs_flashcard import FsrsFlashcard, CARD_LEASE_SECONDS
 from src.fsrs_resolver import FsrsResolver
-from src.fsrs_repository import FsrsRepository
 from src.rating import Rating
+from src.review_events import EventBus, OutboxEventBus, get_review_events
+from src.user_fsrs import UserFsrs
+from src.user_locks import UserLocks
 
-class Review:
+if TYPE_CHECKING:
+    # Storage layers pull in SQLAlchemy; Review only calls into them.
+    from src.fsrs_repository import FsrsRepository
+    from src.load_balancer import DueLoadBalancer
+    from src.write_behind import WriteBehindBuffer
 
-    def __init__(self, fsrs_resolver: FsrsResolver, fsrs_repository: FsrsRepository):
+class Review:
+    """
+    Safe to share between threads of a web server. Repositories open a new
+    session per call, queues are immutable snapshots, and the
+    resolve-review-save sequence of a user runs under that user's lock, so
+    concurrent reviews never overwrite each other's daily counts. Different
+    users proceed in parallel.
+    """
+
+    def __init__(self, fsrs_resolver: FsrsResolver, fsrs_repository: 'FsrsRepository', lease_seconds: int|None = CARD_LEASE_SECONDS, write_behind: 'WriteBehindBuffer|None' = None, load_balancer: 'DueLoadBalancer|None' = None, user_locks: UserLocks|None = None, event_bus: EventBus|OutboxEventBus|None = None):
         self.fsrs_resolver = fsrs_resolver
         self.fsrs_repository = fsrs_repository
+        self.lease_seconds = lease_seconds
+        self.write_behind = write_behind
+        self.load_balancer = load_balancer
+        self.user_locks = user_locks if user_locks is not None else UserLocks()
+        self.event_bus = event_bus
 
     def find_next_card(self, user_id: str) -> FsrsFlashcard:
-        user_fsrs = self.fsrs_resolver.resolve(user_id)
+        with self.user_locks.lock(user_id):
+            user_fsrs = self._resolve(user_id)
 
         available_queues = list(user_fsrs.get_available_queues())
 
-        card = self.fsrs_repository.get_next_card(user_id, available_queues, skip_blocked=True, delay_seconds=30)
+        card = self.fsrs_repository.get_next_card(user_id, available_queues, skip_blocked=True, delay_seconds=30, lease_seconds=self.lease_seconds)
         
         if card is None:
-            return self.fsrs_repository.get_next_card(user_id, available_queues, skip_blocked=False, delay_seconds=None)
+            # Cards leased by another session are never handed out twice.
+            return self.fsrs_repository.get_next_card(user_id, available_queues, skip_blocked=self.lease_seconds is not None, delay_seconds=None, lease_seconds=self.lease_seconds)
 
         return card
 
     def review(self, rating: Rating, card: FsrsFlashcard):
         fsrs = card.fsrs
 
-        if card.current_queue.transform_to_not_pending:
-            fsrs.activate_from_pending()
+        with self.user_locks.lock(fsrs.user_id):
+            user_fsrs = self._resolve(fsrs.user_id)
 
-        fsrs.review(rating)
+            fsrs.settings = user_fsrs.settings
 
-        user_fsrs = self.fsrs_resolver.resolve(card.fsrs.user_id)
+            if card.current_queue.transform_to_not_pending:
+                fsrs.activate_from_pending()
 
-        card.current_queue.daily_count += 1
+            previous_state = fsrs.state
 
-        user_fsrs.update_queue(card.current_queue)
+            fsrs.review(rating, load_balancer=self.load_balancer)
 
-        self.fsrs_resolver.user_fsrs_repository.save(user_fsrs)
+            user_fsrs.increment_queue(card.current_queue)
 
-        self.fsrs_repository.save(fsrs)
+            events = get_review_events(rating, previous_state, fsrs) if self.event_bus is not None else []
+            # Outbox events are written with the card, other buses get them after the save.
+            outbox_events = events if isinstance(self.event_bus, OutboxEventBus) else []
 
-    def update_out_of_schedule(self, rating: Rating, fsrs: FsrsParams):
-        fsrs.review_out_of_schedule(rating)
+            if self.write_behind is not None:
+                # The card keeps its lease until the buffered save releases it, so
+                # selection cannot serve it again in the meantime.
+                self.write_behind.save_user_fsrs(user_fsrs)
+                self.write_behind.save_fsrs(fsrs, outbox_events)
+            else:
+                self.fsrs_resolver.user_fsrs_repository.save(user_fsrs)
+
+                self.fsrs_repository.save(fsrs, outbox_events)
+
+            if events and not outbox_events:
+                self.event_bus.publish(events)
+
+    def update_settings(self, user_id: str, settings: SchedulerSettings):
+        with self.user_locks.lock(user_id):
+            user_fsrs = self._resolve(user_id)
+            user_fsrs.settings = settings
+
+            if self.write_behind is not None:
+                self.write_behind.save_user_fsrs(user_fsrs)
+                self.write_behind.flush()
+            else:
+                self.fsrs_resolver.user_fsrs_repository.save(user_fsrs)
 
-        self.fsrs_repository.save(fsrs)
\ No newline at end of file
+            self.fsrs_repository.reschedule(user_id, settings)
+
+        if self.load_balancer is not None:
+            self.load_balancer.invalidate(user_id)
+
+    def update_parameters(self, user_id: str, parameters: list[float]|None):
+        with self.user_locks.lock(user_id):
+            user_fsrs = self._resolve(user_id)
+            user_fsrs.parameters = validate_parameters(parameters) if parameters is not None else None
+
+            if self.write_behind is not None:
+                self.write_behind.save_user_fsrs(user_fsrs)
+                self.write_behind.flush()
+            else:
+                self.fsrs_resolver.user_fsrs_repository.save(user_fsrs)
+
+        self.fsrs_repository.parameters_cache.invalidate(user_id)
+
+    def update_out_of_schedule(self, rating: Rating, fsrs: FsrsParams):
+        with self.user_locks.lock(fsrs.user_id):
+            fsrs.review_out_of_schedule(rating)
+
+            # A direct save would be overwritten by an older buffered copy.
+            if self.write_behind is not None:
+                self.write_behind.save_fsrs(fsrs)
+            else:
+                self.fsrs_repository.save(fsrs)
+
+    def _resolve(self, user_id: str) -> UserFsrs:
+        if self.write_behind is not None:
+            user_fsrs = self.write_behind.get_pending_user_fsrs(user_id)
+            if user_fsrs is not None:
+                return user_fsrs
+
+        return self.fsrs_resolver.resolve(user_id)
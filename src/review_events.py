@@ -0,0 +1,180 @@
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Protocol
+
+from src.fsrs_algorithm import FsrsParams
+from src.rating import Rating
+from src.state import State
+
+if TYPE_CHECKING:
+    # Only async consumers need asyncio, which alone doubles the import time of Review.
+    import asyncio
+
+OUTBOX_BATCH_SIZE = 500
+
+
+@dataclass(frozen=True)
+class CardReviewed:
+    """Emitted for every review. Subclasses mark notable state transitions."""
+    event_type = "reviewed"
+
+    user_id: str
+    flashcard_id: int
+    rating: Rating
+    previous_state: State
+    state: State
+    reviewed_at: datetime
+    due: datetime
+    stability: float
+    difficulty: float
+    reviews_count: int
+
+    def to_payload(self) -> dict:
+        payload = asdict(self)
+        payload["rating"] = self.rating.value
+        payload["previous_state"] = self.previous_state.value
+        payload["state"] = self.state.value
+        payload["reviewed_at"] = self.reviewed_at.isoformat()
+        payload["due"] = self.due.isoformat()
+        return payload
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> 'CardReviewed':
+        return cls(**{
+            **payload,
+            "rating": Rating(payload["rating"]),
+            "previous_state": State(payload["previous_state"]),
+            "state": State(payload["state"]),
+            "reviewed_at": datetime.fromisoformat(payload["reviewed_at"]),
+            "due": datetime.fromisoformat(payload["due"]),
+        })
+
+
+@dataclass(frozen=True)
+class CardGraduated(CardReviewed):
+    """A learning or relearning card reached the REVIEW state."""
+    event_type = "graduated"
+
+
+@dataclass(frozen=True)
+class CardLapsed(CardReviewed):
+    """A card in the REVIEW state was forgotten."""
+    event_type = "lapsed"
+
+
+EVENT_TYPES = {event.event_type: event for event in (CardReviewed, CardGraduated, CardLapsed)}
+
+
+def get_review_events(rating: Rating, previous_state: State, fsrs: FsrsParams) -> list[CardReviewed]:
+    fields = dict(
+        user_id=fsrs.user_id,
+        flashcard_id=fsrs.flashcard_id,
+        rating=rating,
+        previous_state=previous_state,
+        state=fsrs.state,
+        reviewed_at=fsrs.last_review,
+        due=fsrs.due,
+        stability=fsrs.stability,
+        difficulty=fsrs.difficulty,
+        reviews_count=fsrs.reviews_count,
+    )
+
+    events = [CardReviewed(**fields)]
+
+    if previous_state in (State.LEARNING, State.RELEARNING) and fsrs.state == State.REVIEW:
+        events.append(CardGraduated(**fields))
+    elif previous_state == State.REVIEW and rating == Rating.VERY_HARD:
+        events.append(CardLapsed(**fields))
+
+    return events
+
+
+class EventBus(Protocol):
+    """Receives events once the review they describe has been saved."""
+
+    def publish(self, events: list[CardReviewed]): ...
+
+
+class AsyncQueueEventBus:
+    """
+    Hands events to asyncio consumers of one event loop. publish() may be
+    called from any thread; consumers await get() on the loop.
+    """
+
+    def __init__(self, loop: 'asyncio.AbstractEventLoop|None' = None, maxsize: int = 0):
+        import asyncio
+
+        self.loop = loop if loop is not None else asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def publish(self, events: list[CardReviewed]):
+        for event in events:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    async def get(self) -> CardReviewed:
+        return await self.queue.get()
+
+
+def add_to_outbox(session, events: list[CardReviewed]):
+    """
+    Adds review_events rows to the caller's session, so they commit or roll
+    back together with the card state the events describe.
+    """
+    from src.fsrs_model import ReviewEventModel
+
+    created_at = datetime.now()
+
+    session.add_all([
+        ReviewEventModel(
+            user_id=event.user_id,
+            type=event.event_type,
+            payload=event.to_payload(),
+            created_at=created_at,
+        )
+        for event in events
+    ])
+
+
+class OutboxEventBus:
+    """
+    Transactional outbox for consumers in other processes. Review does not
+    publish to it after the fact: events are written by add_to_outbox in the
+    transaction that saves the reviewed card, or in the write-behind batch
+    that does. drain() hands them over in id order and deletes each batch
+    once the handler returned, so a failing handler sees the batch again.
+    Only the ids it read are deleted: on Postgres a lower id can commit after
+    a higher one, and is then drained in a later batch.
+    Run a single drainer per database.
+    """
+
+    def drain(self, handler: Callable[[list[CardReviewed]], None], batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+        from src.db import Session
+        from src.fsrs_model import ReviewEventModel
+
+        drained = 0
+
+        with Session() as session:
+            while True:
+                rows = session.query(ReviewEventModel.id, ReviewEventModel.type, ReviewEventModel.payload)\
+                    .order_by(ReviewEventModel.id)\
+                    .limit(batch_size)\
+                    .all()
+
+                if not rows:
+                    return drained
+
+                handler([EVENT_TYPES[row.type].from_payload(row.payload) for row in rows])
+
+                session.query(ReviewEventModel)\
+                    .filter(ReviewEventModel.id.in_([row.id for row in rows]))\
+                    .delete(synchronize_session=False)
+                session.commit()
+                drained += len(rows)
+
+
+def encode_events(events: list[CardReviewed]) -> list[dict]:
+    return [{"type": event.event_type, "payload": event.to_payload()} for event in events]
+
+
+def decode_events(records: list[dict]) -> list[CardReviewed]:
+    return [EVENT_TYPES[record["type"]].from_payload(record["payload"]) for record in records]
@@ -0,0 +1,79 @@
+from pathlib import Path
+import json
+import os
+import time
+
+
+class ReviewJournal:
+    """
+    Append-only journal of pending writes, split into numbered segments.
+
+    Records are flushed to the OS on every append and fsynced in groups of
+    `fsync_every` records or every `fsync_interval` seconds, whichever comes
+    first. A crash can therefore lose at most one unsynced group.
+    """
+
+    def __init__(self, directory: str|Path, fsync_every: int = 64, fsync_interval: float = 0.05):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        segments = self.segments()
+        self._sequence = self._segment_sequence(segments[-1]) + 1 if segments else 1
+        self._file = self._open_segment()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def append(self, record: dict):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self._unsynced += 1
+
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def rotate(self) -> list[Path]:
+        """Close the current segment and return every segment written so far."""
+        self.sync()
+        self._file.close()
+
+        segments = self.segments()
+
+        self._sequence += 1
+        self._file = self._open_segment()
+
+        return segments
+
+    def discard(self, segments: list[Path]):
+        for segment in segments:
+            segment.unlink(missing_ok=True)
+
+    def segments(self) -> list[Path]:
+        return sorted(self.directory.glob("*.journal"), key=self._segment_sequence)
+
+    def replay(self):
+        for segment in self.segments():
+            with open(segment, encoding="utf-8") as file:
+                for line in file:
+                    # A torn last line means the write was never acknowledged.
+                    if not line.endswith("\n"):
+                        break
+                    yield json.loads(line)
+
+    def close(self):
+        self.sync()
+        self._file.close()
+
+    def _open_segment(self):
+        return open(self.directory / f"{self._sequence:012d}.journal", "a", encoding="utf-8")
+
+    @staticmethod
+    def _segment_sequence(segment: Path) -> int:
+        return int(segment.stem)
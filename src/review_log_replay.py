@@ -0,0 +1,170 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import repeat
+from pathlib import Path
+import multiprocessing
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from src.fsrs_algorithm import DEFAULT_PARAMETERS, DEFAULT_SCHEDULER_SETTINGS, FsrsParams, SchedulerSettings
+from src.rating import Rating
+
+REPLAY_PARTITION_SIZE = 200000
+SORT_CHUNK_SIZE = 1000000
+
+REVIEW_DTYPE = np.dtype([
+    ("timestamp", np.float64),
+    ("user", np.int32),
+    ("flashcard_id", np.int64),
+    ("rating", np.int8),
+])
+
+
+@dataclass
+class ReviewLog:
+    """
+    A review log stored as one structured .npy array and the sorted user_ids
+    its `user` field indexes, like a scheduler snapshot.
+    """
+    path: Path
+    reviews: np.ndarray
+    user_ids: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.reviews)
+
+    @staticmethod
+    def create(path: str|Path, timestamps, user_ids, flashcard_ids, ratings) -> 'ReviewLog':
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        users, codes = np.unique(np.asarray(user_ids, dtype=str), return_inverse=True)
+
+        reviews = open_memmap(path / "reviews.npy", mode="w+", dtype=REVIEW_DTYPE, shape=(len(codes),))
+        reviews["timestamp"] = timestamps
+        reviews["user"] = codes
+        reviews["flashcard_id"] = flashcard_ids
+        reviews["rating"] = ratings
+        reviews.flush()
+        del reviews
+
+        np.save(path / "users.npy", users)
+
+        return ReviewLog.open(path)
+
+    @staticmethod
+    def open(path: str|Path, file_name: str = "reviews.npy") -> 'ReviewLog':
+        path = Path(path)
+
+        return ReviewLog(
+            path=path,
+            reviews=np.load(path / file_name, mmap_mode="r"),
+            user_ids=np.load(path / "users.npy", mmap_mode="r"),
+        )
+
+
+def _replay_partition(path: Path, start: int, end: int, parameters: dict[str, list[float]], settings: dict[str, SchedulerSettings]) -> list[FsrsParams]:
+    log = ReviewLog.open(path, "reviews.sorted.npy")
+    reviews = log.reviews[start:end]
+
+    card_starts = np.flatnonzero(np.diff(reviews["flashcard_id"])) + 1
+    bounds = zip(np.concatenate(([0], card_starts)).tolist(), np.concatenate((card_starts, [len(reviews)])).tolist())
+
+    timestamps = reviews["timestamp"].tolist()
+    ratings = reviews["rating"].tolist()
+    flashcard_ids = reviews["flashcard_id"].tolist()
+    users = reviews["user"].tolist()
+
+    cards = []
+    for card_start, card_end in bounds:
+        user_id = str(log.user_ids[users[card_start]])
+
+        fsrs = FsrsParams.new_fsrs(flashcard_id=flashcard_ids[card_start], user_id=user_id)
+        fsrs.parameters = parameters.get(user_id, DEFAULT_PARAMETERS)
+        fsrs.settings = settings.get(user_id, DEFAULT_SCHEDULER_SETTINGS)
+
+        for i in range(card_start, card_end):
+            fsrs.review(Rating(ratings[i]), datetime.fromtimestamp(timestamps[i], timezone.utc))
+            fsrs.newly_created = False
+
+        cards.append(fsrs)
+
+    return cards
+
+
+class ReviewLogReplayer:
+    """
+    Recomputes the final FsrsParams of every card in a review log.
+
+    A sort pass writes the log ordered by (flashcard_id, timestamp) to
+    reviews.sorted.npy next to it. The sorted log is cut into partitions at
+    card boundaries and replayed in worker processes, which memory-map it
+    themselves, so only partition bounds and resulting cards cross process
+    boundaries. Each card is replayed with the same FsrsParams.review calls
+    the importer uses, so results match the scalar path exactly.
+
+    `parameters` maps user_id to FSRS parameters and `settings` to the
+    user's SchedulerSettings, like user_fsrs stores them; other users get the
+    defaults. Pass both for users with custom ones, or rebuild() overwrites
+    their dues with default intervals. Workers are started with "spawn" like
+    SchedulerPool.
+    """
+
+    def __init__(self, workers: int|None = None, partition_size: int = REPLAY_PARTITION_SIZE, parameters: dict[str, list[float]]|None = None, settings: dict[str, SchedulerSettings]|None = None):
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.partition_size = partition_size
+        self.parameters = parameters or {}
+        self.settings = settings or {}
+
+    def replay(self, log: ReviewLog):
+        """Yields lists of replayed cards, one per partition, in flashcard_id order."""
+        sorted_log = self.sort(log)
+        partitions = self.get_partitions(sorted_log)
+
+        if self.workers == 1:
+            for start, end in partitions:
+                yield _replay_partition(log.path, start, end, self.parameters, self.settings)
+            return
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(self.workers, mp_context=context) as executor:
+            starts, ends = zip(*partitions) if partitions else ((), ())
+            yield from executor.map(_replay_partition, repeat(log.path), starts, ends, repeat(self.parameters), repeat(self.settings))
+
+    def rebuild(self, log: ReviewLog, fsrs_repository) -> int:
+        """Overwrites the fsrs rows of every card in the log with its replayed state."""
+        cards = 0
+
+        for partition in self.replay(log):
+            fsrs_repository.save_many(partition)
+            cards += len(partition)
+
+        return cards
+
+    def sort(self, log: ReviewLog) -> ReviewLog:
+        reviews = log.reviews
+        order = np.lexsort((reviews["timestamp"], reviews["flashcard_id"]))
+
+        sorted_reviews = open_memmap(log.path / "reviews.sorted.npy", mode="w+", dtype=REVIEW_DTYPE, shape=(len(reviews),))
+        for start in range(0, len(order), SORT_CHUNK_SIZE):
+            sorted_reviews[start:start + SORT_CHUNK_SIZE] = reviews[order[start:start + SORT_CHUNK_SIZE]]
+        sorted_reviews.flush()
+        del sorted_reviews
+
+        return ReviewLog.open(log.path, "reviews.sorted.npy")
+
+    def get_partitions(self, sorted_log: ReviewLog) -> list[tuple[int, int]]:
+        if len(sorted_log) == 0:
+            return []
+
+        card_starts = np.flatnonzero(np.diff(sorted_log.reviews["flashcard_id"])) + 1
+
+        # Move each cut forward to the next card start so no card is split.
+        cuts = np.searchsorted(card_starts, np.arange(self.partition_size, len(sorted_log), self.partition_size))
+        cuts = np.unique(card_starts[cuts[cuts < len(card_starts)]])
+
+        bounds = [0, *cuts.tolist(), len(sorted_log)]
+        return list(zip(bounds[:-1], bounds[1:]))
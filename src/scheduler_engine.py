@@ -0,0 +1,301 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from copy import copy, deepcopy
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from queue import Queue
+from threading import Lock, Thread
+import heapq
+import logging
+import time
+
+from src.flashcard import Flashcard
+from src.fsrs_algorithm import FsrsParams
+from src.fsrs_flashcard import FsrsFlashcard
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository, CARD_LEASE_SECONDS
+from src.fsrs_resolver import FsrsResolver
+from src.load_balancer import DueLoadBalancer
+from src.queue_type import QueueType
+from src.rating import Rating
+from src.state import State
+from src.user_fsrs import UserFsrs
+from src.user_locks import UserLocks
+from src.write_behind import WriteBehindBuffer
+
+HeapKey = tuple[QueueType, bool]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _UserCards:
+    user_fsrs: UserFsrs
+    day: date
+    cards: dict[int, tuple[Flashcard, FsrsParams]] = field(default_factory=dict)
+    versions: dict[int, int] = field(default_factory=dict)
+    leased_until: dict[int, float] = field(default_factory=dict)
+    heaps: dict[HeapKey, list[tuple[float, int, int]]] = field(default_factory=dict)
+    last_access: float = 0.0
+
+
+class SchedulerEngine:
+    """
+    In-process alternative to FsrsRepository.get_next_card.
+
+    Every active user's cards are kept in one heap per (QueueType, is_pending)
+    pair, keyed by due timestamp, mirroring FsrsQueueMapper.queue_condition.
+    A card that matches several conditions sits in several heaps; stale heap
+    entries are skipped lazily through a per-card version number. Reviews are
+    applied in memory and written back to the repositories by a background
+    thread, so selection for warm users never touches SQL. With a
+    WriteBehindBuffer the writes go through its journal instead.
+
+    Cards added to the database after a user was warmed up are only picked up
+    after invalidate(user_id).
+
+    The engine lock only guards in-memory state. Loading a cold user, the
+    daily reset and the flushes they need run under that user's lock from
+    UserLocks instead, so other users' selection never waits on the database.
+    """
+
+    def __init__(
+        self,
+        fsrs_resolver: FsrsResolver,
+        fsrs_repository: FsrsRepository,
+        queue_mapper: FsrsQueueMapper|None = None,
+        max_users: int = 1000,
+        idle_seconds: int = 1800,
+        lease_seconds: int = CARD_LEASE_SECONDS,
+        write_behind: WriteBehindBuffer|None = None,
+        load_balancer: DueLoadBalancer|None = None,
+    ):
+        self.fsrs_resolver = fsrs_resolver
+        self.fsrs_repository = fsrs_repository
+        self.queue_mapper = queue_mapper if queue_mapper is not None else fsrs_repository.queue_mapper
+        self.max_users = max_users
+        self.idle_seconds = idle_seconds
+        self.lease_seconds = lease_seconds
+        self.write_behind = write_behind
+        self.load_balancer = load_balancer
+
+        self._lock = Lock()
+        self._user_locks = UserLocks()
+        self._users: OrderedDict[str, _UserCards] = OrderedDict()
+        self._writes: Queue = Queue()
+        self._writer = Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def get_next_card(self, user_id: str) -> FsrsFlashcard|None:
+        with self._locked_user(user_id) as user:
+            now = datetime.now(timezone.utc)
+            available_queues = list(user.user_fsrs.get_available_queues())
+
+            for queue in available_queues:
+                flashcard_id = self._pop_available(user, (queue.type, queue.is_pending), now.timestamp())
+                if flashcard_id is None:
+                    continue
+
+                flashcard, fsrs = user.cards[flashcard_id]
+                user.leased_until[flashcard_id] = now.timestamp() + self.lease_seconds
+
+                return FsrsFlashcard(
+                    fsrs=copy(fsrs),
+                    flashcard=flashcard,
+                    current_queue=self.queue_mapper.resolve_queue(fsrs, available_queues),
+                )
+
+            return None
+
+    def review(self, rating: Rating, card: FsrsFlashcard):
+        with self._locked_user(card.fsrs.user_id) as user:
+            _, fsrs = user.cards[card.fsrs.flashcard_id]
+            fsrs.settings = user.user_fsrs.settings
+
+            if card.current_queue.transform_to_not_pending:
+                fsrs.activate_from_pending()
+
+            fsrs.review(rating, load_balancer=self.load_balancer)
+            fsrs.newly_created = False
+
+            user.user_fsrs.increment_queue(card.current_queue)
+
+            user.leased_until.pop(fsrs.flashcard_id, None)
+            self._push(user, fsrs)
+
+            if self.write_behind is not None:
+                self.write_behind.save_fsrs(fsrs)
+                self.write_behind.save_user_fsrs(user.user_fsrs)
+            else:
+                self._writes.put((copy(fsrs), deepcopy(user.user_fsrs)))
+
+    def warm_up(self, user_id: str):
+        self._user(user_id)
+
+    def invalidate(self, user_id: str):
+        self.flush()
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def evict_idle(self, now: float|None = None):
+        if now is None:
+            now = time.monotonic()
+
+        self.flush()
+        with self._lock:
+            for user_id in [user_id for user_id, user in self._users.items() if now - user.last_access > self.idle_seconds]:
+                del self._users[user_id]
+
+    def flush(self):
+        self._writes.join()
+
+        if self.write_behind is not None:
+            self.write_behind.flush()
+
+    def close(self):
+        self.flush()
+        self._writes.put(None)
+        self._writer.join()
+
+    @contextmanager
+    def _locked_user(self, user_id: str):
+        while True:
+            user = self._user(user_id)
+            with self._lock:
+                # Retry if the user was evicted after _user returned it.
+                if self._users.get(user_id) is user:
+                    yield user
+                    return
+
+    def _user(self, user_id: str) -> _UserCards:
+        today = datetime.now().date()
+
+        with self._lock:
+            user = self._cached_user(user_id, today)
+        if user is not None:
+            return user
+
+        with self._user_locks.lock(user_id):
+            with self._lock:
+                user = self._cached_user(user_id, today)
+                stale = self._users.get(user_id)
+            if user is not None:
+                return user
+
+            # Daily counters are reset by the resolver, and a cold user is read
+            # from the database; pending writes must land first or they would
+            # overwrite the reset or be missing from the loaded deck.
+            self.flush()
+
+            if stale is not None:
+                user_fsrs = self.fsrs_resolver.resolve(user_id)
+                with self._lock:
+                    stale.user_fsrs = user_fsrs
+                    stale.day = today
+                    if self._users.get(user_id) is stale:
+                        return self._cached_user(user_id, today)
+
+            # Cold, or evicted or invalidated during the reset.
+            user = self._load(user_id)
+            with self._lock:
+                return self._insert(user_id, user)
+
+    def _cached_user(self, user_id: str, today: date) -> _UserCards|None:
+        user = self._users.get(user_id)
+        if user is None or user.day != today:
+            return None
+
+        self._users.move_to_end(user_id)
+        user.last_access = time.monotonic()
+        return user
+
+    def _insert(self, user_id: str, user: _UserCards) -> _UserCards:
+        # Evicted users are reloaded through _user, which flushes first.
+        while len(self._users) >= self.max_users and user_id not in self._users:
+            self._users.popitem(last=False)
+
+        self._users[user_id] = user
+        self._users.move_to_end(user_id)
+        user.last_access = time.monotonic()
+        return user
+
+    def _load(self, user_id: str) -> _UserCards:
+        user = _UserCards(
+            user_fsrs=self.fsrs_resolver.resolve(user_id),
+            day=datetime.now().date(),
+        )
+
+        for flashcard, fsrs in self.fsrs_repository.iter_user_cards(user_id):
+            user.cards[flashcard.id] = (flashcard, fsrs)
+            self._push(user, fsrs)
+
+        return user
+
+    def _push(self, user: _UserCards, fsrs: FsrsParams):
+        version = user.versions.get(fsrs.flashcard_id, 0) + 1
+        user.versions[fsrs.flashcard_id] = version
+
+        for key, due in self._heap_keys(fsrs):
+            heapq.heappush(user.heaps.setdefault(key, []), (due, fsrs.flashcard_id, version))
+
+    def _heap_keys(self, fsrs: FsrsParams) -> list[tuple[HeapKey, float]]:
+        # Same shapes as FsrsQueueMapper.queue_condition. Cards without a
+        # schedule (due IS NULL in the database) use 0 so they are always due.
+        if fsrs.newly_created:
+            return [((QueueType.NEW, False), 0.0), ((QueueType.NEW, True), 0.0)]
+
+        due = fsrs.due.timestamp()
+        keys = []
+
+        if fsrs.state == State.REVIEW:
+            keys.append(((QueueType.DUE, fsrs.is_pending), due))
+        elif fsrs.state in (State.LEARNING, State.RELEARNING):
+            keys.append(((QueueType.LEARNING, fsrs.is_pending), due))
+
+        if fsrs.is_pending:
+            keys.append(((QueueType.NEW, False), due))
+
+        return keys
+
+    def _pop_available(self, user: _UserCards, key: HeapKey, now: float) -> int|None:
+        heap = user.heaps.get(key)
+        if not heap:
+            return None
+
+        leased = []
+        found = None
+
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            _, flashcard_id, version = entry
+
+            if user.versions.get(flashcard_id) != version:
+                continue
+
+            # The entry stays valid until the card is reviewed; it is only
+            # taken out of the heap while we look past it.
+            leased.append(entry)
+
+            if user.leased_until.get(flashcard_id, 0) <= now:
+                found = flashcard_id
+                break
+
+        for entry in leased:
+            heapq.heappush(heap, entry)
+
+        return found
+
+    def _write_loop(self):
+        while True:
+            item = self._writes.get()
+            try:
+                if item is None:
+                    return
+
+                fsrs, user_fsrs = item
+                self.fsrs_repository.save(fsrs)
+                self.fsrs_resolver.user_fsrs_repository.save(user_fsrs)
+            except Exception:
+                logger.exception("Failed to persist review of card %s", item[0].flashcard_id)
+            finally:
+                self._writes.task_done()
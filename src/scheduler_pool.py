@@ -0,0 +1,145 @@
+from concurrent.futures import Future
+from itertools import count
+from threading import Lock, Thread
+import logging
+import multiprocessing
+import os
+import zlib
+
+from src.fsrs_flashcard import FsrsFlashcard
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.fsrs_resolver import FsrsResolver
+from src.parameters_cache import ParametersCache
+from src.rating import Rating
+from src.scheduler_engine import SchedulerEngine
+from src.user_fsrs_repository import UserFsrsRepository
+
+logger = logging.getLogger(__name__)
+
+WORKER_METHODS = ("get_next_card", "review", "warm_up", "invalidate", "flush")
+
+
+def create_scheduler_engine() -> SchedulerEngine:
+    user_fsrs_repository = UserFsrsRepository()
+
+    return SchedulerEngine(
+        fsrs_resolver=FsrsResolver(user_fsrs_repository),
+        fsrs_repository=FsrsRepository(FsrsQueueMapper(), ParametersCache(user_fsrs_repository)),
+    )
+
+
+def get_shard(user_id: str, shards: int) -> int:
+    # crc32 instead of hash(): str hashes are salted per process.
+    return zlib.crc32(user_id.encode("utf-8")) % shards
+
+
+def _serve(engine_factory, requests, responses):
+    engine = engine_factory()
+
+    try:
+        while True:
+            request = requests.get()
+            if request is None:
+                return
+
+            request_id, method, args = request
+            try:
+                responses.put((request_id, getattr(engine, method)(*args), None))
+            except Exception as error:
+                logger.exception("Scheduler worker call %s failed", method)
+                responses.put((request_id, None, RuntimeError(f"{method} failed: {error!r}")))
+    finally:
+        engine.close()
+
+
+class SchedulerPool:
+    """
+    Runs one SchedulerEngine per worker process and routes every call to the
+    worker owning the user, chosen by a stable hash of user_id.
+
+    A user's UserFsrs, card heaps and parameters only ever live in one
+    process, so workers never have to invalidate each other's caches and
+    throughput grows with the number of workers. Calls travel over one
+    request queue per worker and a shared response queue; they can be made
+    from several threads at once.
+
+    `engine_factory` runs inside the workers and must be importable by name,
+    as workers are started with the "spawn" method.
+    """
+
+    def __init__(self, workers: int|None = None, engine_factory=create_scheduler_engine, timeout: float|None = 30.0):
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.timeout = timeout
+
+        context = multiprocessing.get_context("spawn")
+        self._responses = context.Queue()
+        self._requests = [context.Queue() for _ in range(self.workers)]
+        self._processes = [
+            context.Process(target=_serve, args=(engine_factory, requests, self._responses), daemon=True)
+            for requests in self._requests
+        ]
+        for process in self._processes:
+            process.start()
+
+        self._ids = count()
+        self._lock = Lock()
+        self._pending: dict[int, Future] = {}
+        self._dispatcher = Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def get_next_card(self, user_id: str) -> FsrsFlashcard|None:
+        return self._call(user_id, "get_next_card", user_id)
+
+    def review(self, rating: Rating, card: FsrsFlashcard):
+        self._call(card.fsrs.user_id, "review", rating, card)
+
+    def warm_up(self, user_id: str):
+        self._call(user_id, "warm_up", user_id)
+
+    def invalidate(self, user_id: str):
+        self._call(user_id, "invalidate", user_id)
+
+    def flush(self):
+        futures = [self._submit(shard, "flush") for shard in range(self.workers)]
+        for future in futures:
+            future.result(self.timeout)
+
+    def close(self):
+        for requests in self._requests:
+            requests.put(None)
+        for process in self._processes:
+            process.join()
+
+        self._responses.put(None)
+        self._dispatcher.join()
+
+    def _call(self, user_id: str, method: str, *args):
+        return self._submit(get_shard(user_id, self.workers), method, *args).result(self.timeout)
+
+    def _submit(self, shard: int, method: str, *args) -> Future:
+        if method not in WORKER_METHODS:
+            raise ValueError(f"Unsupported scheduler call: {method}")
+
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+
+        self._requests[shard].put((request_id, method, args))
+        return future
+
+    def _dispatch(self):
+        while True:
+            response = self._responses.get()
+            if response is None:
+                return
+
+            request_id, result, error = response
+            with self._lock:
+                future = self._pending.pop(request_id)
+
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -0,0 +1,237 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+import json
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from sqlalchemy import func, insert, select, union
+
+from src.db import Session
+from src.fsrs_model import FsrsModel, UserFsrsModel
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_CHUNK_SIZE = 100000
+
+# Collations that order strings by code point, like np.unique and
+# np.searchsorted do on users.npy.
+CODE_POINT_COLLATIONS = {
+    "sqlite": "BINARY",
+    "postgresql": "C",
+}
+
+# Column name -> (dtype, value stored for NULL). Floats use NaN, which the
+# batch algorithm already reads as "missing". blocked_until is a lease and is
+# not part of the scheduler state.
+FSRS_COLUMNS = {
+    "user": (np.int32, None),
+    "flashcard_id": (np.int64, None),
+    "is_pending": (np.bool_, None),
+    "difficulty": (np.float64, np.nan),
+    "stability": (np.float64, np.nan),
+    "state": (np.int8, None),
+    "due": (np.float64, np.nan),
+    "reviews_count": (np.int32, None),
+    "step": (np.int16, -1),
+    "last_rating": (np.int8, 0),
+    "last_review": (np.float64, np.nan),
+    "freshness_score": (np.int64, -1),
+    "freshness_rank": (np.float64, np.nan),
+    "updated_at": (np.float64, np.nan),
+}
+
+
+@dataclass
+class Snapshot:
+    """
+    Scheduler state opened from a snapshot directory. Card columns are
+    read-only memory maps in (user_id, flashcard_id) order; `user` holds
+    indexes into `user_ids`.
+    """
+    path: Path
+    columns: dict[str, np.ndarray]
+    user_ids: np.ndarray
+    users: list[dict]
+
+    def __len__(self) -> int:
+        return len(self.columns["flashcard_id"])
+
+    def user_slice(self, user_id: str) -> slice:
+        code = np.searchsorted(self.user_ids, user_id)
+        if code == len(self.user_ids) or self.user_ids[code] != user_id:
+            return slice(0, 0)
+
+        users = self.columns["user"]
+        return slice(int(np.searchsorted(users, code, "left")), int(np.searchsorted(users, code, "right")))
+
+
+class SchedulerSnapshotter:
+    """
+    Dumps the fsrs and user_fsrs tables to a directory of .npy columns and
+    loads them back.
+
+    Columns are written through memory maps while rows stream from the
+    database, and opened with mmap_mode='r', so a snapshot of millions of
+    cards opens without reading it and feeds fsrs_batch directly. user_id is
+    dictionary-encoded against the sorted users.npy. user_fsrs rows are few
+    and nested, they go to user_fsrs.json.
+
+    Dump a database nobody writes to: rows changing between the count and
+    the read fail the dump. Restore expects tables without the snapshot's
+    rows; flashcards are not part of a snapshot and must already exist where
+    foreign keys are enforced.
+    """
+
+    def __init__(self, chunk_size: int = SNAPSHOT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def dump(self, path: str|Path) -> Snapshot:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        with Session() as session:
+            # Sorted here, not by the database, whose collation need not agree
+            # with the code point order np.searchsorted relies on.
+            user_ids = np.unique(np.array(session.scalars(
+                union(select(FsrsModel.user_id), select(UserFsrsModel.user_id))
+            ).all(), dtype=str))
+            cards = session.scalar(select(func.count()).select_from(FsrsModel))
+
+            users = [
+                {
+                    "user_id": row.user_id,
+                    "payload": row.payload,
+                    "updated_at": row.updated_at.isoformat(),
+                    "next_due_at": row.next_due_at,
+                }
+                for row in session.execute(select(UserFsrsModel.user_id, UserFsrsModel.payload, UserFsrsModel.updated_at, UserFsrsModel.next_due_at))
+            ]
+
+            columns = {
+                name: open_memmap(path / f"{name}.npy", mode="w+", dtype=dtype, shape=(cards,))
+                for name, (dtype, _) in FSRS_COLUMNS.items()
+            }
+
+            statement = (
+                select(*[getattr(FsrsModel, "user_id" if name == "user" else name) for name in FSRS_COLUMNS])
+                    .order_by(FsrsModel.user_id.collate(CODE_POINT_COLLATIONS[session.get_bind().dialect.name]), FsrsModel.flashcard_id)
+                    .execution_options(stream_results=True, yield_per=self.chunk_size)
+            )
+
+            written = 0
+            for partition in session.execute(statement).partitions():
+                if written + len(partition) > cards:
+                    raise RuntimeError("fsrs changed while the snapshot was taken")
+
+                self._write_partition(columns, written, list(zip(*partition)), user_ids)
+                written += len(partition)
+
+        if written != cards:
+            raise RuntimeError("fsrs changed while the snapshot was taken")
+
+        if np.any(np.diff(columns["user"]) < 0):
+            raise RuntimeError("fsrs rows did not come back in user_id code point order")
+
+        for column in columns.values():
+            column.flush()
+        del columns
+
+        np.save(path / "users.npy", user_ids)
+        (path / "user_fsrs.json").write_text(json.dumps(users))
+        (path / "manifest.json").write_text(json.dumps({"format": SNAPSHOT_FORMAT, "cards": cards, "users": len(user_ids)}))
+
+        return self.open(path)
+
+    @staticmethod
+    def open(path: str|Path) -> Snapshot:
+        path = Path(path)
+        manifest = json.loads((path / "manifest.json").read_text())
+
+        if manifest["format"] != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format: {manifest['format']}")
+
+        return Snapshot(
+            path=path,
+            columns={name: np.load(path / f"{name}.npy", mmap_mode="r") for name in FSRS_COLUMNS},
+            user_ids=np.load(path / "users.npy", mmap_mode="r"),
+            users=json.loads((path / "user_fsrs.json").read_text()),
+        )
+
+    def restore(self, path: str|Path) -> int:
+        snapshot = self.open(path)
+
+        with Session() as session:
+            if snapshot.users:
+                session.execute(insert(UserFsrsModel), [
+                    {**user, "updated_at": datetime.fromisoformat(user["updated_at"])}
+                    for user in snapshot.users
+                ])
+
+            for start in range(0, len(snapshot), self.chunk_size):
+                session.execute(insert(FsrsModel), self._read_rows(snapshot, slice(start, start + self.chunk_size)))
+
+            session.commit()
+
+        return len(snapshot)
+
+    @staticmethod
+    def _write_partition(columns: dict[str, np.ndarray], start: int, values: list[tuple], user_ids: np.ndarray):
+        end = start + len(values[0])
+
+        for (name, (dtype, null)), column_values in zip(FSRS_COLUMNS.items(), values):
+            if name == "user":
+                columns[name][start:end] = np.searchsorted(user_ids, np.array(column_values, dtype=str))
+                continue
+
+            if name == "state":
+                column_values = [int(value) for value in column_values]
+            elif name == "updated_at":
+                column_values = [_to_timestamp(value) for value in column_values]
+
+            if null is not None:
+                column_values = [null if value is None else value for value in column_values]
+
+            columns[name][start:end] = np.array(column_values, dtype=np.float64 if dtype is np.float64 else None)
+
+    @staticmethod
+    def _read_rows(snapshot: Snapshot, rows: slice) -> list[dict]:
+        values = {}
+
+        for name, (dtype, null) in FSRS_COLUMNS.items():
+            column = snapshot.columns[name][rows]
+
+            if name == "user":
+                values["user_id"] = snapshot.user_ids[column].tolist()
+                continue
+
+            if name == "state":
+                values[name] = [str(value) for value in column.tolist()]
+                continue
+
+            if name == "updated_at":
+                values[name] = [_from_timestamp(value) for value in column.tolist()]
+                continue
+
+            if null is None:
+                values[name] = column.tolist()
+            elif dtype is np.float64:
+                values[name] = np.where(np.isnan(column), None, column).tolist()
+            else:
+                values[name] = np.where(column == null, None, column).tolist()
+
+        return [dict(zip(values, row)) for row in zip(*values.values())]
+
+
+def _to_timestamp(value: datetime|None) -> float|None:
+    # Naive values are read as UTC, so they come back from _from_timestamp unchanged.
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _from_timestamp(value: float) -> datetime|None:
+    if np.isnan(value):
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
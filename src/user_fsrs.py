@@ -2,6 +2,7 @@
 from dataclasses import dataclass
 from datetime import datetime
 
+from src.fsrs_algorithm import SchedulerSettings, DEFAULT_SCHEDULER_SETTINGS
 from src.fsrs_queue import FsrsQueue
 from src.queue_type import QueueType
 from datetime import timezone
@@ -12,6 +13,8 @@ class UserFsrs:
     user_id: str
     queues: list[FsrsQueue]
     updated_at: datetime
+    settings: SchedulerSettings = DEFAULT_SCHEDULER_SETTINGS
+    parameters: tuple[float, ...]|None = None
 
     @staticmethod 
     def new_fsrs(user_id: str) -> 'UserFsrs':
@@ -36,8 +39,18 @@ class UserFsrs:
 
     def update_queue(self, queue: FsrsQueue):
         for i in range(len(self.queues)):
-            if self.queues[i].type == queue.type and self.queues[i].is_pending == queue.is_pending:
+            if self.queues[i].matches(queue):
                 self.queues[i] = queue
                 return 
                 
+        raise ValueError(f"Queue {queue.type} not found")
+
+    def increment_queue(self, queue: FsrsQueue):
+        # Counts from this object, not from `queue`, which may be a snapshot
+        # taken before other reviews of the same user were saved.
+        for i in range(len(self.queues)):
+            if self.queues[i].matches(queue):
+                self.queues[i] = self.queues[i].increment()
+                return
+
         raise ValueError(f"Queue {queue.type} not found")
\ No newline at end of file
@@ -1,20 +1,65 @@
-from src.fsrs_model import UserFsrsModel
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from src.db import Session
+from src.fsrs_algorithm import get_scheduler_settings
+from src.fsrs_model import FsrsModel, UserFsrsModel
 from src.fsrs_queue import FsrsQueue
 from src.queue_type import QueueType
 from src.user_fsrs import UserFsrs
-from datetime import datetime
+from datetime import datetime, timezone
+from sqlalchemy import func, select
 
-engine = create_engine('sqlite:///db.db')
-
-Session = sessionmaker(bind=engine)
 
 class UserFsrsRepository:
 
     def save(self, user_fsrs: UserFsrs):
-        session = Session()
-        payload = {
+        with Session() as session:
+            payload = self.to_payload(user_fsrs)
+            if user_fsrs.id is None:
+                model = UserFsrsModel(
+                    user_id=user_fsrs.user_id,
+                    payload=payload,
+                    updated_at=datetime.now(),
+                    next_due_at=select(func.min(FsrsModel.due))
+                        .where(FsrsModel.user_id == user_fsrs.user_id)
+                        .scalar_subquery(),
+                )
+                session.add(model)
+                session.commit()
+                user_fsrs.id = model.id
+            else:
+                session.query(UserFsrsModel).filter(UserFsrsModel.user_id == user_fsrs.user_id).update({
+                    'payload': payload,
+                    'updated_at': datetime.now(),
+                })
+
+            session.commit()
+
+    def get_by_user_id(self, user_id: str) -> UserFsrs|None:
+        with Session() as session:
+            result = session.query(UserFsrsModel).filter(UserFsrsModel.user_id == user_id).first()
+            if result is None:
+                return None
+
+            return self.from_payload(result.id, result.user_id, result.payload, result.updated_at)
+
+    def get_users_due_before(self, due_before: datetime, due_after: datetime|None = None, limit: int|None = None) -> list[tuple[str, datetime]]:
+        """
+        Users whose earliest card is due before `due_before`, earliest first.
+        A reminder sweeper passes the end of its previous window as
+        `due_after` so every user is reported once.
+        """
+        with Session() as session:
+            query = session.query(UserFsrsModel.user_id, UserFsrsModel.next_due_at)\
+                .filter(UserFsrsModel.next_due_at < due_before.timestamp())
+
+            if due_after is not None:
+                query = query.filter(UserFsrsModel.next_due_at >= due_after.timestamp())
+
+            rows = query.order_by(UserFsrsModel.next_due_at, UserFsrsModel.user_id).limit(limit).all()
+
+            return [(user_id, datetime.fromtimestamp(next_due_at, timezone.utc)) for user_id, next_due_at in rows]
+
+    def to_payload(self, user_fsrs: UserFsrs) -> dict:
+        return {
             'queues': [
                 {
                     'type': queue.type.value,
@@ -24,32 +69,16 @@ class UserFsrsRepository:
                 }
                 for queue in user_fsrs.queues
             ],
+            'settings': {
+                'desired_retention': user_fsrs.settings.desired_retention,
+                'maximum_interval': user_fsrs.settings.maximum_interval,
+            },
+            'parameters': list(user_fsrs.parameters) if user_fsrs.parameters is not None else None,
         }
-        if user_fsrs.id is None:
-            model = UserFsrsModel(
-                user_id=user_fsrs.user_id,
-                payload=payload,
-                updated_at=datetime.now(),
-            )
-            session.add(model)
-            session.commit()
-            user_fsrs.id = model.id
-        else:
-            session.query(UserFsrsModel).filter(UserFsrsModel.user_id == user_fsrs.user_id).update({
-                'payload': payload,
-                'updated_at': datetime.now(),
-            })
-
-        session.commit()
-
-    def get_by_user_id(self, user_id: str) -> UserFsrs|None:
-        session = Session()
-        result = session.query(UserFsrsModel).filter(UserFsrsModel.user_id == user_id).first()
-        if result is None:
-            return None
 
+    def from_payload(self, id: int|None, user_id: str, payload: dict, updated_at: datetime) -> UserFsrs:
         queues = []
-        for queue in result.payload['queues']:
+        for queue in payload['queues']:
             queues.append(FsrsQueue(
                 type=QueueType(queue['type']),
                 is_pending=queue['is_pending'],
@@ -57,9 +86,14 @@ class UserFsrsRepository:
                 daily_limit=queue['daily_limit'],
             ))
 
+        settings = payload.get('settings')
+        parameters = payload.get('parameters')
+
         return UserFsrs(
-            id=result.id,
-            user_id=result.user_id,
+            id=id,
+            user_id=user_id,
             queues=queues,
-            updated_at=result.updated_at,
+            updated_at=updated_at,
+            settings=get_scheduler_settings(**settings) if settings else get_scheduler_settings(),
+            parameters=tuple(parameters) if parameters is not None else None,
         )
\ No newline at end of file
@@ -0,0 +1,39 @@
+from contextlib import contextmanager
+from threading import Lock
+
+
+class UserLocks:
+    """
+    One lock per user, created on first use and dropped once no thread holds
+    or waits for it, so memory stays bounded by the number of active users.
+
+    Locks only serialize threads of one process; SchedulerPool shards users
+    across processes for the multi-process case.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._locks: dict[str, tuple[Lock, int]] = {}
+
+    @contextmanager
+    def lock(self, user_id: str):
+        with self._lock:
+            user_lock, users = self._locks.get(user_id, (None, 0))
+            if user_lock is None:
+                user_lock = Lock()
+            self._locks[user_id] = (user_lock, users + 1)
+
+        try:
+            with user_lock:
+                yield
+        finally:
+            with self._lock:
+                user_lock, users = self._locks[user_id]
+                if users == 1:
+                    del self._locks[user_id]
+                else:
+                    self._locks[user_id] = (user_lock, users - 1)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._locks)
@@ -0,0 +1,202 @@
+from copy import copy, deepcopy
+from datetime import datetime
+from threading import Event, Lock, Thread
+import logging
+
+from src.fsrs_algorithm import FsrsParams
+from src.fsrs_repository import FsrsRepository
+from src.rating import Rating
+from src.review_events import CardReviewed, decode_events, encode_events
+from src.review_journal import ReviewJournal
+from src.state import State
+from src.user_fsrs import UserFsrs
+from src.user_fsrs_repository import UserFsrsRepository
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Acknowledges writes once they are in memory and in the journal, then
+    persists them in batches from a background thread.
+
+    Several updates of the same card or user between two flushes are coalesced
+    into one write; review events are kept in full and written in the same
+    transaction as the batch. Whatever the journal still holds after a crash is
+    replayed by recover(), which the constructor runs before the flusher
+    starts: a flush discards every journal segment, including those of the
+    previous process.
+    """
+
+    def __init__(
+        self,
+        fsrs_repository: FsrsRepository,
+        user_fsrs_repository: UserFsrsRepository,
+        journal: ReviewJournal,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+    ):
+        self.fsrs_repository = fsrs_repository
+        self.user_fsrs_repository = user_fsrs_repository
+        self.journal = journal
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._pending_fsrs: dict[tuple[str, int], FsrsParams] = {}
+        self._pending_users: dict[str, UserFsrs] = {}
+        # Users taken by a running flush, readable until it commits.
+        self._flushing_users: dict[str, UserFsrs] = {}
+        self._pending_events: list[CardReviewed] = []
+        self._wake = Event()
+        self._closed = Event()
+
+        self.recover()
+
+        self._flusher = Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def save_fsrs(self, fsrs: FsrsParams, events: list[CardReviewed] = ()):
+        with self._lock:
+            self.journal.append({"type": "fsrs", "data": self._encode_fsrs(fsrs), "events": encode_events(events)})
+            self._pending_fsrs[(fsrs.user_id, fsrs.flashcard_id)] = copy(fsrs)
+            self._pending_events.extend(events)
+            pending = len(self._pending_fsrs)
+
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def save_user_fsrs(self, user_fsrs: UserFsrs):
+        with self._lock:
+            self.journal.append({"type": "user_fsrs", "data": self._encode_user_fsrs(user_fsrs)})
+            self._pending_users[user_fsrs.user_id] = deepcopy(user_fsrs)
+
+    def get_pending_user_fsrs(self, user_id: str) -> UserFsrs|None:
+        with self._lock:
+            user_fsrs = self._pending_users.get(user_id)
+            if user_fsrs is None:
+                user_fsrs = self._flushing_users.get(user_id)
+            return deepcopy(user_fsrs) if user_fsrs is not None else None
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                fsrs_list = list(self._pending_fsrs.values())
+                users = list(self._pending_users.values())
+                events = self._pending_events
+                self._pending_fsrs = {}
+                self._pending_users = {}
+                self._pending_events = []
+                self._flushing_users = {user_fsrs.user_id: user_fsrs for user_fsrs in users}
+                segments = self.journal.rotate()
+
+            try:
+                self._persist(fsrs_list, users, events)
+            except Exception:
+                # Newer writes win; the journal segments stay for recovery.
+                with self._lock:
+                    self._flushing_users = {}
+                    for fsrs in fsrs_list:
+                        self._pending_fsrs.setdefault((fsrs.user_id, fsrs.flashcard_id), fsrs)
+                    for user_fsrs in users:
+                        self._pending_users.setdefault(user_fsrs.user_id, user_fsrs)
+                    self._pending_events = events + self._pending_events
+                raise
+
+            with self._lock:
+                self._flushing_users = {}
+            self.journal.discard(segments)
+
+    def recover(self):
+        fsrs_by_card: dict[tuple[str, int], FsrsParams] = {}
+        users: dict[str, UserFsrs] = {}
+        events: list[CardReviewed] = []
+
+        with self._flush_lock:
+            for record in self.journal.replay():
+                if record["type"] == "fsrs":
+                    fsrs = self._decode_fsrs(record["data"])
+                    fsrs_by_card[(fsrs.user_id, fsrs.flashcard_id)] = fsrs
+                    events.extend(decode_events(record.get("events", [])))
+                elif record["type"] == "user_fsrs":
+                    user_fsrs = self._decode_user_fsrs(record["data"])
+                    users[user_fsrs.user_id] = user_fsrs
+
+            segments = self.journal.rotate()
+            self._persist(list(fsrs_by_card.values()), list(users.values()), events)
+            self.journal.discard(segments)
+
+    def close(self):
+        self._closed.set()
+        self._wake.set()
+        self._flusher.join()
+        self.flush()
+        self.journal.close()
+
+    def _persist(self, fsrs_list: list[FsrsParams], users: list[UserFsrs], events: list[CardReviewed]):
+        if fsrs_list:
+            self.fsrs_repository.save_many(fsrs_list, events)
+
+        for user_fsrs in users:
+            self.user_fsrs_repository.save(user_fsrs)
+
+    def _flush_loop(self):
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed")
+
+    def _encode_fsrs(self, fsrs: FsrsParams) -> dict:
+        return {
+            "flashcard_id": fsrs.flashcard_id,
+            "user_id": fsrs.user_id,
+            "state": fsrs.state.value,
+            "step": fsrs.step,
+            "stability": fsrs.stability,
+            "difficulty": fsrs.difficulty,
+            "due": fsrs.due.isoformat() if fsrs.due else None,
+            "last_review": fsrs.last_review.isoformat() if fsrs.last_review else None,
+            "reviews_count": fsrs.reviews_count,
+            "is_pending": fsrs.is_pending,
+            "last_rating": fsrs.last_rating.value if fsrs.last_rating else None,
+            "freshness_score": fsrs.freshness_score,
+            "updated_at": fsrs.updated_at.isoformat(),
+        }
+
+    def _decode_fsrs(self, data: dict) -> FsrsParams:
+        return FsrsParams(
+            flashcard_id=data["flashcard_id"],
+            user_id=data["user_id"],
+            state=State(data["state"]),
+            step=data["step"],
+            stability=data["stability"],
+            difficulty=data["difficulty"],
+            due=datetime.fromisoformat(data["due"]) if data["due"] else None,
+            last_review=datetime.fromisoformat(data["last_review"]) if data["last_review"] else None,
+            reviews_count=data["reviews_count"],
+            is_pending=data["is_pending"],
+            last_rating=Rating(data["last_rating"]) if data["last_rating"] else None,
+            freshness_score=data["freshness_score"],
+            updated_at=datetime.fromisoformat(data["updated_at"]),
+        )
+
+    def _encode_user_fsrs(self, user_fsrs: UserFsrs) -> dict:
+        return {
+            "id": user_fsrs.id,
+            "user_id": user_fsrs.user_id,
+            "payload": self.user_fsrs_repository.to_payload(user_fsrs),
+            "updated_at": user_fsrs.updated_at.isoformat(),
+        }
+
+    def _decode_user_fsrs(self, data: dict) -> UserFsrs:
+        return self.user_fsrs_repository.from_payload(
+            data["id"],
+            data["user_id"],
+            data["payload"],
+            datetime.fromisoformat(data["updated_at"]),
+        )
@@ -0,0 +1,122 @@
+from src.card_listing import CardCursor, CardFilter, CardSort
+from src.db import get_engine
+from src.fsrs_algorithm import FsrsParams
+from src.fsrs_model import FlashcardModel
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.state import State
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+from datetime import datetime, timedelta, timezone
+import pytest
+
+Session = sessionmaker(bind=engine)
+
+NOW = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def cards() -> dict[str, int]:
+    """Two unscheduled cards and five scheduled ones, two of them due together."""
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    session = Session()
+    ids = {}
+
+    scheduled = {
+        "review late": dict(state=State.REVIEW, due=NOW + timedelta(days=3), freshness_score=0.2),
+        "review tie a": dict(state=State.REVIEW, due=NOW + timedelta(days=1), freshness_score=0.9),
+        "learning": dict(state=State.LEARNING, step=0, due=NOW - timedelta(minutes=5), freshness_score=0.5),
+        "review tie b": dict(state=State.REVIEW, due=NOW + timedelta(days=1), freshness_score=0.7),
+        "pending": dict(state=State.REVIEW, due=NOW + timedelta(days=2), is_pending=True, freshness_score=0.1),
+    }
+
+    for content in ["new 1", *scheduled, "new 2"]:
+        flashcard = FlashcardModel(user_id="test", content=content)
+        session.add(flashcard)
+        session.commit()
+        ids[content] = flashcard.id
+
+        if content in scheduled:
+            fsrs_repository.save(FsrsParams(flashcard_id=flashcard.id, user_id="test", stability=5.0, difficulty=5.0, updated_at=NOW, **scheduled[content]))
+
+    session.add(FlashcardModel(user_id="other", content="other"))
+    session.commit()
+
+    return ids
+
+
+def _all_pages(limit: int, **kwargs) -> list[list[str]]:
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    pages = []
+    cursor = None
+
+    while True:
+        page = fsrs_repository.list_cards("test", after_cursor=cursor, limit=limit, **kwargs)
+        pages.append([row.content for row in page.rows])
+        if page.next_cursor is None:
+            return pages
+        # Cursors survive a round trip through a URL.
+        cursor = CardCursor.decode(page.next_cursor.encode())
+
+
+def test_list_cards_by_due(cards):
+    pages = _all_pages(2)
+
+    assert pages == [
+        ["new 1", "new 2"],
+        ["learning", "review tie a"],
+        ["review tie b", "pending"],
+        ["review late"],
+    ]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 7, 8])
+def test_pages_never_skip_or_repeat_cards(cards, limit):
+    rows = [content for page in _all_pages(limit) for content in page]
+
+    assert rows == ["new 1", "new 2", "learning", "review tie a", "review tie b", "pending", "review late"]
+
+
+def test_list_cards_by_freshness(cards):
+    rows = [content for page in _all_pages(2, sort=CardSort.FRESHNESS) for content in page]
+
+    assert rows == ["review tie a", "review tie b", "learning", "review late", "pending", "new 1", "new 2"]
+
+
+def test_list_cards_with_filter(cards):
+    review = [content for page in _all_pages(2, card_filter=CardFilter(states=(State.REVIEW,), is_pending=False)) for content in page]
+    learning = [content for page in _all_pages(2, card_filter=CardFilter(states=(State.LEARNING,))) for content in page]
+
+    assert review == ["review tie a", "review tie b", "review late"]
+    assert learning == ["new 1", "new 2", "learning"]
+
+
+def test_list_cards_maps_unscheduled_cards(cards):
+    row = FsrsRepository(FsrsQueueMapper()).list_cards("test", limit=1).rows[0]
+
+    assert row.flashcard_id == cards["new 1"]
+    assert row.state == State.LEARNING
+    assert row.due is None
+    assert row.reviews_count == 0
+
+
+def test_deep_pages_use_index_without_sorting(cards):
+    repository_engine = get_engine()
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(repository_engine, "before_cursor_execute", capture)
+    try:
+        FsrsRepository(FsrsQueueMapper()).list_cards("test", after_cursor=CardCursor(NOW.timestamp(), 0), limit=2)
+    finally:
+        event.remove(repository_engine, "before_cursor_execute", capture)
+
+    [(statement, parameters)] = statements
+    with repository_engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+
+    assert "ix_fsrs_user_id_due" in plan
+    assert "TEMP B-TREE" not in plan
@@ -0,0 +1,144 @@
+from src.card_listing import CardFilter
+from src.db import get_engine
+from src.fsrs_algorithm import FsrsParams
+from src.fsrs_model import FLASHCARDS_FTS, FlashcardModel
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.state import State
+from sqlalchemy import event, select
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+from datetime import datetime, timedelta, timezone
+import pytest
+
+Session = sessionmaker(bind=engine)
+
+NOW = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def fsrs_repository() -> FsrsRepository:
+    return FsrsRepository(FsrsQueueMapper())
+
+
+def _add_card(content: str, user_id: str = "test", fsrs: dict|None = None) -> int:
+    session = Session()
+    flashcard = FlashcardModel(user_id=user_id, content=content)
+    session.add(flashcard)
+    session.commit()
+
+    if fsrs is not None:
+        FsrsRepository(FsrsQueueMapper()).save(FsrsParams(flashcard_id=flashcard.id, user_id=user_id, stability=5.0, difficulty=5.0, **fsrs))
+
+    return flashcard.id
+
+
+def _contents(rows) -> list[str]:
+    return [row.content for row in rows]
+
+
+def test_search_matches_all_words_and_last_prefix(fsrs_repository):
+    _add_card("shaving foam")
+    _add_card("shaving cream")
+    _add_card("hair spray")
+    _add_card("shaving foam", user_id="other")
+
+    assert sorted(_contents(fsrs_repository.search_cards("test", "shaving"))) == ["shaving cream", "shaving foam"]
+    assert _contents(fsrs_repository.search_cards("test", "shaving fo")) == ["shaving foam"]
+    assert _contents(fsrs_repository.search_cards("test", "Spray")) == ["hair spray"]
+    assert fsrs_repository.search_cards("test", "   ") == []
+
+
+def test_search_ignores_diacritics(fsrs_repository):
+    _add_card("gęślą jaźń")
+
+    assert _contents(fsrs_repository.search_cards("test", "gesla")) == ["gęślą jaźń"]
+
+
+def test_search_treats_query_syntax_as_text(fsrs_repository):
+    _add_card('drain "pipe"')
+
+    for text in ['"pipe', "pipe*", "NOT drain", "content:pipe", "drain -"]:
+        fsrs_repository.search_cards("test", text)
+
+    assert _contents(fsrs_repository.search_cards("test", '"pipe"')) == ['drain "pipe"']
+
+
+def test_search_is_scoped_to_the_user_inside_the_index(fsrs_repository):
+    own_id = _add_card("pipe wrench")
+    other_id = _add_card("pipe wrench", user_id="other")
+
+    with Session() as session:
+        rows = session.execute(select(FLASHCARDS_FTS.c.rowid, FLASHCARDS_FTS.c.user_id).where(FLASHCARDS_FTS.c.flashcards_fts.op("MATCH")("pipe"))).all()
+
+    assert sorted(rows) == [(own_id, "test"), (other_id, "other")]
+    assert [row.flashcard_id for row in fsrs_repository.search_cards("test", "pipe")] == [own_id]
+    assert [row.flashcard_id for row in fsrs_repository.search_cards("other", "pipe")] == [other_id]
+
+
+def test_like_fallback_matches_wildcards_literally():
+    _add_card("100% cotton")
+    _add_card("1000 cotton")
+    _add_card("snake_case")
+    _add_card("snakeXcase")
+    _add_card("C:\\temp")
+
+    def like(word: str) -> list[str]:
+        pattern = FsrsRepository._to_like_pattern(word)
+        with Session() as session:
+            return [flashcard.content for flashcard in session.query(FlashcardModel).filter(FlashcardModel.content.ilike(pattern, escape="\\"))]
+
+    assert like("0%") == ["100% cotton"]
+    assert like("e_c") == ["snake_case"]
+    assert like(":\\t") == ["C:\\temp"]
+
+
+def test_search_index_follows_updates_and_deletes(fsrs_repository):
+    flashcard_id = _add_card("exhaust pipe")
+    session = Session()
+
+    flashcard = session.get(FlashcardModel, flashcard_id)
+    flashcard.content = "heating pipe"
+    session.commit()
+    assert _contents(fsrs_repository.search_cards("test", "exhaust")) == []
+    assert _contents(fsrs_repository.search_cards("test", "heating")) == ["heating pipe"]
+
+    session.delete(flashcard)
+    session.commit()
+    assert fsrs_repository.search_cards("test", "heating") == []
+
+
+def test_search_filters_by_fsrs_state_and_due(fsrs_repository):
+    _add_card("pipe new")
+    _add_card("pipe review soon", fsrs=dict(state=State.REVIEW, due=NOW + timedelta(days=1)))
+    _add_card("pipe review later", fsrs=dict(state=State.REVIEW, due=NOW + timedelta(days=10)))
+    _add_card("pipe learning", fsrs=dict(state=State.LEARNING, step=0, due=NOW))
+
+    review = fsrs_repository.search_cards("test", "pipe", card_filter=CardFilter(states=(State.REVIEW,)))
+    due = fsrs_repository.search_cards("test", "pipe", due_before=NOW + timedelta(days=2))
+    learning = fsrs_repository.search_cards("test", "pipe", card_filter=CardFilter(states=(State.LEARNING,)))
+
+    assert sorted(_contents(review)) == ["pipe review later", "pipe review soon"]
+    assert sorted(_contents(due)) == ["pipe learning", "pipe review soon"]
+    assert sorted(_contents(learning)) == ["pipe learning", "pipe new"]
+
+
+def test_search_starts_from_full_text_index(fsrs_repository):
+    _add_card("conditioner")
+    repository_engine = get_engine()
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(repository_engine, "before_cursor_execute", capture)
+    try:
+        fsrs_repository.search_cards("test", "conditioner")
+    finally:
+        event.remove(repository_engine, "before_cursor_execute", capture)
+
+    [(statement, parameters)] = statements
+    with repository_engine.connect() as conn:
+        plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+    assert plan[0].startswith("SCAN flashcards_fts VIRTUAL TABLE INDEX")
@@ -0,0 +1,89 @@
+from src.deck_exporter import DeckExporter, FIELDS
+from src.flashcard_importer import FlashcardImporter
+from src.fsrs_algorithm import FsrsParams
+from src.fsrs_model import FlashcardModel
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.rating import Rating
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+from datetime import datetime, timedelta, timezone
+import csv
+import json
+import pytest
+
+Session = sessionmaker(bind=engine)
+
+
+def _add_cards(updated_at: list[datetime|None]):
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    session = Session()
+
+    for i, card_updated_at in enumerate(updated_at):
+        flashcard = FlashcardModel(user_id="test", content=f"card {i}")
+        session.add(flashcard)
+        session.commit()
+
+        if card_updated_at is not None:
+            fsrs = FsrsParams.new_fsrs(flashcard_id=flashcard.id, user_id="test")
+            fsrs.review(Rating.GOOD)
+            fsrs.updated_at = card_updated_at
+            fsrs_repository.save(fsrs)
+
+    session.add(FlashcardModel(user_id="other", content="other card"))
+    session.commit()
+
+
+def test_export_jsonl(tmp_path):
+    _add_cards([None, datetime(2026, 1, 1)])
+    path = tmp_path / "deck.jsonl"
+
+    result = DeckExporter(chunk_size=1).export_file(path, "test")
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert result.rows == 2
+    assert result.watermark == datetime(2026, 1, 1)
+    assert [record["content"] for record in records] == ["card 0", "card 1"]
+    assert records[0]["state"] is None
+    assert records[1]["reviews_count"] == 1
+    assert records[1]["updated_at"] == "2026-01-01T00:00:00"
+
+
+def test_export_csv(tmp_path):
+    _add_cards([datetime(2026, 1, 1)])
+    path = tmp_path / "deck.csv"
+
+    DeckExporter().export_file(path, "test")
+
+    with open(path, newline="") as file:
+        rows = list(csv.DictReader(file))
+
+    assert tuple(rows[0]) == FIELDS
+    assert rows[0]["content"] == "card 0"
+
+
+def test_incremental_export_since_watermark(tmp_path):
+    watermark = datetime(2026, 1, 2)
+    _add_cards([None, watermark - timedelta(hours=1), watermark, watermark + timedelta(hours=1)])
+
+    result = DeckExporter().export_file(tmp_path / "deck.jsonl", "test", since=watermark)
+
+    records = [json.loads(line) for line in (tmp_path / "deck.jsonl").read_text().splitlines()]
+    assert [record["content"] for record in records] == ["card 3"]
+    assert result.watermark == watermark + timedelta(hours=1)
+
+
+def test_export_can_be_imported(tmp_path):
+    _add_cards([None, None])
+    DeckExporter().export_file(tmp_path / "deck.jsonl", "test")
+
+    FlashcardImporter(FsrsRepository(FsrsQueueMapper())).import_file(tmp_path / "deck.jsonl", "copy")
+
+    assert Session().query(FlashcardModel).filter(FlashcardModel.user_id == "copy").count() == 2
+
+
+def test_export_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        DeckExporter().export_file(tmp_path / "deck.parquet", "test")
+
+    assert not (tmp_path / "deck.parquet").exists()
@@ -0,0 +1,102 @@
+from src.flashcard_importer import FlashcardImporter
+from src.fsrs_algorithm import FsrsParams
+from src.fsrs_model import FlashcardModel, FsrsModel
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.rating import Rating
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+from datetime import datetime, timedelta, timezone
+import json
+import pytest
+
+Session = sessionmaker(bind=engine)
+
+FIRST_REVIEW = datetime(2026, 1, 1, 10, 0, tzinfo=timezone.utc)
+
+
+def _importer(chunk_size: int = 2) -> FlashcardImporter:
+    return FlashcardImporter(FsrsRepository(FsrsQueueMapper()), chunk_size=chunk_size)
+
+
+def test_import_jsonl_in_chunks(tmp_path):
+    path = tmp_path / "deck.jsonl"
+    path.write_text("\n".join(json.dumps({"content": f"card {i}"}) for i in range(5)) + "\n")
+
+    result = _importer().import_file(path, "test")
+
+    assert result.flashcards == 5
+    assert result.reviewed == 0
+    session = Session()
+    assert [model.content for model in session.query(FlashcardModel).order_by(FlashcardModel.id)] == [f"card {i}" for i in range(5)]
+    assert session.query(FsrsModel).count() == 0
+
+
+def test_import_anki_plain_text_export(tmp_path):
+    path = tmp_path / "deck.txt"
+    path.write_text("#separator:tab\n#html:false\nshampoo\tszampon\ndrain\todpływ\n", encoding="utf-8")
+
+    result = _importer().import_file(path, "test")
+
+    assert result.flashcards == 2
+    assert [model.content for model in Session().query(FlashcardModel).order_by(FlashcardModel.id)] == ["shampoo", "drain"]
+
+
+def test_import_anki_export_with_metadata_columns(tmp_path):
+    path = tmp_path / "deck.txt"
+    path.write_text(
+        "#separator:Semicolon\n#html:true\n#notetype column:1\n#deck column:2\n#tags column:5\n"
+        'Basic;Bathroom;"hair; spray";lakier;cosmetics\n'
+        "Basic;Bathroom;sponge;gąbka;\n",
+        encoding="utf-8",
+    )
+
+    _importer().import_file(path, "test")
+
+    assert [model.content for model in Session().query(FlashcardModel).order_by(FlashcardModel.id)] == ["hair; spray", "sponge"]
+
+
+def test_import_replays_review_history(tmp_path):
+    reviews = [
+        {"rating": 3, "reviewed_at": (FIRST_REVIEW + timedelta(minutes=1)).isoformat()},
+        {"rating": 3, "reviewed_at": FIRST_REVIEW.timestamp()},
+        {"rating": 3, "reviewed_at": (FIRST_REVIEW + timedelta(minutes=11)).isoformat()},
+    ]
+    path = tmp_path / "deck.csv"
+    path.write_text('content,reviews\nhair spray,"' + json.dumps(reviews).replace('"', '""') + '"\nconditioner,\n')
+
+    result = _importer().import_file(path, "test")
+
+    expected = FsrsParams.new_fsrs(flashcard_id=1, user_id="test")
+    for minutes in (0, 1, 11):
+        expected.review(Rating.GOOD, FIRST_REVIEW + timedelta(minutes=minutes))
+
+    assert result.flashcards == 2
+    assert result.reviewed == 1
+    [model] = Session().query(FsrsModel).all()
+    assert model.flashcard_id == 1
+    assert model.state == str(expected.state.value)
+    assert model.reviews_count == 3
+    assert float(model.stability) == pytest.approx(expected.stability, abs=1e-6)
+    assert model.due == pytest.approx(expected.due.timestamp())
+
+
+def test_import_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        _importer().import_file(tmp_path / "deck.apkg", "test")
+
+
+def test_import_replays_with_user_settings(tmp_path):
+    from src.fsrs_algorithm import SchedulerSettings
+    from src.user_fsrs import UserFsrs
+    from src.user_fsrs_repository import UserFsrsRepository
+
+    UserFsrsRepository().save(UserFsrs(id=None, user_id="test", queues=[], updated_at=datetime.now(), settings=SchedulerSettings(maximum_interval=3)))
+    reviews = [{"rating": 4, "reviewed_at": (FIRST_REVIEW + timedelta(days=days)).isoformat()} for days in (0, 10, 40)]
+    path = tmp_path / "deck.jsonl"
+    path.write_text(json.dumps({"content": "towel", "reviews": reviews}) + "\n")
+
+    _importer().import_file(path, "test")
+
+    [model] = Session().query(FsrsModel).all()
+    assert model.due - model.last_review == 3 * 86400
@@ -8,6 +8,14 @@ from src.fsrs_algorithm import (
     short_term_stability,
     STABILITY_MIN,
     DEFAULT_PARAMETERS,
+    FRESHNESS_RECOVERY_HALF_LIFE,
+    get_freshness_rank,
+    get_fuzz_factor,
+    get_fuzz_range,
+    _get_fuzzed_interval,
+    FUZZ_RANGES,
+    SchedulerSettings,
+    get_scheduler_settings,
     FsrsParams
 )
 from src.rating import Rating
@@ -1678,4 +1686,180 @@ class TestActivateFromPending:
         assert fsrs.is_pending is False
         assert fsrs.due == current_datetime
         assert fsrs.stability is not None
-        assert fsrs.difficulty is not None
\ No newline at end of file
+        assert fsrs.difficulty is not None
+
+class TestFreshnessDecay:
+    """Tests for the time-decayed freshness score and its rank key."""
+
+    def test_current_freshness_score_doubles_every_half_life(self):
+        updated_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        fsrs = FsrsParams(flashcard_id=1, user_id="test", freshness_score=0.3, updated_at=updated_at)
+
+        assert fsrs.current_freshness_score(updated_at) == pytest.approx(0.3)
+        assert fsrs.current_freshness_score(updated_at + timedelta(seconds=FRESHNESS_RECOVERY_HALF_LIFE)) == pytest.approx(0.6)
+
+    def test_naive_updated_at_is_treated_as_utc(self):
+        aware = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+        assert get_freshness_rank(0.4, aware) == get_freshness_rank(0.4, aware.replace(tzinfo=None))
+
+    def test_rank_order_matches_current_score_order_at_any_time(self):
+        base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        cards = [
+            FsrsParams(flashcard_id=1, user_id="test", freshness_score=0.9, updated_at=base + timedelta(hours=20)),
+            FsrsParams(flashcard_id=2, user_id="test", freshness_score=0.2, updated_at=base),
+            FsrsParams(flashcard_id=3, user_id="test", freshness_score=0.5, updated_at=base + timedelta(hours=6)),
+            FsrsParams(flashcard_id=4, user_id="test", freshness_score=0.0, updated_at=base - timedelta(days=30)),
+        ]
+
+        by_rank = [c.flashcard_id for c in sorted(cards, key=lambda c: c.freshness_rank(), reverse=True)]
+
+        for hours in (21, 48, 24 * 10):
+            now = base + timedelta(hours=hours)
+            by_score = [c.flashcard_id for c in sorted(cards, key=lambda c: c.current_freshness_score(now), reverse=True)]
+            assert by_score == by_rank
+
+    def test_update_starts_from_the_recovered_score(self):
+        review_datetime = datetime(2026, 1, 10, tzinfo=timezone.utc)
+        # Both cards have recovered to 0.8 by review_datetime.
+        cards = [
+            FsrsParams(flashcard_id=1, user_id="test", difficulty=5.0, stability=3.0, freshness_score=0.4, updated_at=review_datetime - timedelta(seconds=FRESHNESS_RECOVERY_HALF_LIFE)),
+            FsrsParams(flashcard_id=2, user_id="test", difficulty=5.0, stability=3.0, freshness_score=0.2, updated_at=review_datetime - timedelta(seconds=2 * FRESHNESS_RECOVERY_HALF_LIFE)),
+        ]
+
+        for card in cards:
+            card.review_out_of_schedule(Rating.GOOD, review_datetime)
+
+        assert cards[0].freshness_score == cards[1].freshness_score
+        assert cards[0].updated_at == review_datetime
+
+    def test_review_updates_freshness_at_the_review_time(self):
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        spaced = FsrsParams.new_fsrs(flashcard_id=1, user_id="test")
+        back_to_back = FsrsParams.new_fsrs(flashcard_id=2, user_id="test")
+
+        for i in range(30):
+            spaced.review(Rating.GOOD, start + timedelta(days=3 * i))
+            spaced.newly_created = False
+        for _ in range(30):
+            back_to_back.review(Rating.GOOD)
+            back_to_back.newly_created = False
+
+        assert spaced.updated_at == start + timedelta(days=87)
+        assert spaced.freshness_score > 10 * back_to_back.freshness_score
+
+
+class TestFuzzing:
+    """Tests for deterministic interval fuzzing."""
+
+    @pytest.mark.parametrize("interval_days", [3, 7, 15, 40, 400, MAXIMUM_INTERVAL])
+    def test_fuzzed_interval_stays_in_fuzz_range(self, interval_days):
+        min_ivl, max_ivl = get_fuzz_range(interval_days)
+
+        for flashcard_id in range(1, 200):
+            fuzzed = _get_fuzzed_interval(timedelta(days=interval_days), get_fuzz_factor(flashcard_id, 3))
+            assert min_ivl <= fuzzed.days <= min(max_ivl + 1, MAXIMUM_INTERVAL)
+
+    def test_short_intervals_are_not_fuzzed(self):
+        assert _get_fuzzed_interval(timedelta(days=2), 0.99) == timedelta(days=2)
+
+    def test_fuzz_range_matches_reference_formula(self):
+        for interval_days in range(3, 400):
+            delta = 1.0
+            for fuzz_range in FUZZ_RANGES:
+                delta += fuzz_range["factor"] * max(min(interval_days, fuzz_range["end"]) - fuzz_range["start"], 0.0)
+
+            assert get_fuzz_range(interval_days) == (
+                min(max(2, int(round(interval_days - delta))), int(round(interval_days + delta))),
+                int(round(interval_days + delta)),
+            )
+
+    def test_review_with_fuzzing_is_deterministic_per_card_and_review_count(self):
+        review_datetime = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+        def review(flashcard_id: int) -> datetime:
+            fsrs = FsrsParams(
+                flashcard_id=flashcard_id,
+                user_id="test",
+                state=State.REVIEW,
+                stability=30.0,
+                difficulty=5.0,
+                last_review=review_datetime - timedelta(days=30),
+                reviews_count=5,
+            )
+            fsrs.review(Rating.GOOD, review_datetime, enable_fuzzing=True)
+            return fsrs.due
+
+        assert review(1) == review(1)
+        assert len({review(flashcard_id) for flashcard_id in range(1, 50)}) > 1
+
+
+class TestSchedulerSettings:
+    """Tests for per-user scheduler settings."""
+
+    @pytest.mark.parametrize("stability, desired_retention, maximum_interval", [
+        (1.0, 0.9, 365),
+        (10.0, 0.8, 365),
+        (10.0, 0.95, 365),
+        (500.0, 0.9, 365),
+        (100.0, 0.9, 50),
+        (STABILITY_MIN, 0.9, 365),
+    ])
+    def test_next_interval_matches_get_next_interval(self, stability, desired_retention, maximum_interval):
+        settings = SchedulerSettings(desired_retention=desired_retention, maximum_interval=maximum_interval)
+
+        assert settings.next_interval(stability) == get_next_interval(stability, desired_retention, maximum_interval)
+
+    @pytest.mark.parametrize("desired_retention, maximum_interval", [
+        (0.0, 365),
+        (1.0, 365),
+        (1.5, 365),
+        (0.9, 0),
+    ])
+    def test_invalid_settings_are_rejected(self, desired_retention, maximum_interval):
+        with pytest.raises(ValueError):
+            SchedulerSettings(desired_retention=desired_retention, maximum_interval=maximum_interval)
+
+    def test_interval_factors_are_cached_per_decay(self):
+        settings = SchedulerSettings(desired_retention=0.85)
+
+        assert settings.interval_factors() is settings.interval_factors()
+        assert get_scheduler_settings(0.85, 365) is get_scheduler_settings(0.85, 365)
+
+    def test_review_uses_card_settings(self):
+        review_datetime = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+        def interval(settings: SchedulerSettings) -> timedelta:
+            fsrs = FsrsParams(
+                flashcard_id=1,
+                user_id="test",
+                state=State.REVIEW,
+                stability=20.0,
+                difficulty=5.0,
+                last_review=review_datetime - timedelta(days=20),
+                settings=settings,
+            )
+            fsrs.review(Rating.GOOD, review_datetime)
+            return fsrs.due - review_datetime
+
+        assert interval(SchedulerSettings(desired_retention=0.8)) > interval(SchedulerSettings())
+        assert interval(SchedulerSettings(maximum_interval=7)) == timedelta(days=7)
+
+    def test_activate_from_pending_uses_desired_retention(self):
+        now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+        def activated_stability(desired_retention: float) -> float:
+            fsrs = FsrsParams(
+                flashcard_id=1,
+                user_id="test",
+                state=State.REVIEW,
+                stability=10.0,
+                difficulty=5.0,
+                last_review=now - timedelta(days=5),
+                is_pending=True,
+                settings=SchedulerSettings(desired_retention=desired_retention),
+            )
+            fsrs.activate_from_pending(now)
+            return fsrs.stability
+
+        assert activated_stability(0.97) < activated_stability(0.9)
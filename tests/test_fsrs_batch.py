@@ -0,0 +1,136 @@
+from src.fsrs_algorithm import get_card_retrievability, get_fuzz_factor, _get_fuzzed_interval, FsrsParams, MAXIMUM_INTERVAL, SchedulerSettings
+from src.fsrs_batch import get_deck_retrievability, get_fuzz_factors, fuzz_intervals, get_next_intervals
+from src.fsrs_model import FlashcardModel
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.state import State
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+
+Session = sessionmaker(bind=engine)
+
+
+@pytest.mark.parametrize("stability, elapsed", [
+    (1.0, timedelta(hours=5)),
+    (2.5, timedelta(days=1, hours=23)),
+    (10.0, timedelta(days=7)),
+    (100.0, timedelta(days=365, minutes=3)),
+    (0.5, -timedelta(days=2)),
+])
+def test_deck_retrievability_matches_scalar(stability, elapsed):
+    now = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+    last_review = now - elapsed
+
+    expected = get_card_retrievability(stability, last_review, now)
+    result = get_deck_retrievability(
+        np.array([stability]),
+        np.array([last_review.timestamp()]),
+        current_timestamp=now.timestamp(),
+    )
+
+    assert result[0] == pytest.approx(expected, abs=1e-12)
+
+
+def test_deck_retrievability_missing_values_are_zero():
+    result = get_deck_retrievability(
+        np.array([np.nan, 3.0]),
+        np.array([0.0, np.nan]),
+        current_timestamp=86400.0,
+    )
+
+    assert result.tolist() == [0.0, 0.0]
+
+
+def test_deck_retrievability_fractional_days():
+    now = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+    last_review = now - timedelta(hours=12)
+
+    truncated = get_deck_retrievability(np.array([1.0]), np.array([last_review.timestamp()]), now.timestamp())
+    fractional = get_deck_retrievability(np.array([1.0]), np.array([last_review.timestamp()]), now.timestamp(), fractional_days=True)
+
+    assert truncated[0] == 1.0
+    assert fractional[0] < 1.0
+
+
+def test_repository_deck_retrievability():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    now = datetime.now(timezone.utc)
+
+    session = Session()
+    for i in range(3):
+        flashcard = FlashcardModel(user_id="test", content=f"Test card {i}")
+        session.add(flashcard)
+        session.commit()
+        fsrs_repository.save(FsrsParams(
+            flashcard_id=flashcard.id,
+            user_id="test",
+            state=State.REVIEW,
+            stability=5.0 + i,
+            difficulty=5.0,
+            last_review=now - timedelta(days=3 * i),
+        ))
+
+    flashcard_ids, retrievability = fsrs_repository.get_deck_retrievability("test", now, chunk_size=2)
+
+    assert sorted(flashcard_ids.tolist()) == [1, 2, 3]
+    for flashcard_id, value in zip(flashcard_ids.tolist(), retrievability.tolist()):
+        i = flashcard_id - 1
+        expected = get_card_retrievability(5.0 + i, now - timedelta(days=3 * i), now)
+        assert value == pytest.approx(expected, abs=1e-6)
+
+
+def test_fuzz_factors_match_scalar():
+    flashcard_ids = np.arange(1, 2001)
+    reviews_counts = flashcard_ids % 17
+
+    vectorized = get_fuzz_factors(flashcard_ids, reviews_counts)
+
+    for flashcard_id, reviews_count, value in zip(flashcard_ids.tolist(), reviews_counts.tolist(), vectorized.tolist()):
+        assert value == get_fuzz_factor(flashcard_id, reviews_count)
+        assert 0.0 <= value < 1.0
+
+
+def test_fuzz_intervals_match_scalar():
+    rng = np.random.default_rng(7)
+    interval_days = rng.integers(1, MAXIMUM_INTERVAL, size=5000)
+    interval_days[:50] = np.arange(1, 51)
+    flashcard_ids = rng.integers(1, 10**9, size=5000)
+    reviews_counts = rng.integers(0, 100, size=5000)
+
+    vectorized = fuzz_intervals(interval_days, flashcard_ids, reviews_counts)
+
+    for days, flashcard_id, reviews_count, value in zip(interval_days.tolist(), flashcard_ids.tolist(), reviews_counts.tolist(), vectorized.tolist()):
+        expected = _get_fuzzed_interval(timedelta(days=days), get_fuzz_factor(flashcard_id, reviews_count))
+        assert value == expected.days
+
+
+def test_next_intervals_match_scalar():
+    settings = SchedulerSettings(desired_retention=0.83, maximum_interval=400)
+    stability = np.concatenate([np.linspace(0.001, 600, 4000), [0.5, 1.0, 2.5]])
+
+    vectorized = get_next_intervals(stability, settings)
+
+    assert vectorized.tolist() == [settings.next_interval(value) for value in stability.tolist()]
+
+
+def test_reschedule_recomputes_review_dues():
+    from src.fsrs_model import FsrsModel
+
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    last_review = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    fsrs_repository.save(FsrsParams(flashcard_id=1, user_id="test", state=State.REVIEW, stability=20.0, difficulty=5.0, last_review=last_review, due=last_review + timedelta(days=20), updated_at=last_review))
+    fsrs_repository.save(FsrsParams(flashcard_id=2, user_id="test", state=State.LEARNING, step=0, stability=1.0, difficulty=5.0, last_review=last_review, due=last_review + timedelta(minutes=1), updated_at=last_review))
+
+    settings = SchedulerSettings(desired_retention=0.8)
+    fsrs_repository.reschedule("test", settings, chunk_size=1)
+
+    models = {model.flashcard_id: model for model in Session().query(FsrsModel)}
+    assert models[1].due == (last_review + timedelta(days=settings.next_interval(20.0))).timestamp()
+    assert models[2].due == (last_review + timedelta(minutes=1)).timestamp()
+    # Incremental exports must see the new due.
+    assert models[1].updated_at > last_review.replace(tzinfo=None)
+    assert models[2].updated_at == last_review.replace(tzinfo=None)
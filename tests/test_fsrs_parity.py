@@ -0,0 +1,58 @@
+from src.fsrs_parity import PARITY_DATETIME_TOL, Divergence, ParityHarness, ParityReport, find_divergence, get_rating_sequence, replay_ours
+from datetime import timedelta
+import pytest
+
+
+def test_rating_sequences_are_reproducible():
+    sequence = get_rating_sequence(42, max_reviews=30)
+
+    assert sequence == get_rating_sequence(42, max_reviews=30)
+    assert sequence != get_rating_sequence(43, max_reviews=30)
+    assert 1 <= len(sequence) <= 30
+    assert [reviewed_at for _, reviewed_at in sequence] == sorted(reviewed_at for _, reviewed_at in sequence)
+
+
+def test_find_divergence_reports_first_differing_field():
+    ours = replay_ours(1, get_rating_sequence(1))
+    reference = [list(state) for state in ours]
+    reference[-1][3] = reference[-1][3] * (1 + 1e-12)
+
+    assert find_divergence(1, ours, [tuple(state) for state in reference]) is None
+
+    reference[-1][3] = reference[-1][3] + 0.5
+    divergence = find_divergence(1, ours, [tuple(state) for state in reference])
+
+    assert divergence == Divergence(1, len(ours) - 1, "difficulty", ours[-1][3], reference[-1][3])
+
+
+def test_find_divergence_allows_datetime_tolerance():
+    ours = replay_ours(1, get_rating_sequence(1))
+    reference = [list(state) for state in ours]
+
+    reference[0][4] = reference[0][4] + PARITY_DATETIME_TOL
+    assert find_divergence(1, ours, [tuple(state) for state in reference]) is None
+
+    reference[0][4] = reference[0][4] + timedelta(seconds=1)
+    assert find_divergence(1, ours, [tuple(state) for state in reference]).field == "due"
+
+
+def test_report_merge_caps_divergences():
+    report = ParityReport()
+    chunk = ParityReport(sequences=3, reviews=10, divergent_sequences=3, divergences=[Divergence(seed, 0, "due", None, None) for seed in range(3)], ours_seconds=1.0, reference_seconds=2.0)
+
+    report.merge(chunk, max_divergences=2)
+    report.merge(chunk, max_divergences=2)
+
+    assert (report.sequences, report.reviews, report.divergent_sequences, len(report.divergences)) == (6, 20, 6, 2)
+    assert report.ours_reviews_per_second == 10.0
+    assert report.reference_reviews_per_second == 5.0
+    assert not report.ok
+
+
+def test_matches_reference_library():
+    pytest.importorskip("fsrs")
+
+    report = ParityHarness(workers=2, chunk_size=250).run(1000)
+
+    assert report.sequences == 1000
+    assert report.ok, report.divergences[:5]
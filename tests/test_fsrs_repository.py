@@ -1,12 +1,15 @@
-from src.fsrs_algorithm import FsrsParams
+from src.fsrs_algorithm import FsrsParams, get_freshness_rank
 from src.fsrs_model import FlashcardModel, FsrsModel
 from src.fsrs_queue_mapper import FsrsQueueMapper
-from src.fsrs_repository import FsrsRepository
+from src.fsrs_repository import FsrsRepository, FRESHNESS_SCORE_RATIO
 from src.queue_type import QueueType
 from src.fsrs_queue import FsrsQueue
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 from conftest import engine
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import pytest
 from src.state import State
 
 Session = sessionmaker(bind=engine)
@@ -280,4 +283,376 @@ def test_save_fsrs_when_card_exists():
         FsrsModel.reviews_count == params.reviews_count,
         FsrsModel.last_rating == params.last_rating,
         FsrsModel.is_pending == params.is_pending,
-    ).first() is not None
\ No newline at end of file
+    ).first() is not None
+
+def _add_reviewed_card(session, content: str, freshness_score: int, last_review: datetime, blocked_until: int|None = None) -> int:
+    flashcard = FlashcardModel(
+        user_id="test",
+        content=content,
+    )
+    session.add(flashcard)
+    session.commit()
+    session.add(FsrsModel(
+        flashcard_id=flashcard.id,
+        user_id="test",
+        difficulty=5.0,
+        stability=3.0,
+        state=State.REVIEW.value,
+        due=int(last_review.timestamp()),
+        reviews_count=1,
+        last_review=int(last_review.timestamp()),
+        is_pending=False,
+        blocked_until=blocked_until,
+        freshness_score=freshness_score,
+        freshness_rank=get_freshness_rank(freshness_score / FRESHNESS_SCORE_RATIO, last_review),
+        updated_at=last_review,
+    ))
+    session.commit()
+    return flashcard.id
+
+def test_get_card_out_of_schedule_orders_by_freshness_score():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    last_review = datetime.now(timezone.utc) - timedelta(hours=1)
+
+    session = Session()
+    _add_reviewed_card(session, "low", 100, last_review)
+    high_id = _add_reviewed_card(session, "high", 900, last_review)
+    _add_reviewed_card(session, "blocked", 1000, last_review, blocked_until=int(datetime.now(timezone.utc).timestamp()) + 600)
+
+    card = fsrs_repository.get_card_out_of_schedule("test")
+
+    assert card is not None
+    assert card.flashcard_id == high_id
+
+def test_get_card_out_of_schedule_prefers_cards_not_shown_for_longer():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    now = datetime.now(timezone.utc)
+
+    session = Session()
+    _add_reviewed_card(session, "shown recently", 600000, now - timedelta(minutes=5))
+    stale_id = _add_reviewed_card(session, "shown days ago", 200000, now - timedelta(days=3))
+
+    card = fsrs_repository.get_card_out_of_schedule("test")
+
+    assert card.flashcard_id == stale_id
+
+def test_save_stores_freshness_rank():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    params = FsrsParams(
+        flashcard_id=1,
+        user_id="test",
+        difficulty=5.0,
+        stability=3.0,
+        state=State.REVIEW,
+        freshness_score=0.25,
+    )
+
+    fsrs_repository.save(params)
+
+    model = Session().query(FsrsModel).filter(FsrsModel.flashcard_id == 1).one()
+    assert model.freshness_rank == params.freshness_rank()
+
+def test_backfill_freshness_rank_fills_missing_ranks():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    now = datetime.now(timezone.utc)
+
+    session = Session()
+    low_id = _add_reviewed_card(session, "low", 100000, now - timedelta(hours=1))
+    high_id = _add_reviewed_card(session, "high", 900000, now - timedelta(hours=1))
+    session.query(FsrsModel).update({"freshness_rank": None})
+    session.commit()
+
+    assert fsrs_repository.backfill_freshness_rank() == 2
+    assert fsrs_repository.backfill_freshness_rank() == 0
+
+    ranks = dict(Session().query(FsrsModel.flashcard_id, FsrsModel.freshness_rank))
+    assert ranks[low_id] == get_freshness_rank(0.1, now - timedelta(hours=1))
+    assert fsrs_repository.get_card_out_of_schedule("test").flashcard_id == high_id
+
+def test_get_card_out_of_schedule_respects_delay_seconds():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    now = datetime.now(timezone.utc)
+
+    session = Session()
+    _add_reviewed_card(session, "just reviewed", 900, now - timedelta(seconds=5))
+    older_id = _add_reviewed_card(session, "older", 100, now - timedelta(minutes=5))
+
+    assert fsrs_repository.get_card_out_of_schedule("test", delay_seconds=60).flashcard_id == older_id
+    assert fsrs_repository.get_card_out_of_schedule("test", delay_seconds=None).flashcard_id != older_id
+
+def test_get_card_out_of_schedule_falls_back_to_unscored_cards():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+
+    session = Session()
+    flashcard = FlashcardModel(
+        user_id="test",
+        content="never reviewed",
+    )
+    session.add(flashcard)
+    session.commit()
+
+    card = fsrs_repository.get_card_out_of_schedule("test")
+
+    assert card is not None
+    assert card.flashcard_id == flashcard.id
+    assert card.newly_created is True
+
+def test_get_card_out_of_schedule_uses_freshness_index():
+    from sqlalchemy import event
+    from src.db import get_engine
+    repository_engine = get_engine()
+
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    session = Session()
+    _add_reviewed_card(session, "card", 100, datetime.now(timezone.utc))
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(repository_engine, "before_cursor_execute", capture)
+    try:
+        fsrs_repository.get_card_out_of_schedule("test")
+    finally:
+        event.remove(repository_engine, "before_cursor_execute", capture)
+
+    statement, parameters = statements[0]
+    with repository_engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+
+    details = " ".join(row[-1] for row in plan)
+    assert "ix_fsrs_user_id_freshness_rank" in details
+    assert "TEMP B-TREE" not in details
+
+def test_get_out_of_schedule_batch_returns_top_k_in_freshness_order():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    last_review = datetime.now(timezone.utc) - timedelta(hours=1)
+
+    session = Session()
+    ids = [_add_reviewed_card(session, f"card {i}", 100000 * (i + 1), last_review) for i in range(5)]
+
+    cards = fsrs_repository.get_out_of_schedule_batch("test", 3)
+
+    assert [card.flashcard_id for card in cards] == [ids[4], ids[3], ids[2]]
+
+def test_get_out_of_schedule_batch_skips_excluded_and_blocked_cards():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    last_review = datetime.now(timezone.utc) - timedelta(hours=1)
+    blocked_until = int(datetime.now(timezone.utc).timestamp()) + 600
+
+    session = Session()
+    blocked_id = _add_reviewed_card(session, "blocked", 900000, last_review, blocked_until=blocked_until)
+    shown_id = _add_reviewed_card(session, "shown", 800000, last_review)
+    free_id = _add_reviewed_card(session, "free", 100000, last_review)
+
+    cards = fsrs_repository.get_out_of_schedule_batch("test", 2, exclude_flashcard_ids=[shown_id])
+    with_blocked = fsrs_repository.get_out_of_schedule_batch("test", 2, exclude_flashcard_ids=[shown_id], include_blocked=True)
+
+    assert [card.flashcard_id for card in cards] == [free_id]
+    assert [card.flashcard_id for card in with_blocked] == [free_id, blocked_id]
+
+def test_get_out_of_schedule_batch_fills_with_unscored_cards():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+
+    session = Session()
+    scored_id = _add_reviewed_card(session, "scored", 500000, datetime.now(timezone.utc))
+    flashcard = FlashcardModel(
+        user_id="test",
+        content="never reviewed",
+    )
+    session.add(flashcard)
+    session.commit()
+
+    cards = fsrs_repository.get_out_of_schedule_batch("test", 5)
+
+    assert [card.flashcard_id for card in cards] == [scored_id, flashcard.id]
+
+def test_claim_blocks_card_until_lease_expires_or_card_is_saved():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+
+    session = Session()
+    flashcard_id = _add_reviewed_card(session, "card", 100000, datetime.now(timezone.utc))
+
+    assert fsrs_repository.claim("test", flashcard_id) is True
+    assert fsrs_repository.claim("test", flashcard_id) is False
+
+    fsrs_repository.save(FsrsParams(flashcard_id=flashcard_id, user_id="test", difficulty=5.0, stability=3.0, state=State.REVIEW))
+
+    assert fsrs_repository.claim("test", flashcard_id, lease_seconds=-1) is True
+    assert fsrs_repository.claim("test", flashcard_id) is True
+
+def test_claim_card_without_fsrs_row_keeps_it_new():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+
+    session = Session()
+    flashcard = FlashcardModel(
+        user_id="test",
+        content="never reviewed",
+    )
+    session.add(flashcard)
+    session.commit()
+
+    assert fsrs_repository.claim("test", flashcard.id, lease_seconds=-1) is True
+
+    card = fsrs_repository.get_next_card("test", [FsrsQueue(QueueType.NEW, False, 0, 10)], lease_seconds=60)
+
+    assert card is not None
+    assert card.fsrs.newly_created is True
+    assert card.current_queue.type == QueueType.NEW
+    assert fsrs_repository.claim("test", flashcard.id) is False
+
+def test_claim_raises_integrity_errors_other_than_a_lost_race():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+
+    session = Session()
+    flashcard = FlashcardModel(user_id="test", content="never reviewed")
+    session.add(flashcard)
+    session.commit()
+
+    # fsrs with difficulty still NOT NULL, as left by create_all on a
+    # database that predates lease placeholders.
+    connection = engine.raw_connection()
+    connection.executescript("""
+        DROP TABLE fsrs;
+        DROP TABLE user_fsrs;
+        CREATE TABLE fsrs (
+            id INTEGER NOT NULL, user_id VARCHAR NOT NULL, flashcard_id INTEGER NOT NULL, is_pending BOOLEAN NOT NULL,
+            difficulty NUMERIC(6, 4) NOT NULL, stability NUMERIC(15, 6), state VARCHAR(1) NOT NULL, due INTEGER,
+            reviews_count INTEGER NOT NULL, step SMALLINT, last_rating SMALLINT, last_review INTEGER, blocked_until INTEGER,
+            freshness_score INTEGER, freshness_rank FLOAT, updated_at DATETIME NOT NULL,
+            PRIMARY KEY (id), UNIQUE (flashcard_id), FOREIGN KEY(flashcard_id) REFERENCES flashcards (id)
+        );
+        CREATE TABLE user_fsrs (
+            id INTEGER NOT NULL, user_id VARCHAR NOT NULL, payload JSON NOT NULL, updated_at DATETIME NOT NULL,
+            PRIMARY KEY (id), UNIQUE (user_id)
+        );
+    """)
+
+    with pytest.raises(IntegrityError):
+        fsrs_repository.claim("test", flashcard.id)
+
+    connection.executescript((Path(__file__).parent.parent / "migrations/sqlite/002_fsrs_columns.sql").read_text())
+    connection.close()
+
+    assert fsrs_repository.claim("test", flashcard.id) is True
+    assert fsrs_repository.claim("test", flashcard.id) is False
+
+def test_concurrent_sessions_are_never_served_the_same_card():
+    from concurrent.futures import ThreadPoolExecutor
+    from threading import Barrier
+
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    available_queues = [FsrsQueue(QueueType.DUE, False, 0, 10)]
+
+    session = Session()
+    for i in range(4):
+        _add_reviewed_card(session, f"card {i}", 100000, datetime.now(timezone.utc) - timedelta(days=1))
+
+    barrier = Barrier(8)
+
+    def next_card():
+        barrier.wait()
+        card = fsrs_repository.get_next_card("test", available_queues, lease_seconds=60)
+        return card.flashcard.id if card is not None else None
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        served = [flashcard_id for flashcard_id in executor.map(lambda _: next_card(), range(8)) if flashcard_id is not None]
+
+    assert len(served) == 4
+    assert len(set(served)) == 4
+
+def test_get_many_fills_missing_cards_with_new_fsrs():
+    from src.fsrs_repository import IN_CLAUSE_CHUNK_SIZE
+    from sqlalchemy import event
+    from src.db import get_engine
+
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    last_review = datetime.now(timezone.utc) - timedelta(days=1)
+
+    session = Session()
+    reviewed_ids = [_add_reviewed_card(session, f"card {i}", 100000, last_review) for i in range(3)]
+    new_flashcard = FlashcardModel(user_id="test", content="new card")
+    session.add(new_flashcard)
+    session.commit()
+
+    flashcard_ids = reviewed_ids + [new_flashcard.id] + list(range(1000, 1000 + IN_CLAUSE_CHUNK_SIZE))
+
+    statements = []
+    # The user's parameters are read once and cached.
+    fsrs_repository.get_parameters("test")
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(get_engine(), "before_cursor_execute", capture)
+    try:
+        result = fsrs_repository.get_many("test", flashcard_ids + reviewed_ids)
+    finally:
+        event.remove(get_engine(), "before_cursor_execute", capture)
+
+    assert len(statements) == 2
+    assert list(result) == flashcard_ids
+    assert [result[flashcard_id].reviews_count for flashcard_id in reviewed_ids] == [1, 1, 1]
+    assert result[reviewed_ids[0]].state == State.REVIEW
+    assert result[new_flashcard.id].newly_created is True
+    assert result[1000].newly_created is True
+
+def test_get_many_does_not_expose_other_users_cards():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+
+    session = Session()
+    flashcard_id = _add_reviewed_card(session, "card", 100000, datetime.now(timezone.utc))
+
+    assert fsrs_repository.get_many("other", [flashcard_id])[flashcard_id].newly_created is True
+    assert fsrs_repository.get_many("test", []) == {}
+
+
+def _next_due_at(user_id: str) -> float|None:
+    from src.fsrs_model import UserFsrsModel
+
+    return Session().query(UserFsrsModel.next_due_at).filter(UserFsrsModel.user_id == user_id).scalar()
+
+
+def test_save_maintains_next_due_at():
+    from src.user_fsrs import UserFsrs
+    from src.user_fsrs_repository import UserFsrsRepository
+
+    UserFsrsRepository().save(UserFsrs(id=None, user_id="test", queues=[], updated_at=datetime.now()))
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    first = FsrsParams(flashcard_id=1, user_id="test", state=State.REVIEW, due=now + timedelta(hours=1))
+    second = FsrsParams(flashcard_id=2, user_id="test", state=State.REVIEW, due=now + timedelta(hours=2))
+
+    fsrs_repository.save(second)
+    assert _next_due_at("test") == second.due.timestamp()
+
+    fsrs_repository.save(first)
+    assert _next_due_at("test") == first.due.timestamp()
+
+    # Reviewing the earliest card moves the user to the next one.
+    first.due = now + timedelta(days=3)
+    fsrs_repository.save(first)
+    assert _next_due_at("test") == second.due.timestamp()
+
+    second.due = now + timedelta(minutes=5)
+    fsrs_repository.save(second)
+    assert _next_due_at("test") == second.due.timestamp()
+
+
+def test_save_many_refreshes_next_due_at():
+    from src.user_fsrs import UserFsrs
+    from src.user_fsrs_repository import UserFsrsRepository
+
+    for user_id in ("a", "b"):
+        UserFsrsRepository().save(UserFsrs(id=None, user_id=user_id, queues=[], updated_at=datetime.now()))
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+
+    FsrsRepository(FsrsQueueMapper()).save_many([
+        FsrsParams(flashcard_id=1, user_id="a", state=State.REVIEW, due=now + timedelta(hours=3)),
+        FsrsParams(flashcard_id=2, user_id="a", state=State.REVIEW, due=now + timedelta(hours=1)),
+        FsrsParams(flashcard_id=3, user_id="b", state=State.REVIEW, due=now + timedelta(hours=2)),
+    ])
+
+    assert _next_due_at("a") == (now + timedelta(hours=1)).timestamp()
+    assert _next_due_at("b") == (now + timedelta(hours=2)).timestamp()
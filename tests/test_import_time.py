@@ -0,0 +1,48 @@
+from pathlib import Path
+import subprocess
+import sys
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Generous enough for slow CI machines; importing SQLAlchemy alone takes
+# several times longer.
+IMPORT_BUDGET_MICROSECONDS = 150_000
+
+
+def _import_times(module: str) -> dict[str, int]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+@pytest.mark.parametrize("module", ["src.fsrs_algorithm", "src.user_fsrs", "src.fsrs_resolver", "src.review"])
+def test_core_imports_without_sqlalchemy(module):
+    times = _import_times(module)
+
+    assert not [name for name in times if name.startswith(("sqlalchemy", "numpy"))]
+    assert times[module] < IMPORT_BUDGET_MICROSECONDS
+
+
+def test_engine_is_created_on_first_use():
+    code = (
+        "import src.fsrs_repository, src.user_fsrs_repository, src.db\n"
+        "assert src.db.get_engine.cache_info().currsize == 0\n"
+        "src.user_fsrs_repository.UserFsrsRepository().get_by_user_id('test')\n"
+        "assert src.db.get_engine.cache_info().currsize == 1\n"
+    )
+
+    subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, check=True)
@@ -0,0 +1,80 @@
+from src.fsrs_algorithm import FsrsParams, get_fuzz_range
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.load_balancer import DueLoadBalancer
+from src.rating import Rating
+from src.state import State
+from datetime import datetime, timedelta, timezone
+
+REVIEW_DATETIME = datetime(2026, 3, 1, 12, tzinfo=timezone.utc)
+
+
+def _save_due(fsrs_repository: FsrsRepository, flashcard_id: int, due: datetime):
+    fsrs_repository.save(FsrsParams(
+        flashcard_id=flashcard_id,
+        user_id="test",
+        state=State.REVIEW,
+        stability=10.0,
+        difficulty=5.0,
+        due=due,
+    ))
+
+
+def test_histogram_is_loaded_from_repository():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    _save_due(fsrs_repository, 1, REVIEW_DATETIME + timedelta(days=10))
+    _save_due(fsrs_repository, 2, REVIEW_DATETIME + timedelta(days=10, hours=3))
+    _save_due(fsrs_repository, 3, REVIEW_DATETIME + timedelta(days=11))
+
+    load_balancer = DueLoadBalancer(fsrs_repository)
+
+    assert load_balancer.due_count("test", REVIEW_DATETIME + timedelta(days=10)) == 2
+    assert load_balancer.due_count("test", REVIEW_DATETIME + timedelta(days=11)) == 1
+    assert load_balancer.due_count("test", REVIEW_DATETIME + timedelta(days=12)) == 0
+
+
+def test_balance_picks_least_loaded_day_in_fuzz_range():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    min_ivl, max_ivl = get_fuzz_range(20)
+
+    flashcard_id = 1
+    for days in range(min_ivl, max_ivl + 1):
+        if days == max_ivl:
+            continue
+        for _ in range(3):
+            _save_due(fsrs_repository, flashcard_id, REVIEW_DATETIME + timedelta(days=days))
+            flashcard_id += 1
+
+    load_balancer = DueLoadBalancer(fsrs_repository)
+
+    assert load_balancer.balance("test", REVIEW_DATETIME, timedelta(days=20)) == timedelta(days=max_ivl)
+
+
+def test_balance_keeps_interval_when_days_are_equally_loaded():
+    load_balancer = DueLoadBalancer(FsrsRepository(FsrsQueueMapper()))
+
+    assert load_balancer.balance("test", REVIEW_DATETIME, timedelta(days=20)) == timedelta(days=20)
+    assert load_balancer.balance("test", REVIEW_DATETIME, timedelta(days=1)) == timedelta(days=1)
+
+
+def test_review_spreads_cards_and_updates_histogram():
+    load_balancer = DueLoadBalancer(FsrsRepository(FsrsQueueMapper()))
+
+    dues = []
+    for flashcard_id in range(1, 6):
+        fsrs = FsrsParams(
+            flashcard_id=flashcard_id,
+            user_id="test",
+            state=State.REVIEW,
+            stability=20.0,
+            difficulty=5.0,
+            due=REVIEW_DATETIME,
+            last_review=REVIEW_DATETIME - timedelta(days=20),
+        )
+        fsrs.review(Rating.GOOD, REVIEW_DATETIME, load_balancer=load_balancer)
+        dues.append(fsrs.due.date())
+
+    assert len(set(dues)) == 5
+    assert load_balancer.due_count("test", REVIEW_DATETIME) == 0
+    for due in dues:
+        assert load_balancer.due_count("test", datetime.combine(due, REVIEW_DATETIME.timetz())) == 1
@@ -0,0 +1,111 @@
+from src.fsrs_algorithm import DEFAULT_PARAMETERS, LOWER_BOUNDS_PARAMETERS, validate_parameters
+from src.fsrs_model import FlashcardModel
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.parameters_cache import ParametersCache
+from src.user_fsrs import UserFsrs
+from src.user_fsrs_repository import UserFsrsRepository
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+import pytest
+
+Session = sessionmaker(bind=engine)
+
+CUSTOM_PARAMETERS = tuple(LOWER_BOUNDS_PARAMETERS[:20]) + (0.3,)
+
+
+class CountingUserFsrsRepository(UserFsrsRepository):
+    def __init__(self):
+        self.reads = 0
+
+    def get_by_user_id(self, user_id):
+        self.reads += 1
+        return super().get_by_user_id(user_id)
+
+
+def _save_user(parameters):
+    user_fsrs = UserFsrs.new_fsrs("test")
+    user_fsrs.parameters = parameters
+    UserFsrsRepository().save(user_fsrs)
+
+
+def test_validate_parameters_rejects_wrong_length_and_out_of_bounds():
+    with pytest.raises(ValueError):
+        validate_parameters(DEFAULT_PARAMETERS[:20])
+
+    out_of_bounds = list(DEFAULT_PARAMETERS)
+    out_of_bounds[4] = 11.0
+    with pytest.raises(ValueError):
+        validate_parameters(out_of_bounds)
+
+    assert validate_parameters(list(DEFAULT_PARAMETERS)) == DEFAULT_PARAMETERS
+
+
+def test_cache_reads_user_parameters_once():
+    _save_user(CUSTOM_PARAMETERS)
+    user_fsrs_repository = CountingUserFsrsRepository()
+    cache = ParametersCache(user_fsrs_repository)
+
+    assert cache.get("test") == CUSTOM_PARAMETERS
+    assert cache.get("test") == CUSTOM_PARAMETERS
+    assert user_fsrs_repository.reads == 1
+
+    cache.invalidate("test")
+    cache.get("test")
+    assert user_fsrs_repository.reads == 2
+
+
+def test_cache_falls_back_to_default_parameters():
+    cache = ParametersCache(UserFsrsRepository())
+
+    assert cache.get("unknown") == DEFAULT_PARAMETERS
+
+
+def test_cache_evicts_least_recently_used_users():
+    cache = ParametersCache(UserFsrsRepository(), maxsize=2)
+
+    for user_id in ("a", "b", "a", "c"):
+        cache.get(user_id)
+
+    assert list(cache._parameters) == ["a", "c"]
+
+
+def test_repository_maps_cards_with_user_parameters():
+    _save_user(CUSTOM_PARAMETERS)
+    session = Session()
+    session.add(FlashcardModel(user_id="test", content="card"))
+    session.commit()
+
+    fsrs_repository = FsrsRepository(FsrsQueueMapper(), ParametersCache(UserFsrsRepository()))
+
+    [(_, fsrs)] = list(fsrs_repository.iter_user_cards("test"))
+
+    assert fsrs.parameters == CUSTOM_PARAMETERS
+
+
+def test_review_applies_user_parameters_by_default():
+    from src.fsrs_algorithm import initial_stability
+    from src.fsrs_model import FsrsModel
+    from src.fsrs_resolver import FsrsResolver
+    from src.rating import Rating
+    from src.review import Review
+
+    _save_user(None)
+    session = Session()
+    session.add_all([FlashcardModel(user_id="test", content=f"card {i}") for i in range(2)])
+    session.commit()
+
+    review = Review(
+        fsrs_resolver=FsrsResolver(UserFsrsRepository()),
+        fsrs_repository=FsrsRepository(FsrsQueueMapper()),
+    )
+
+    review.review(Rating.GOOD, review.find_next_card("test"))
+    review.update_parameters("test", list(CUSTOM_PARAMETERS))
+    review.review(Rating.GOOD, review.find_next_card("test"))
+
+    stabilities = [float(model.stability) for model in Session().query(FsrsModel).order_by(FsrsModel.flashcard_id)]
+    assert stabilities == [
+        pytest.approx(initial_stability(Rating.GOOD, DEFAULT_PARAMETERS), abs=1e-6),
+        pytest.approx(initial_stability(Rating.GOOD, CUSTOM_PARAMETERS), abs=1e-6),
+    ]
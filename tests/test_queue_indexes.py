@@ -0,0 +1,95 @@
+from src.db import get_engine
+from src.fsrs_model import FlashcardModel, FsrsModel
+from src.fsrs_queue import FsrsQueue
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.queue_type import QueueType
+from src.state import State
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+from datetime import datetime, timezone
+import pytest
+
+Session = sessionmaker(bind=engine)
+
+# Planner statistics of a 10M card deployment: 1,000 users with 10k cards
+# each, 60% in REVIEW, 30% learning or relearning, 10% pending.
+STATISTICS = [
+    ("flashcards", None, "10000000"),
+    ("flashcards", "ix_flashcards_user_id", "10000000 10000"),
+    ("fsrs", None, "10000000"),
+    ("fsrs", "ix_fsrs_due", "10000000 3"),
+    ("fsrs", "ix_fsrs_user_id_freshness_rank", "10000000 10000 1"),
+    ("fsrs", "ix_fsrs_user_id_due", "10000000 10000 3 1"),
+    ("fsrs", "ix_fsrs_review_queue", "6000000 6000 3000 2"),
+    ("fsrs", "ix_fsrs_learning_queue", "3000000 3000 1500 2"),
+    ("fsrs", "ix_fsrs_pending_queue", "1000000 1000 2"),
+    ("fsrs", "sqlite_autoindex_fsrs_1", "10000000 1"),
+]
+
+
+@pytest.fixture
+def repository_engine():
+    session = Session()
+    flashcard = FlashcardModel(user_id="test", content="card")
+    session.add(flashcard)
+    session.commit()
+    session.add(FsrsModel(flashcard_id=flashcard.id, user_id="test", difficulty=5.0, stability=3.0, state=str(State.REVIEW.value), due=0, is_pending=False, freshness_score=0, updated_at=datetime.now()))
+    session.commit()
+
+    repository_engine = get_engine()
+    with repository_engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+        conn.exec_driver_sql("DELETE FROM sqlite_stat1")
+        for tbl, idx, stat in STATISTICS:
+            conn.exec_driver_sql("INSERT INTO sqlite_stat1 VALUES (?, ?, ?)", (tbl, idx, stat))
+        conn.commit()
+
+    # Statistics are loaded when a connection reads the schema.
+    repository_engine.dispose()
+    yield repository_engine
+    repository_engine.dispose()
+
+
+def _plans(repository_engine, queue: FsrsQueue) -> list[str]:
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(repository_engine, "before_cursor_execute", capture)
+    try:
+        FsrsRepository(FsrsQueueMapper()).get_next_card("missing", [queue], delay_seconds=30)
+    finally:
+        event.remove(repository_engine, "before_cursor_execute", capture)
+
+    plans = []
+    with repository_engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            plans.append(" | ".join(row[-1] for row in plan))
+
+    return plans
+
+
+@pytest.mark.parametrize("queue, index", [
+    (FsrsQueue(QueueType.DUE, False, 0, 10), "ix_fsrs_review_queue"),
+    (FsrsQueue(QueueType.DUE, True, 0, 10), "ix_fsrs_review_queue"),
+    (FsrsQueue(QueueType.LEARNING, False, 0, 10), "ix_fsrs_learning_queue"),
+    (FsrsQueue(QueueType.LEARNING, True, 0, 10), "ix_fsrs_learning_queue"),
+])
+def test_scheduled_queues_use_partial_index_range_scan(repository_engine, queue, index):
+    [plan] = _plans(repository_engine, queue)
+
+    assert f"SEARCH fsrs USING INDEX {index} (user_id=? AND is_pending=? AND due<?)" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_new_queue_branches_use_indexes(repository_engine):
+    unscheduled, pending = _plans(repository_engine, FsrsQueue(QueueType.NEW, False, 0, 10))
+
+    assert "SEARCH flashcards USING INDEX ix_flashcards_user_id (user_id=?)" in unscheduled
+    assert "SEARCH fsrs USING INDEX ix_fsrs_pending_queue (user_id=? AND due<?)" in pending
+    assert "TEMP B-TREE" not in unscheduled + pending
@@ -0,0 +1,111 @@
+from src.fsrs_model import FlashcardModel, FsrsModel
+from src.fsrs_queue import FsrsQueue
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.fsrs_resolver import FsrsResolver
+from src.queue_type import QueueType
+from src.rating import Rating
+from src.review import Review
+from src.user_fsrs import UserFsrs
+from src.user_fsrs_repository import UserFsrsRepository
+from src.user_locks import UserLocks
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Barrier
+import dataclasses
+import pytest
+
+Session = sessionmaker(bind=engine)
+
+THREADS = 64
+REVIEWS_PER_THREAD = 2
+
+
+def _review(daily_limit: int = 10) -> Review:
+    user_fsrs_repository = UserFsrsRepository()
+    user_fsrs_repository.save(UserFsrs(id=None, user_id="test", queues=[FsrsQueue(QueueType.NEW, False, 0, daily_limit)], updated_at=datetime.now()))
+
+    return Review(
+        fsrs_resolver=FsrsResolver(user_fsrs_repository),
+        fsrs_repository=FsrsRepository(FsrsQueueMapper()),
+    )
+
+
+def _add_cards(count: int):
+    session = Session()
+    session.add_all([FlashcardModel(user_id="test", content=f"card {i}") for i in range(count)])
+    session.commit()
+
+
+def test_queues_are_immutable():
+    queue = FsrsQueue(QueueType.NEW, False, 0, 10)
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        queue.daily_count = 1
+
+    assert queue.increment().daily_count == 1
+    assert queue.daily_count == 0
+
+
+def test_resolve_queue_does_not_modify_available_queues():
+    from src.fsrs_algorithm import FsrsParams
+    from datetime import timezone, timedelta
+
+    available_queues = [FsrsQueue(QueueType.NEW, False, 0, 10)]
+    fsrs = FsrsParams(flashcard_id=1, user_id="test", is_pending=True, due=datetime.now(timezone.utc) - timedelta(minutes=1))
+
+    current_queue = FsrsQueueMapper().resolve_queue(fsrs, available_queues)
+
+    assert current_queue.transform_to_not_pending is True
+    assert available_queues[0].transform_to_not_pending is False
+
+
+def test_review_counts_against_current_user_state():
+    _add_cards(2)
+    review = _review()
+
+    first = review.find_next_card("test")
+    second = review.find_next_card("test")
+    review.review(Rating.GOOD, first)
+    review.review(Rating.GOOD, second)
+
+    assert UserFsrsRepository().get_by_user_id("test").queues[0].daily_count == 2
+
+
+def test_concurrent_reviews_do_not_lose_counts():
+    reviews = THREADS * REVIEWS_PER_THREAD
+    _add_cards(reviews)
+    review = _review(daily_limit=reviews * 2)
+    barrier = Barrier(THREADS)
+
+    def work():
+        barrier.wait()
+        reviewed = 0
+        for _ in range(REVIEWS_PER_THREAD):
+            card = review.find_next_card("test")
+            review.review(Rating.GOOD, card)
+            reviewed += 1
+        return reviewed
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        reviewed = sum(executor.map(lambda _: work(), range(THREADS)))
+
+    session = Session()
+    assert reviewed == reviews
+    assert UserFsrsRepository().get_by_user_id("test").queues[0].daily_count == reviews
+    assert session.query(FsrsModel).filter(FsrsModel.reviews_count == 1).count() == reviews
+    assert session.query(func.max(FsrsModel.reviews_count)).scalar() == 1
+    assert len(review.user_locks) == 0
+
+
+def test_user_locks_are_released():
+    user_locks = UserLocks()
+
+    with user_locks.lock("a"):
+        with user_locks.lock("b"):
+            assert len(user_locks) == 2
+
+    assert len(user_locks) == 0
@@ -0,0 +1,205 @@
+from src.fsrs_model import FlashcardModel, FsrsModel, ReviewEventModel
+from src.fsrs_queue import FsrsQueue
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.fsrs_resolver import FsrsResolver
+from src.queue_type import QueueType
+from src.rating import Rating
+from src.review import Review
+from src.review_events import AsyncQueueEventBus, CardGraduated, CardLapsed, CardReviewed, OutboxEventBus, add_to_outbox, get_review_events
+from src.review_journal import ReviewJournal
+from src.write_behind import WriteBehindBuffer
+from src.state import State
+from src.user_fsrs import UserFsrs
+from src.user_fsrs_repository import UserFsrsRepository
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+from datetime import datetime, timezone
+from threading import Thread
+import asyncio
+import pytest
+
+Session = sessionmaker(bind=engine)
+
+
+class ListEventBus:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, events):
+        self.events.extend(events)
+
+
+class FailingFsrsRepository(FsrsRepository):
+    def _update_next_due_at(self, session, user_id, previous_due, due):
+        raise RuntimeError("database down")
+
+
+def _publish(events):
+    with Session() as session:
+        add_to_outbox(session, events)
+        session.commit()
+
+
+def _review(event_bus, fsrs_repository=None, write_behind=None) -> Review:
+    user_fsrs_repository = UserFsrsRepository()
+    user_fsrs_repository.save(UserFsrs(id=None, user_id="test", queues=[FsrsQueue(QueueType.NEW, False, 0, 10)], updated_at=datetime.now()))
+
+    session = Session()
+    session.add(FlashcardModel(user_id="test", content="card"))
+    session.commit()
+
+    return Review(
+        fsrs_resolver=FsrsResolver(user_fsrs_repository),
+        fsrs_repository=fsrs_repository or FsrsRepository(FsrsQueueMapper()),
+        event_bus=event_bus,
+        write_behind=write_behind,
+    )
+
+
+def _event(flashcard_id: int = 1, state: State = State.REVIEW) -> CardReviewed:
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return CardReviewed(
+        user_id="test",
+        flashcard_id=flashcard_id,
+        rating=Rating.GOOD,
+        previous_state=State.LEARNING,
+        state=state,
+        reviewed_at=now,
+        due=now,
+        stability=3.2,
+        difficulty=5.1,
+        reviews_count=1,
+    )
+
+
+def test_review_publishes_events():
+    event_bus = ListEventBus()
+    review = _review(event_bus)
+
+    card = review.find_next_card("test")
+    review.review(Rating.EASY, card)
+
+    assert [type(event) for event in event_bus.events] == [CardReviewed, CardGraduated]
+    assert event_bus.events[0].previous_state == State.LEARNING
+    assert event_bus.events[0].state == State.REVIEW
+    assert event_bus.events[0].reviews_count == 1
+
+
+def test_review_events_classify_lapses():
+    from src.fsrs_algorithm import FsrsParams
+
+    fsrs = FsrsParams(flashcard_id=1, user_id="test", is_pending=False, state=State.RELEARNING, last_review=datetime.now(timezone.utc))
+
+    assert [type(event) for event in get_review_events(Rating.VERY_HARD, State.REVIEW, fsrs)] == [CardReviewed, CardLapsed]
+    assert [type(event) for event in get_review_events(Rating.VERY_HARD, State.LEARNING, fsrs)] == [CardReviewed]
+
+
+def test_payload_round_trip():
+    event = CardLapsed(**vars(_event(state=State.RELEARNING)))
+
+    assert CardLapsed.from_payload(event.to_payload()) == event
+
+
+def test_async_queue_bus_receives_events_from_threads():
+    async def consume():
+        event_bus = AsyncQueueEventBus()
+        thread = Thread(target=event_bus.publish, args=([_event(1), _event(2)],))
+        thread.start()
+
+        events = [await asyncio.wait_for(event_bus.get(), 1) for _ in range(2)]
+        thread.join()
+        return events
+
+    assert [event.flashcard_id for event in asyncio.run(consume())] == [1, 2]
+
+
+def test_outbox_drains_in_batches():
+    event_bus = OutboxEventBus()
+    _publish([_event(flashcard_id) for flashcard_id in range(1, 6)])
+    batches = []
+
+    drained = event_bus.drain(batches.append, batch_size=2)
+
+    assert drained == 5
+    assert [[event.flashcard_id for event in batch] for batch in batches] == [[1, 2], [3, 4], [5]]
+    assert Session().query(ReviewEventModel).count() == 0
+
+
+def test_outbox_keeps_events_when_handler_fails():
+    event_bus = OutboxEventBus()
+    _publish([_event(1), _event(2), _event(3)])
+
+    def fail_second(batch):
+        if batch[0].flashcard_id == 2:
+            raise RuntimeError("consumer down")
+
+    with pytest.raises(RuntimeError):
+        event_bus.drain(fail_second, batch_size=1)
+
+    batches = []
+    assert event_bus.drain(batches.append) == 2
+    assert [event.flashcard_id for event in batches[0]] == [2, 3]
+
+
+def test_outbox_keeps_events_committed_late_with_lower_ids():
+    event_bus = OutboxEventBus()
+    with Session() as session:
+        add_to_outbox(session, [_event(2)])
+        session.flush()
+        session.query(ReviewEventModel).update({"id": 10})
+        session.commit()
+    batches = []
+
+    def commit_lower_id(batch):
+        batches.append(batch)
+        if len(batches) == 1:
+            # A transaction holding id 5 commits while the batch is handled.
+            with Session() as session:
+                add_to_outbox(session, [_event(1)])
+                session.flush()
+                session.query(ReviewEventModel).filter(ReviewEventModel.id != 10).update({"id": 5})
+                session.commit()
+
+    assert event_bus.drain(commit_lower_id) == 2
+    assert [[event.flashcard_id for event in batch] for batch in batches] == [[2], [1]]
+
+
+def test_outbox_events_are_written_with_the_card():
+    review = _review(OutboxEventBus())
+
+    review.review(Rating.EASY, review.find_next_card("test"))
+
+    batches = []
+    assert OutboxEventBus().drain(batches.append) == 2
+    assert [type(event) for event in batches[0]] == [CardReviewed, CardGraduated]
+
+
+def test_outbox_events_roll_back_with_a_failed_save():
+    review = _review(OutboxEventBus(), fsrs_repository=FailingFsrsRepository(FsrsQueueMapper()))
+
+    with pytest.raises(RuntimeError):
+        review.review(Rating.GOOD, review.find_next_card("test"))
+
+    assert Session().query(ReviewEventModel).count() == 0
+
+
+def test_write_behind_persists_outbox_events_with_the_batch(tmp_path):
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    buffer = WriteBehindBuffer(fsrs_repository, UserFsrsRepository(), ReviewJournal(tmp_path / "journal"), flush_interval=3600)
+    review = _review(OutboxEventBus(), fsrs_repository=fsrs_repository, write_behind=buffer)
+
+    review.review(Rating.GOOD, review.find_next_card("test"))
+
+    # Not visible before the card state is.
+    assert Session().query(ReviewEventModel).count() == 0
+
+    # Simulated crash: the events come back with the card on recovery.
+    buffer.journal.close()
+    recovered = WriteBehindBuffer(fsrs_repository, UserFsrsRepository(), ReviewJournal(tmp_path / "journal"), flush_interval=3600)
+
+    assert Session().query(FsrsModel).count() == 1
+    batches = []
+    assert OutboxEventBus().drain(batches.append) == 1
+    assert batches[0][0].rating == Rating.GOOD
+    recovered.close()
@@ -0,0 +1,117 @@
+from src.fsrs_algorithm import DEFAULT_PARAMETERS, DEFAULT_SCHEDULER_SETTINGS, FsrsParams, SchedulerSettings
+from src.fsrs_model import FsrsModel
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.rating import Rating
+from src.review_log_replay import ReviewLog, ReviewLogReplayer
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+from datetime import datetime, timezone
+import numpy as np
+
+Session = sessionmaker(bind=engine)
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+def _create_log(path, cards: int = 120, seed: int = 7) -> tuple[ReviewLog, dict]:
+    random = np.random.default_rng(seed)
+    reviews_per_card = random.integers(1, 12, cards)
+
+    flashcard_ids = np.repeat(np.arange(1, cards + 1), reviews_per_card)
+    user_ids = np.array(["a", "b", "c"])[flashcard_ids % 3]
+    # Reviews are up to 40 days apart, the log itself is shuffled.
+    timestamps = START + random.uniform(0, 40 * 86400, len(flashcard_ids))
+    ratings = random.integers(1, 5, len(flashcard_ids))
+    order = random.permutation(len(flashcard_ids))
+
+    log = ReviewLog.create(path, timestamps[order], user_ids[order], flashcard_ids[order], ratings[order])
+
+    by_card = {}
+    for flashcard_id, user_id, timestamp, rating in zip(flashcard_ids.tolist(), user_ids.tolist(), timestamps.tolist(), ratings.tolist()):
+        by_card.setdefault(flashcard_id, (user_id, []))[1].append((timestamp, rating))
+
+    return log, by_card
+
+
+def _replay_scalar(flashcard_id: int, user_id: str, reviews: list[tuple[float, int]], parameters=DEFAULT_PARAMETERS, settings=DEFAULT_SCHEDULER_SETTINGS) -> FsrsParams:
+    fsrs = FsrsParams.new_fsrs(flashcard_id=flashcard_id, user_id=user_id)
+    fsrs.parameters = parameters
+    fsrs.settings = settings
+
+    for timestamp, rating in sorted(reviews):
+        fsrs.review(Rating(rating), datetime.fromtimestamp(timestamp, timezone.utc))
+        fsrs.newly_created = False
+
+    return fsrs
+
+
+def _state(fsrs: FsrsParams) -> tuple:
+    return (fsrs.user_id, fsrs.state, fsrs.step, fsrs.stability, fsrs.difficulty, fsrs.due, fsrs.last_review, fsrs.last_rating, fsrs.reviews_count)
+
+
+def test_replay_matches_scalar_path(tmp_path):
+    log, by_card = _create_log(tmp_path)
+    parameters = {"b": [value * 1.01 for value in DEFAULT_PARAMETERS[:20]] + [DEFAULT_PARAMETERS[20]]}
+
+    cards = [
+        fsrs
+        for partition in ReviewLogReplayer(workers=2, partition_size=50, parameters=parameters).replay(log)
+        for fsrs in partition
+    ]
+
+    assert [fsrs.flashcard_id for fsrs in cards] == sorted(by_card)
+    for fsrs in cards:
+        user_id, reviews = by_card[fsrs.flashcard_id]
+        expected = _replay_scalar(fsrs.flashcard_id, user_id, reviews, parameters.get(user_id, DEFAULT_PARAMETERS))
+        assert _state(fsrs) == _state(expected)
+
+
+def test_rebuild_uses_user_settings(tmp_path):
+    log, by_card = _create_log(tmp_path, cards=30)
+    settings = {"c": SchedulerSettings(desired_retention=0.8, maximum_interval=20)}
+
+    ReviewLogReplayer(workers=2, partition_size=10, settings=settings).rebuild(log, FsrsRepository(FsrsQueueMapper()))
+
+    rows = {row.flashcard_id: row for row in Session().query(FsrsModel)}
+    for flashcard_id, (user_id, reviews) in by_card.items():
+        expected = _replay_scalar(flashcard_id, user_id, reviews, settings=settings.get(user_id, DEFAULT_SCHEDULER_SETTINGS))
+        assert rows[flashcard_id].due == expected.due.timestamp()
+    assert any(
+        _replay_scalar(flashcard_id, user_id, reviews).due != _replay_scalar(flashcard_id, user_id, reviews, settings=settings["c"]).due
+        for flashcard_id, (user_id, reviews) in by_card.items() if user_id == "c"
+    )
+
+
+def test_partitions_do_not_split_cards(tmp_path):
+    log, by_card = _create_log(tmp_path)
+    replayer = ReviewLogReplayer(workers=1, partition_size=37)
+    sorted_log = replayer.sort(log)
+
+    partitions = replayer.get_partitions(sorted_log)
+    flashcard_ids = sorted_log.reviews["flashcard_id"]
+
+    assert partitions[0][0] == 0 and partitions[-1][1] == len(log)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(partitions, partitions[1:]))
+    assert all(flashcard_ids[start - 1] != flashcard_ids[start] for start, _ in partitions[1:])
+    assert np.all(np.diff(sorted_log.reviews["timestamp"])[np.diff(flashcard_ids) == 0] >= 0)
+
+
+def test_rebuild_overwrites_fsrs_rows(tmp_path):
+    log, by_card = _create_log(tmp_path, cards=10)
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    fsrs_repository.save(FsrsParams(flashcard_id=1, user_id=by_card[1][0], reviews_count=99))
+
+    assert ReviewLogReplayer(workers=1).rebuild(log, fsrs_repository) == 10
+
+    rows = {row.flashcard_id: row for row in Session().query(FsrsModel)}
+    assert len(rows) == 10
+    for flashcard_id, (user_id, reviews) in by_card.items():
+        assert rows[flashcard_id].reviews_count == len(reviews)
+        assert rows[flashcard_id].due == _replay_scalar(flashcard_id, user_id, reviews).due.timestamp()
+
+
+def test_empty_log(tmp_path):
+    log = ReviewLog.create(tmp_path, [], [], [], [])
+
+    assert list(ReviewLogReplayer(workers=2).replay(log)) == []
@@ -0,0 +1,173 @@
+from src.fsrs_algorithm import FsrsParams
+from src.fsrs_model import FlashcardModel, FsrsModel
+from src.fsrs_queue import FsrsQueue
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.fsrs_resolver import FsrsResolver
+from src.queue_type import QueueType
+from src.rating import Rating
+from src.scheduler_engine import SchedulerEngine
+from src.state import State
+from src.user_fsrs import UserFsrs
+from src.user_fsrs_repository import UserFsrsRepository
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+from datetime import datetime, timedelta, timezone
+import pytest
+
+Session = sessionmaker(bind=engine)
+
+
+def _add_card(content: str, fsrs: dict|None = None) -> int:
+    session = Session()
+    flashcard = FlashcardModel(
+        user_id="test",
+        content=content,
+    )
+    session.add(flashcard)
+    session.commit()
+
+    if fsrs is not None:
+        FsrsRepository(FsrsQueueMapper()).save(FsrsParams(flashcard_id=flashcard.id, user_id="test", **fsrs))
+
+    return flashcard.id
+
+
+def _engine(queues: list[FsrsQueue]|None = None) -> SchedulerEngine:
+    user_fsrs_repository = UserFsrsRepository()
+    user_fsrs = UserFsrs.new_fsrs("test")
+    if queues is not None:
+        user_fsrs.queues = queues
+    user_fsrs_repository.save(user_fsrs)
+
+    return SchedulerEngine(
+        fsrs_resolver=FsrsResolver(user_fsrs_repository),
+        fsrs_repository=FsrsRepository(FsrsQueueMapper()),
+    )
+
+
+@pytest.fixture
+def now():
+    return datetime.now(timezone.utc)
+
+
+def test_due_cards_are_served_before_learning_and_new(now):
+    _add_card("new")
+    _add_card("learning", dict(state=State.LEARNING, step=0, stability=1.0, difficulty=5.0, due=now - timedelta(minutes=1)))
+    due_id = _add_card("due", dict(state=State.REVIEW, stability=5.0, difficulty=5.0, due=now - timedelta(days=1), last_review=now - timedelta(days=6)))
+
+    scheduler = _engine()
+    card = scheduler.get_next_card("test")
+    scheduler.close()
+
+    assert card.flashcard.id == due_id
+    assert card.current_queue.type == QueueType.DUE
+
+
+def test_earliest_due_card_wins_within_a_queue(now):
+    _add_card("later", dict(state=State.REVIEW, stability=5.0, difficulty=5.0, due=now - timedelta(hours=1)))
+    earliest_id = _add_card("earliest", dict(state=State.REVIEW, stability=5.0, difficulty=5.0, due=now - timedelta(days=2)))
+    _add_card("future", dict(state=State.REVIEW, stability=5.0, difficulty=5.0, due=now + timedelta(days=2)))
+
+    scheduler = _engine()
+    card = scheduler.get_next_card("test")
+    scheduler.close()
+
+    assert card.flashcard.id == earliest_id
+
+
+def test_served_cards_are_leased(now):
+    first_id = _add_card("first")
+    second_id = _add_card("second")
+
+    scheduler = _engine()
+    served = {scheduler.get_next_card("test").flashcard.id, scheduler.get_next_card("test").flashcard.id}
+    third = scheduler.get_next_card("test")
+    scheduler.close()
+
+    assert served == {first_id, second_id}
+    assert third is None
+
+
+def test_review_applies_daily_limit_locally_and_writes_back(now):
+    for i in range(3):
+        _add_card(f"new {i}")
+
+    scheduler = _engine([FsrsQueue(QueueType.NEW, False, 0, 2)])
+
+    for _ in range(2):
+        card = scheduler.get_next_card("test")
+        scheduler.review(Rating.GOOD, card)
+
+    assert scheduler.get_next_card("test") is None
+
+    scheduler.close()
+
+    assert Session().query(FsrsModel).filter(FsrsModel.reviews_count == 1).count() == 2
+    user_fsrs = UserFsrsRepository().get_by_user_id("test")
+    assert user_fsrs.queues[0].daily_count == 2
+
+
+def test_reviewed_card_moves_to_its_new_queue(now):
+    flashcard_id = _add_card("new")
+
+    scheduler = _engine()
+    card = scheduler.get_next_card("test")
+    scheduler.review(Rating.VERY_HARD, card)
+
+    with scheduler._lock:
+        user = scheduler._users["test"]
+        _, fsrs = user.cards[flashcard_id]
+        assert fsrs.state == State.LEARNING
+        assert fsrs.newly_created is False
+        assert any(entry[1] == flashcard_id for entry in user.heaps[(QueueType.LEARNING, False)])
+
+    scheduler.close()
+
+
+def test_evict_idle_drops_users(now):
+    _add_card("new")
+
+    scheduler = _engine()
+    scheduler.warm_up("test")
+    scheduler.evict_idle(now=scheduler._users["test"].last_access + scheduler.idle_seconds + 1)
+
+    assert "test" not in scheduler._users
+    scheduler.close()
+
+
+def test_loading_a_cold_user_does_not_block_warm_users(now):
+    from threading import Event, Thread
+
+    _add_card("new")
+    loading = Event()
+    release = Event()
+
+    class SlowFsrsRepository(FsrsRepository):
+        def iter_user_cards(self, user_id, chunk_size=1000):
+            if user_id == "cold":
+                loading.set()
+                release.wait(5)
+            yield from super().iter_user_cards(user_id, chunk_size)
+
+    user_fsrs_repository = UserFsrsRepository()
+    user_fsrs_repository.save(UserFsrs.new_fsrs("test"))
+    scheduler = SchedulerEngine(fsrs_resolver=FsrsResolver(user_fsrs_repository), fsrs_repository=SlowFsrsRepository(FsrsQueueMapper()))
+    scheduler.warm_up("test")
+
+    cold = Thread(target=scheduler.warm_up, args=("cold",))
+    cold.start()
+    assert loading.wait(5)
+
+    served = []
+    warm = Thread(target=lambda: served.append(scheduler.get_next_card("test")))
+    warm.start()
+    warm.join(1)
+
+    assert not warm.is_alive()
+    assert served[0] is not None
+
+    release.set()
+    cold.join()
+    assert "cold" in scheduler._users
+    scheduler.close()
@@ -0,0 +1,44 @@
+from src.fsrs_model import FlashcardModel, FsrsModel
+from src.rating import Rating
+from src.scheduler_pool import SchedulerPool, get_shard
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+import pytest
+
+Session = sessionmaker(bind=engine)
+
+USER_IDS = ("alice", "bob", "carol", "dave")
+
+
+@pytest.fixture
+def pool():
+    pool = SchedulerPool(workers=2)
+    yield pool
+    pool.close()
+
+
+def test_shard_is_stable_and_in_range():
+    assert get_shard("alice", 4) == get_shard("alice", 4)
+    assert {get_shard(user_id, 2) for user_id in USER_IDS} == {0, 1}
+    assert all(0 <= get_shard(f"user {i}", 3) < 3 for i in range(100))
+
+
+def test_pool_serves_and_reviews_cards_of_every_shard(pool):
+    session = Session()
+    for user_id in USER_IDS:
+        session.add(FlashcardModel(user_id=user_id, content=f"{user_id} card"))
+    session.commit()
+
+    for user_id in USER_IDS:
+        card = pool.get_next_card(user_id)
+        assert card.flashcard.content == f"{user_id} card"
+        pool.review(Rating.GOOD, card)
+
+    pool.flush()
+
+    reviewed = {model.user_id: model.reviews_count for model in Session().query(FsrsModel)}
+    assert reviewed == {user_id: 1 for user_id in USER_IDS}
+
+
+def test_pool_returns_none_without_cards(pool):
+    assert pool.get_next_card("alice") is None
@@ -0,0 +1,103 @@
+from src.fsrs_algorithm import FsrsParams
+from src.fsrs_batch import get_deck_retrievability
+from src.fsrs_model import Base, FlashcardModel, FsrsModel, UserFsrsModel
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.rating import Rating
+from src.scheduler_snapshot import SchedulerSnapshotter
+from src.user_fsrs import UserFsrs
+from src.user_fsrs_repository import UserFsrsRepository
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+Session = sessionmaker(bind=engine)
+
+
+def _add_cards():
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    session = Session()
+    reviewed_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    for user_id in ("b", "a"):
+        UserFsrsRepository().save(UserFsrs.new_fsrs(user_id))
+
+        for i, ratings in enumerate([[Rating.GOOD], [Rating.EASY, Rating.GOOD], [Rating.GOOD, Rating.VERY_HARD]]):
+            flashcard = FlashcardModel(user_id=user_id, content=f"card {i}")
+            session.add(flashcard)
+            session.commit()
+
+            fsrs = FsrsParams.new_fsrs(flashcard_id=flashcard.id, user_id=user_id)
+            for day, rating in enumerate(ratings):
+                fsrs.review(rating, reviewed_at + timedelta(days=day))
+            fsrs_repository.save(fsrs)
+
+    fsrs_repository.save(FsrsParams(flashcard_id=100, user_id="pending", is_pending=True))
+
+
+def _rows(model, exclude: tuple[str, ...]) -> list[dict]:
+    rows = []
+    for row in Session().query(model).order_by(model.user_id, *([model.flashcard_id] if model is FsrsModel else [])):
+        rows.append({column.key: getattr(row, column.key) for column in model.__table__.columns if column.key not in exclude})
+    return rows
+
+
+def test_snapshot_round_trip(tmp_path):
+    _add_cards()
+    fsrs_rows = _rows(FsrsModel, exclude=("id", "blocked_until"))
+    user_rows = _rows(UserFsrsModel, exclude=("id",))
+
+    snapshot = SchedulerSnapshotter(chunk_size=2).dump(tmp_path)
+
+    assert len(snapshot) == 7
+    assert snapshot.user_ids.tolist() == ["a", "b", "pending"]
+    assert isinstance(snapshot.columns["stability"], np.memmap)
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    assert SchedulerSnapshotter(chunk_size=2).restore(tmp_path) == 7
+    assert _rows(FsrsModel, exclude=("id", "blocked_until")) == fsrs_rows
+    assert _rows(UserFsrsModel, exclude=("id",)) == user_rows
+
+
+def test_snapshot_feeds_batch_algorithm(tmp_path):
+    _add_cards()
+    now = datetime(2026, 2, 1, tzinfo=timezone.utc).timestamp()
+    rows = Session().query(FsrsModel.stability, FsrsModel.last_review).order_by(FsrsModel.user_id, FsrsModel.flashcard_id).all()
+
+    SchedulerSnapshotter().dump(tmp_path)
+    snapshot = SchedulerSnapshotter.open(tmp_path)
+
+    expected = get_deck_retrievability(
+        np.array([np.nan if row.stability is None else float(row.stability) for row in rows]),
+        np.array([np.nan if row.last_review is None else row.last_review for row in rows]),
+        now,
+    )
+    np.testing.assert_array_equal(get_deck_retrievability(snapshot.columns["stability"], snapshot.columns["last_review"], now), expected)
+
+    user_a = snapshot.user_slice("a")
+    assert snapshot.columns["flashcard_id"][user_a].tolist() == [4, 5, 6]
+    assert snapshot.user_slice("missing") == slice(0, 0)
+
+
+def test_user_codes_follow_code_point_order(tmp_path):
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    user_ids = ["b", "Z", "é", "a", "A"]
+
+    for flashcard_id, user_id in enumerate(user_ids, start=1):
+        fsrs_repository.save(FsrsParams(flashcard_id=flashcard_id, user_id=user_id, is_pending=True))
+
+    snapshot = SchedulerSnapshotter(chunk_size=2).dump(tmp_path)
+
+    assert snapshot.user_ids.tolist() == ["A", "Z", "a", "b", "é"]
+    for flashcard_id, user_id in enumerate(user_ids, start=1):
+        assert snapshot.columns["flashcard_id"][snapshot.user_slice(user_id)].tolist() == [flashcard_id]
+
+
+def test_empty_snapshot(tmp_path):
+    snapshot = SchedulerSnapshotter().dump(tmp_path)
+
+    assert len(snapshot) == 0
+    assert SchedulerSnapshotter().restore(tmp_path) == 0
@@ -3,7 +3,7 @@ from src.fsrs_queue import FsrsQueue
 from src.queue_type import QueueType
 from sqlalchemy.orm import sessionmaker
 from conftest import engine
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 from src.user_fsrs import UserFsrs
 from src.user_fsrs_repository import UserFsrsRepository
@@ -84,4 +84,63 @@ def test_save_user_fsrs_with_id():
 
     user_fsrs_repository.save(user_fsrs)
 
-    assert session.query(UserFsrsModel).filter(UserFsrsModel.user_id == user_fsrs.user_id).first() is not None
\ No newline at end of file
+    assert session.query(UserFsrsModel).filter(UserFsrsModel.user_id == user_fsrs.user_id).first() is not None
+def test_settings_round_trip_and_survive_daily_reset():
+    from src.fsrs_algorithm import SchedulerSettings
+    from src.fsrs_resolver import FsrsResolver
+
+    user_fsrs_repository = UserFsrsRepository()
+    user_fsrs = UserFsrs.new_fsrs("test")
+    user_fsrs.settings = SchedulerSettings(desired_retention=0.85, maximum_interval=180)
+    user_fsrs.updated_at = datetime.now() - timedelta(days=1)
+    user_fsrs_repository.save(user_fsrs)
+
+    session = Session()
+    session.query(UserFsrsModel).update({'updated_at': datetime.now() - timedelta(days=1)})
+    session.commit()
+
+    resolved = FsrsResolver(user_fsrs_repository).resolve("test")
+
+    assert resolved.settings == SchedulerSettings(desired_retention=0.85, maximum_interval=180)
+    assert user_fsrs_repository.get_by_user_id("test").settings == resolved.settings
+
+
+def test_get_users_due_before():
+    from src.fsrs_algorithm import FsrsParams
+    from src.fsrs_queue_mapper import FsrsQueueMapper
+    from src.fsrs_repository import FsrsRepository
+
+    user_fsrs_repository = UserFsrsRepository()
+    fsrs_repository = FsrsRepository(FsrsQueueMapper())
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+
+    for flashcard_id, (user_id, due) in enumerate([
+        ("soon", now + timedelta(seconds=30)),
+        ("overdue", now - timedelta(hours=1)),
+        ("later", now + timedelta(hours=1)),
+    ], start=1):
+        user_fsrs_repository.save(UserFsrs(id=None, user_id=user_id, queues=[], updated_at=datetime.now()))
+        fsrs_repository.save(FsrsParams(flashcard_id=flashcard_id, user_id=user_id, due=due))
+    user_fsrs_repository.save(UserFsrs(id=None, user_id="no cards", queues=[], updated_at=datetime.now()))
+
+    due_before = now + timedelta(minutes=1)
+
+    assert user_fsrs_repository.get_users_due_before(due_before) == [
+        ("overdue", now - timedelta(hours=1)),
+        ("soon", now + timedelta(seconds=30)),
+    ]
+    assert user_fsrs_repository.get_users_due_before(due_before, due_after=now) == [("soon", now + timedelta(seconds=30))]
+    assert user_fsrs_repository.get_users_due_before(due_before, limit=1) == [("overdue", now - timedelta(hours=1))]
+
+
+def test_new_user_fsrs_picks_up_existing_cards():
+    from src.fsrs_algorithm import FsrsParams
+    from src.fsrs_queue_mapper import FsrsQueueMapper
+    from src.fsrs_repository import FsrsRepository
+
+    due = datetime.now(timezone.utc).replace(microsecond=0)
+    FsrsRepository(FsrsQueueMapper()).save(FsrsParams(flashcard_id=1, user_id="test", due=due))
+
+    UserFsrsRepository().save(UserFsrs(id=None, user_id="test", queues=[], updated_at=datetime.now()))
+
+    assert UserFsrsRepository().get_users_due_before(due + timedelta(seconds=1)) == [("test", due)]
@@ -0,0 +1,192 @@
+from src.fsrs_algorithm import FsrsParams
+from src.fsrs_model import FlashcardModel, FsrsModel
+from src.fsrs_queue import FsrsQueue
+from src.fsrs_queue_mapper import FsrsQueueMapper
+from src.fsrs_repository import FsrsRepository
+from src.fsrs_resolver import FsrsResolver
+from src.queue_type import QueueType
+from src.rating import Rating
+from src.review import Review
+from src.review_journal import ReviewJournal
+from src.state import State
+from src.user_fsrs import UserFsrs
+from src.user_fsrs_repository import UserFsrsRepository
+from src.write_behind import WriteBehindBuffer
+from sqlalchemy.orm import sessionmaker
+from conftest import engine
+from copy import copy
+from datetime import datetime, timezone
+from threading import Event, Thread
+import time
+
+Session = sessionmaker(bind=engine)
+
+
+class CountingFsrsRepository(FsrsRepository):
+    def __init__(self):
+        super().__init__(FsrsQueueMapper())
+        self.batches = []
+
+    def save_many(self, fsrs_list, events=()):
+        self.batches.append(len(fsrs_list))
+        super().save_many(fsrs_list, events)
+
+
+def _buffer(tmp_path, fsrs_repository=None, flush_interval: float = 3600) -> WriteBehindBuffer:
+    return WriteBehindBuffer(
+        fsrs_repository=fsrs_repository or FsrsRepository(FsrsQueueMapper()),
+        user_fsrs_repository=UserFsrsRepository(),
+        journal=ReviewJournal(tmp_path / "journal"),
+        flush_interval=flush_interval,
+    )
+
+
+def test_updates_of_the_same_card_are_coalesced(tmp_path):
+    fsrs_repository = CountingFsrsRepository()
+    buffer = _buffer(tmp_path, fsrs_repository)
+    fsrs = FsrsParams(flashcard_id=1, user_id="test", state=State.REVIEW, stability=3.0, difficulty=5.0)
+
+    for _ in range(3):
+        fsrs.review(Rating.GOOD)
+        buffer.save_fsrs(fsrs)
+
+    buffer.close()
+
+    assert fsrs_repository.batches == [1]
+    model = Session().query(FsrsModel).one()
+    assert model.reviews_count == 3
+    assert list(buffer.journal.replay()) == []
+
+
+def test_recover_replays_unflushed_journal(tmp_path):
+    buffer = _buffer(tmp_path)
+    buffer.save_fsrs(FsrsParams(flashcard_id=1, user_id="test", state=State.REVIEW, stability=3.0, difficulty=5.0, reviews_count=4))
+    buffer.save_fsrs(FsrsParams(flashcard_id=2, user_id="test", state=State.REVIEW, stability=7.0, difficulty=5.0))
+    # Simulated crash: nothing is flushed to the database.
+    buffer.journal.close()
+
+    assert Session().query(FsrsModel).count() == 0
+
+    recovered = _buffer(tmp_path)
+
+    models = {model.flashcard_id: model for model in Session().query(FsrsModel)}
+    assert models[1].reviews_count == 4
+    assert float(models[2].stability) == 7.0
+    assert list(recovered.journal.replay()) == []
+    recovered.close()
+
+
+def test_restart_does_not_discard_journal_before_recovery(tmp_path):
+    buffer = _buffer(tmp_path)
+    buffer.save_fsrs(FsrsParams(flashcard_id=1, user_id="test", state=State.REVIEW, stability=3.0, difficulty=5.0, reviews_count=4))
+    buffer.journal.close()
+
+    restarted = _buffer(tmp_path, flush_interval=0.1)
+    # Several flushes of the new process run before anyone could call recover().
+    time.sleep(0.5)
+
+    assert Session().query(FsrsModel).one().reviews_count == 4
+    restarted.recover()
+    assert Session().query(FsrsModel).one().reviews_count == 4
+    restarted.close()
+
+
+def test_journal_ignores_torn_last_record(tmp_path):
+    journal = ReviewJournal(tmp_path)
+    journal.append({"type": "fsrs", "data": {}})
+    journal.close()
+
+    with open(journal.segments()[-1], "a", encoding="utf-8") as file:
+        file.write('{"type": "fs')
+
+    assert list(ReviewJournal(tmp_path).replay()) == [{"type": "fsrs", "data": {}}]
+
+
+def test_review_reads_pending_user_counters(tmp_path):
+    session = Session()
+    for i in range(2):
+        session.add(FlashcardModel(user_id="test", content=f"card {i}"))
+    session.commit()
+
+    user_fsrs_repository = UserFsrsRepository()
+    user_fsrs = UserFsrs(id=None, user_id="test", queues=[FsrsQueue(QueueType.NEW, False, 0, 10)], updated_at=datetime.now())
+    user_fsrs_repository.save(user_fsrs)
+
+    buffer = _buffer(tmp_path)
+    review = Review(
+        fsrs_resolver=FsrsResolver(user_fsrs_repository),
+        fsrs_repository=FsrsRepository(FsrsQueueMapper()),
+        write_behind=buffer,
+    )
+
+    first = review.find_next_card("test")
+    review.review(Rating.GOOD, first)
+    second = review.find_next_card("test")
+    review.review(Rating.GOOD, second)
+
+    assert first.flashcard.id != second.flashcard.id
+    assert user_fsrs_repository.get_by_user_id("test").queues[0].daily_count == 0
+
+    buffer.close()
+
+    assert user_fsrs_repository.get_by_user_id("test").queues[0].daily_count == 2
+    assert Session().query(FsrsModel).filter(FsrsModel.reviews_count == 1).count() == 2
+
+
+class SlowUserFsrsRepository(UserFsrsRepository):
+    def __init__(self):
+        super().__init__()
+        self.saving = Event()
+
+    def save(self, user_fsrs):
+        self.saving.set()
+        time.sleep(0.2)
+        super().save(user_fsrs)
+
+
+def test_review_during_flush_keeps_flushed_counters(tmp_path):
+    session = Session()
+    for i in range(2):
+        session.add(FlashcardModel(user_id="test", content=f"card {i}"))
+    session.commit()
+
+    user_fsrs_repository = SlowUserFsrsRepository()
+    user_fsrs_repository.save(UserFsrs(id=None, user_id="test", queues=[FsrsQueue(QueueType.NEW, False, 0, 10)], updated_at=datetime.now()))
+    user_fsrs_repository.saving.clear()
+
+    buffer = WriteBehindBuffer(FsrsRepository(FsrsQueueMapper()), user_fsrs_repository, ReviewJournal(tmp_path / "journal"), flush_interval=3600)
+    review = Review(
+        fsrs_resolver=FsrsResolver(user_fsrs_repository),
+        fsrs_repository=FsrsRepository(FsrsQueueMapper()),
+        write_behind=buffer,
+    )
+
+    review.review(Rating.GOOD, review.find_next_card("test"))
+    flusher = Thread(target=buffer.flush)
+    flusher.start()
+    # The second review lands while the first counters are being written.
+    user_fsrs_repository.saving.wait(1)
+    review.review(Rating.GOOD, review.find_next_card("test"))
+    flusher.join()
+
+    buffer.close()
+
+    assert user_fsrs_repository.get_by_user_id("test").queues[0].daily_count == 2
+
+
+def test_out_of_schedule_review_goes_through_the_buffer(tmp_path):
+    buffer = _buffer(tmp_path)
+    review = Review(
+        fsrs_resolver=FsrsResolver(UserFsrsRepository()),
+        fsrs_repository=FsrsRepository(FsrsQueueMapper()),
+        write_behind=buffer,
+    )
+    fsrs = FsrsParams(flashcard_id=1, user_id="test", state=State.REVIEW, stability=3.0, difficulty=5.0, reviews_count=1)
+    buffer.save_fsrs(fsrs)
+
+    reviewed = copy(fsrs)
+    review.update_out_of_schedule(Rating.EASY, reviewed)
+    buffer.close()
+
+    assert reviewed.freshness_score != fsrs.freshness_score
+    assert Session().query(FsrsModel).one().freshness_score == int(reviewed.freshness_score * 1000000)